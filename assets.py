@@ -0,0 +1,73 @@
+import os
+import tkinter as tk
+
+# Images for the UI, decoded and resized once per (file, size) and shared by
+# every widget and session that shows them. With a cache directory the
+# resized copies are also kept on disk as PNG, which Tk reads by itself: a
+# warm start needs neither Pillow nor a resize. Cached files are named after
+# the source's size and modification time, so an edited image is picked up.
+
+_caches = {} # cache_dir -> AssetCache
+
+
+class AssetCache:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or None
+        self.photos = {} # (path, size) -> PhotoImage, or None if it could not be loaded
+        self.pil = None # (Image, ImageTk) once Pillow has been imported; False if it is missing
+
+    def photo(self, path, size):
+        """PhotoImage of the image at path resized to size (w, h); None if it can't be loaded."""
+        key = (path, tuple(size))
+        if key not in self.photos:
+            self.photos[key] = self._load(path, key[1])
+        return self.photos[key]
+
+    def _cached_path(self, path, size):
+        stat = os.stat(path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{name}_{size[0]}x{size[1]}_{stat.st_size}_{stat.st_mtime_ns}.png")
+
+    def _load(self, path, size):
+        cached = None
+        try:
+            if self.cache_dir:
+                cached = self._cached_path(path, size)
+                if os.path.exists(cached):
+                    return tk.PhotoImage(file=cached)
+            pil = self._import_pil()
+            if not pil:
+                return None
+            Image, ImageTk = pil
+            image = Image.open(path).resize(size)
+            if cached:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    image.save(cached, "PNG")
+                except OSError as e:
+                    print(f"Could not cache {path} in {self.cache_dir}: {e}")
+            return ImageTk.PhotoImage(image)
+        except FileNotFoundError:
+            print(f"ERROR: {path} not found at {os.path.abspath(path)}")
+        except Exception as e:
+            print(f"Failed to load image {path}: {e}")
+        return None
+
+    def _import_pil(self):
+        # Only on a cache miss, so a warm start does not pay for importing Pillow
+        if self.pil is None:
+            try:
+                from PIL import Image, ImageTk
+                self.pil = (Image, ImageTk)
+            except ImportError:
+                self.pil = False
+                print("Pillow library not found. Images will not be loaded.")
+        return self.pil
+
+
+def asset_cache(cache_dir=None):
+    """The AssetCache for cache_dir, shared by all UIs in the process."""
+    cache = _caches.get(cache_dir)
+    if cache is None:
+        cache = _caches[cache_dir] = AssetCache(cache_dir)
+    return cache
@@ -1,46 +1,267 @@
-import tkinter as tk
-from base_station_UI import BaseStationUI # UI is passed in
-from communication import RefBoxHandler # WiFiHandler is managed by Robot class
+import argparse
+import json
+import queue
+import time
+STARTED_AT = time.monotonic() # Reference for the startup report, before the heavier imports
+import threading
+from config_loader import CONFIG_FILE, read_config, config_error_message
+from communication import RefBoxHandler, OutboundScheduler, decode_refbox_message, PRIORITY_MOTION # WiFiHandler is managed by Robot class
+from game_state import GameStateMachine, STATE_PLAYING, STATE_SET_PIECE, HALF_START_COMMANDS, HALF_END_COMMANDS
+from positioning import PositioningEngine
+from world_shm import WorldStatePublisher
+from stall_watchdog import start_watchdog
+from param_sync import ParameterSync
+from event_bus import EventBus, LOG, REFEREE, WORLD, BUS_METRICS, TELEMETRY, PARAM_REPLIES, PLAN_REQUESTS, format_metrics
+try:
+    from path_planning import OccupancyGrid, PathPlanner
+    PLANNING_AVAILABLE = True
+except ImportError:
+    PLANNING_AVAILABLE = False
+    print("NumPy not found. Path planning is disabled.")
+try:
+    from interception import InterceptionPredictor
+    INTERCEPTION_AVAILABLE = True
+except ImportError:
+    INTERCEPTION_AVAILABLE = False
+    print("NumPy not found. Interception prediction is disabled.")
+
+# Game states in which robots report at the active rate; all others use the idle rate to save airtime.
+ACTIVE_TELEMETRY_STATES = {STATE_PLAYING, STATE_SET_PIECE}
+
+
+class StartupTimer:
+    """Milestones since process start, reported with the time to the first robot status packet."""
+    def __init__(self, target_first_telemetry_ms, started_at=STARTED_AT):
+        self.target_ms = target_first_telemetry_ms
+        self.started_at = started_at
+        self.marks = [] # (name, ms since start)
+        self.first_telemetry_ms = None
+
+    def mark(self, name):
+        self.marks.append((name, (time.monotonic() - self.started_at) * 1000.0))
+
+    def check_telemetry(self, robots):
+        """Startup report once some robot has sent a status packet, else None."""
+        times = [robot.first_status_time for robot in robots if robot.first_status_time is not None]
+        if not times:
+            return None
+        self.first_telemetry_ms = (min(times) - self.started_at) * 1000.0
+        milestones = ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.marks)
+        verdict = "OK" if self.first_telemetry_ms <= self.target_ms else "OVER TARGET"
+        return (f"Startup: {milestones}, first telemetry {self.first_telemetry_ms:.0f} ms "
+                f"(target {self.target_ms} ms, {verdict}).\n")
 
-# from base_station_UI import load_config # If logic needed config directly
 
 class BaseStationLogic:
-    def __init__(self, ui):
+    def __init__(self, ui, network=None, pool=None, scheduler=None, bus=None):
+        # network/pool/scheduler: shared NetworkLoop, executor and OutboundScheduler when several
+        # sessions run in one process (see sessions.py); by default this instance owns its threads
         self.ui = ui
+        # Telemetry, RefBox, commands, world updates and log lines are published here (see event_bus.py);
+        # the UI takes what it shows from its own bounded queues instead of being called from network threads
+        self.bus = bus if bus is not None else EventBus()
+        self.ui_subscriptions = ui.connect_bus(self.bus)
+        bus_config = ui.config.get('event_bus', {})
+        self.bus_metrics_interval_s = bus_config.get('metrics_interval_s', 10)
+        if bus_config.get('log_metrics'):
+            self.bus.subscribe(BUS_METRICS, "metrics-log", callback=self.log_bus_metrics)
+        self.network = network
+        self.pool = pool
+        self.closed = False
+        self.startup = None # StartupTimer until the first telemetry has been reported
         self.robots = ui.robots # Get robots from UI (already initialized with config)
-        self.opponents = ui.opponents # Get opponents from UI
         self.global_world = ui.global_world # Get global_world from UI
         
         # Connection status for the group of robots, not individual.
         # Individual robot.connected tracks specific robot.
         self.overall_robot_connection_active = False 
 
+        # Robot status rate, switched by RefBox state (see handle_refbox_message)
+        telemetry_config = ui.config.get('telemetry', {})
+        self.active_telemetry_rate_hz = telemetry_config.get('active_rate_hz', 50)
+        self.idle_telemetry_rate_hz = telemetry_config.get('idle_rate_hz', 2)
+        self.telemetry_rate_hz = self.idle_telemetry_rate_hz
+
+        # All robot-bound traffic goes through one priority scheduler (see communication.py)
+        self.owns_scheduler = scheduler is None
+        if scheduler is None:
+            scheduler_config = ui.config.get('scheduler', {})
+            scheduler = OutboundScheduler(
+                rate_bytes_per_s=scheduler_config.get('rate_bytes_per_s', 20000),
+                burst_bytes=scheduler_config.get('burst_bytes', 4096),
+                max_queue_per_robot=scheduler_config.get('max_queue_per_robot', 64)
+            )
+            scheduler.start()
+        self.scheduler = scheduler
+        for robot in self.robots:
+            robot.scheduler = self.scheduler
+            robot.bus = self.bus
+            if robot.wifi_handler:
+                robot.wifi_handler.network = network
+
+        # Versioned parameter sets: only changed values go out, confirmed by the robots (see param_sync.py)
+        param_sync_config = ui.config.get('param_sync', {})
+        self.param_sync = ParameterSync(
+            self.robots,
+            retry_s=param_sync_config.get('retry_ms', 300) / 1000.0,
+            max_attempts=param_sync_config.get('max_attempts', 5),
+            log=self.log
+        )
+        # Replies and status versions come off the bus on the network thread (ParameterSync locks itself)
+        self.bus.subscribe(PARAM_REPLIES, "param-sync", callback=self.handle_param_reply)
+        self.bus.subscribe(TELEMETRY, "param-sync", callback=self.check_param_version)
+
+        # Set-piece positions, precomputed over a ball grid so placement costs a lookup at game time
+        positioning_config = ui.config.get('positioning', {})
+        self.positioning = PositioningEngine(
+            self.global_world.field_dimensions,
+            {robot.robot_id: robot.home_position for robot in self.robots},
+            cell_size_m=positioning_config.get('cell_size_m', 0.5),
+            keep_away_m=positioning_config.get('keep_away_m', 3.0)
+        )
+        # Fill the assignment cache for the full team in the background; lookups before it finishes just solve on demand
+        self.run_in_background(self.positioning.warm_up, [robot.robot_id for robot in self.robots])
+
+        # Occupancy grid / distance field over the fused obstacles, and the planner robots can query
+        self.occupancy_grid = None
+        self.path_planner = None
+        self.plan_requests = None # Queue of the robots' plan_request messages, answered on the world update
+        if PLANNING_AVAILABLE:
+            planning_config = ui.config.get('planning', {})
+            self.occupancy_grid = OccupancyGrid(
+                self.global_world.field_dimensions,
+                resolution_m=planning_config.get('resolution_m', 0.05),
+                obstacle_radius_m=planning_config.get('obstacle_radius_m', 0.25)
+            )
+            self.path_planner = PathPlanner(
+                self.occupancy_grid,
+                robot_radius_m=planning_config.get('robot_radius_m', 0.25),
+                planning_cell_m=planning_config.get('planning_cell_m', 0.2),
+                time_budget_s=planning_config.get('time_budget_ms', 20) / 1000.0
+            )
+            self.plan_requests = self.bus.subscribe(PLAN_REQUESTS, "planner", maxsize=64)
+
+        # Time-to-ball for every robot each tick; the fastest is shown as the interceptor and optionally told so
+        self.interception = None
+        self.hinted_interceptor_id = None
+        self.interception_config = ui.config.get('interception', {})
+        if INTERCEPTION_AVAILABLE and self.interception_config.get('enabled', True):
+            self.interception = InterceptionPredictor(
+                ui.config['field_dimensions'],
+                horizon_s=self.interception_config.get('horizon_s', 3.0),
+                step_s=self.interception_config.get('step_s', 0.05),
+                reach_m=self.interception_config.get('reach_m', 0.2),
+                ball_friction=self.interception_config.get('ball_friction', 0.6)
+            )
+
+        # Optional live world state in named shared memory for local consumers (see world_shm.py)
+        self.world_publisher = None
+        shm_config = ui.config.get('shared_memory', {})
+        if shm_config.get('enabled'):
+            try:
+                self.world_publisher = WorldStatePublisher(shm_config.get('name', "basestation_world"))
+            except OSError as e:
+                print(f"Could not create shared world state segment: {e}")
+
+        # Optional browser dashboard for spectators and coaches (see dashboard_server.py)
+        self.dashboard = None
+        dashboard_config = ui.config.get('dashboard', {})
+        if dashboard_config.get('enabled'):
+            from dashboard_server import DashboardServer # asyncio is a noticeable import; only when used
+            self.dashboard = DashboardServer(
+                ui.config['field_dimensions'],
+                host=dashboard_config.get('host', "0.0.0.0"),
+                port=dashboard_config.get('port', 8080),
+                max_rate_hz=dashboard_config.get('max_rate_hz', 10)
+            )
+            self.dashboard.start()
+
+        # RefBox-driven game state; dispatches robot commands straight from the RefBox thread
+        game_state_config = ui.config.get('game_state', {})
+        self.game_state = GameStateMachine(
+            self.robots,
+            scheduler=self.scheduler,
+            team=ui.config.get('refbox', {}).get('team'),
+            dispatch_budget_s=game_state_config.get('dispatch_budget_ms', 5) / 1000.0,
+            positioning=self.positioning,
+            world=self.global_world
+        )
+        self.game_state.add_state_listener(self.handle_game_state_change)
+
         # RefBox connection using RefBoxHandler
         refbox_config = ui.config.get('refbox', {"ip": "127.0.0.1", "port": 28097})
         self.refbox_handler = RefBoxHandler(
             refbox_config["ip"],
             refbox_config["port"],
             self.handle_refbox_message,
-            self.handle_refbox_disconnect
+            self.handle_refbox_disconnect,
+            network=network
         )
         # self.refbox_messages = [] # store all messages from RefBox here (UI logs them)
 
+    def attach_ui(self, ui):
+        """Hand over from the HeadlessUI used while the real UI was being built; replays its queued events."""
+        early = self.ui
+        ui.is_playing = early.is_playing
+        ui.logic = self
+        for subscription in self.ui_subscriptions:
+            self.bus.unsubscribe(subscription)
+        self.ui_subscriptions = ui.connect_bus(self.bus)
+        self.ui = ui
+        while True:
+            try:
+                kind, value = early.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                ui.log_message(value)
+            elif kind == "refbox_status":
+                ui.update_refbox_status(connected=value)
+
+    def log(self, message):
+        """Event log line for the operator; safe from any thread."""
+        self.bus.publish(LOG, text=message)
+
+    def log_bus_metrics(self, event):
+        summary = format_metrics(event.metrics)
+        if summary:
+            self.log(f"Event bus:\n{summary}\n")
+
+    def handle_param_reply(self, event):
+        robot = self.param_sync.robot(event.robot_id)
+        if robot:
+            self.param_sync.handle_message(robot, event.message)
+
+    def check_param_version(self, event):
+        robot = self.param_sync.robot(event.robot_id)
+        if robot and 'param_version' in event.status:
+            self.param_sync.check_version(robot, event.status['param_version'])
+
+    def run_in_background(self, function, *args):
+        """Run function off the calling thread: on the shared worker pool if there is one."""
+        if self.pool:
+            self.pool.submit(function, *args)
+        else:
+            threading.Thread(target=function, args=args, daemon=True).start()
+
     def connect_to_robots(self):
         self.overall_robot_connection_active = True # Flag that we've attempted to connect
         connection_results = {}
-        self.ui.log_message("Attempting to connect to robots...\n")
+        self.log("Attempting to connect to robots...\n")
         for robot in self.robots:
             if robot.wifi_handler: # Ensure handler exists
                 if robot.connect():
+                    robot.set_telemetry_rate(self.telemetry_rate_hz)
+                    self.param_sync.reconcile(robot) # Learn what it holds; pending edits follow
                     # UI update is now handled in the periodic update_robot_ui_elements
                     # and also via robot.status_label if set directly
-                    self.ui.log_message(f"Successfully connected to {robot.name}.\n")
+                    self.log(f"Successfully connected to {robot.name}.\n")
                     connection_results[robot.name] = "Connected"
                 else:
-                    self.ui.log_message(f"Failed to connect to {robot.name}.\n")
+                    self.log(f"Failed to connect to {robot.name}.\n")
                     connection_results[robot.name] = "Failed"
             else:
-                 self.ui.log_message(f"No WiFi handler for {robot.name}. Cannot connect.\n")
+                 self.log(f"No WiFi handler for {robot.name}. Cannot connect.\n")
                  connection_results[robot.name] = "No Handler"
         
         # Update UI elements after attempting all connections
@@ -50,12 +271,12 @@ class BaseStationLogic:
 
     def disconnect_from_robots(self):
         self.overall_robot_connection_active = False
-        self.ui.log_message("Disconnecting from all robots...\n")
+        self.log("Disconnecting from all robots...\n")
         for robot in self.robots:
             robot.disconnect()
             # UI update handled by periodic refresh
         self.ui.update_robot_ui_elements() # Immediate UI feedback
-        self.ui.log_message("Disconnected from robots.\n")
+        self.log("Disconnected from robots.\n")
 
 
     def connect_to_refbox(self): # ip and port are now from config
@@ -64,38 +285,151 @@ class BaseStationLogic:
             # UI update will be triggered by callbacks
             # self.ui.update_refbox_status(connected=True) # This is handled by callback now
         else:
-            self.ui.log_message("RefBox already trying to connect or is connected.\n")
+            self.log("RefBox already trying to connect or is connected.\n")
 
 
     def handle_refbox_message(self, message):
         # This is called when a message is received OR on connection status changes from RefBoxHandler
+        # Robot commands go out first, before any UI work
+        received_at = time.monotonic()
+        command, data = decode_refbox_message(message)
+        if command:
+            self.game_state.on_refbox_command(command, data, received_at)
+
+        connected = None
         if "Connection Established" in message or "Connected to RefBox" in message :
-             self.ui.update_refbox_status(connected=True)
+             connected = True
         elif "connection refused" in message or "connection error" in message:
-             self.ui.update_refbox_status(connected=False)
+             connected = False
         
-        self.ui.log_refbox_message(message) # Log all messages
+        self.bus.publish(REFEREE, message=message, connected=connected) # UI logs all messages
+
+    def handle_game_state_change(self, game_state, command):
+        # Called on the RefBox thread after the robot commands have been dispatched
+        self.ui.is_playing = game_state.state == STATE_PLAYING
+        if game_state.state in ACTIVE_TELEMETRY_STATES:
+            self.set_telemetry_rate(self.active_telemetry_rate_hz)
+        else:
+            self.set_telemetry_rate(self.idle_telemetry_rate_hz)
+        report = game_state.latency_report()
+        self.log(f"Game state: {game_state.state} ({command}), dispatched in {report['last_dispatch_ms']:.2f} ms.\n")
+        if report['last_over_budget']:
+            self.log(f"WARNING: RefBox dispatch over its {report['budget_ms']:.2f} ms budget "
+                     f"({report['budget_violations']} time(s) so far).\n")
+
+        heatmaps = getattr(self.ui, 'heatmaps', None)
+        if heatmaps:
+            if command in HALF_START_COMMANDS:
+                heatmaps.start_half(command)
+            elif command in HALF_END_COMMANDS and self.ui.config.get('heatmap', {}).get('export_dir'):
+                # Off the RefBox thread: encoding the PNGs takes a few ms
+                self.run_in_background(self.export_heatmaps, heatmaps.half)
+
+    def export_heatmaps(self, half):
+        directory = self.ui.config['heatmap']['export_dir']
+        try:
+            paths = self.ui.heatmaps.export(directory, half)
+            self.log(f"Heatmaps for {half} exported ({len(paths)} files) to {directory}\n")
+        except OSError as e:
+            self.log(f"Heatmap export failed: {e}\n")
+
+    def set_telemetry_rate(self, rate_hz):
+        """Ask every connected robot to report at rate_hz."""
+        if rate_hz == self.telemetry_rate_hz:
+            return
+        self.telemetry_rate_hz = rate_hz
+        for robot in self.robots:
+            if robot.connected:
+                robot.set_telemetry_rate(rate_hz)
+        self.log(f"Robot telemetry rate set to {rate_hz} Hz.\n")
 
     def handle_refbox_disconnect(self):
         # This callback is when the connection loop in RefBoxHandler ends
-        self.ui.update_refbox_status(connected=False)
-        self.ui.log_message("RefBox connection terminated or lost.\n")
+        self.bus.publish(REFEREE, message=None, connected=False)
+        self.log("RefBox connection terminated or lost.\n")
 
 
     def stop_refbox(self):
         self.refbox_handler.stop()
         # self.ui.update_refbox_status(connected=False) # Done by handle_refbox_disconnect
 
-    def update_world_state_and_ui(self):
+    def stop_world_publisher(self):
+        if self.world_publisher:
+            self.world_publisher.close()
+            self.world_publisher = None
+        if self.dashboard:
+            self.dashboard.stop()
+            self.dashboard = None
+
+    def update_world_state(self, now=None):
         # 1. Update global world map from robots' current states
         #    (Robot states are updated by their individual handle_received_data via WiFiHandler)
-        self.global_world.update_from_robots(self.robots)
+        #    now: defaults to time.monotonic(); a capture replay passes the packet time instead
+        self.global_world.update_from_robots(self.robots, now)
+        if getattr(self.ui, 'history', None):
+            self.ui.history.record(self.global_world, self.robots, now)
+        if getattr(self.ui, 'heatmaps', None):
+            self.ui.heatmaps.accumulate(self.global_world, self.robots, active=self.ui.is_playing, now=now)
+
+        # 1a. Resend unconfirmed parameter patches (wall clock, also during a replay)
+        self.param_sync.tick()
+
+        # 1b. Refresh the occupancy grid and answer pending path requests
+        if self.occupancy_grid:
+            # Teammates (the requesting robot too, as the others see it) are not obstacles to plan around
+            self.occupancy_grid.update(self.global_world.opponent_obstacles)
+            self.answer_plan_requests()
+
+        # 1c. Who gets to the ball first
+        if self.interception:
+            self.interception.predict(self.global_world, self.robots)
+            if self.interception_config.get('send_role_hints'):
+                self.send_role_hints()
+
+        # 1d. Publish for shared-memory readers
+        if self.world_publisher:
+            self.world_publisher.publish(self.global_world, self.robots)
+
+        # 1e. Hand the dashboard the latest world (only built while a browser is connected)
+        if self.dashboard and self.dashboard.has_clients():
+            self.dashboard.publish(self.global_world.snapshot(self.robots))
+
+        # 1f. World updates for bus subscribers (snapshot only built if there are any), and bus metrics
+        if self.bus.has_subscribers(WORLD):
+            self.bus.publish(WORLD, time=now, snapshot=self.global_world.snapshot(self.robots))
+        self.bus.publish_metrics(self.bus_metrics_interval_s)
+
+    def close(self):
+        """Release sockets and threads; the shared scheduler is left to its owner."""
+        self.closed = True
+        self.disconnect_from_robots()
+        self.stop_refbox()
+        if self.owns_scheduler:
+            self.scheduler.stop()
+        self.stop_world_publisher()
+
+    def update_world_state_and_ui(self):
+        if self.closed:
+            return
+        # 1. Fuse the world (see update_world_state; run in a worker process in multiprocess mode)
+        self.update_world_state()
+
+        # 1b. Log lines and RefBox events queued on the bus by other threads
+        self.ui.pump_bus_events()
         
         # 2. Redraw main field display
         self.ui.redraw_field()
 
         # 3. Update individual robot UI elements (status, battery) in the grid
         self.ui.update_robot_ui_elements()
+
+        # 3b. Time to first telemetry, once
+        if self.startup:
+            report = self.startup.check_telemetry(self.robots)
+            if report:
+                print(report, end="")
+                self.log(report)
+                self.startup = None
         
         # 4. If a robot detail window is open, refresh its local map and parameter display
         #    This is now also handled by update_robot_ui_elements which calls refresh_robot_detail_view
@@ -103,24 +437,113 @@ class BaseStationLogic:
         # Keep scheduling next update
         self.ui.root.after(30, self.update_world_state_and_ui) # Update rate (e.g., 200ms for 5 FPS)
 
+    def send_role_hints(self):
+        # Only when the interceptor changes; the predictor's hysteresis keeps that rare
+        interception = self.global_world.interception
+        interceptor_id = interception["robot_id"] if interception else None
+        if interceptor_id == self.hinted_interceptor_id:
+            return
+        self.hinted_interceptor_id = interceptor_id
+        for robot in self.robots:
+            if robot.connected:
+                role = "interceptor" if robot.robot_id == interceptor_id else "support"
+                hint = {"type": "role_hint", "role": role}
+                if interception:
+                    hint["intercept_point"] = interception["point"]
+                    hint["time_s"] = interception["time_s"]
+                robot.send_to_robot(json.dumps(hint), PRIORITY_MOTION)
+
+    def answer_plan_requests(self):
+        latest = {}
+        for event in self.plan_requests.drain():
+            latest[event.robot_id] = event.request # A newer request from the same robot replaces the older one
+        for robot in self.robots:
+            request = latest.get(robot.robot_id)
+            if not request:
+                continue
+            goal = request.get('goal')
+            if not goal or len(goal) < 2:
+                continue
+            waypoints = self.path_planner.plan(robot.position, goal)
+            reply = {"type": "path", "request_id": request.get('request_id'), "waypoints": waypoints}
+            if waypoints is None:
+                reply["error"] = "no path"
+            robot.send_to_robot(json.dumps(reply), PRIORITY_MOTION)
+
     # parse_message seems unused or was a placeholder
     # def parse_message(self, message):
     #     print(message)
 
 # Main execution part remains similar but ensure logic is passed to UI
 def main():
-    root = tk.Tk()
-    app = BaseStationUI(root)
-    if not app.config: # If config loading failed in UI, app might be destroyed.
+    parser = argparse.ArgumentParser(description="Team Era Base Station")
+    parser.add_argument("--multiprocess", action="store_true",
+                        help="Run sockets, decoding and fusion in a worker process (also config pipeline.mode)")
+    parser.add_argument("--sessions", nargs="+", metavar="CONFIG",
+                        help="Run one independent base station per config file in this process, sharing one network loop")
+    parser.add_argument("--replay", metavar="CAPTURE",
+                        help="Feed a pcap/pcapng capture through the pipeline instead of binding robot sockets")
+    parser.add_argument("--replay-speed", type=float, default=1.0,
+                        help="1 = captured timing, 2 = twice as fast, 0 = as fast as possible")
+    args = parser.parse_args()
+
+    if args.sessions:
+        import tkinter as tk
+        from sessions import run_session_windows
+        run_session_windows(tk.Tk(), args.sessions)
+        return
+
+    try:
+        config = read_config()
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        from tkinter import messagebox
+        messagebox.showerror("Error", config_error_message(CONFIG_FILE, e))
         print("Exiting due to configuration error.")
         return
+    startup_config = config.get('startup', {})
+    startup = StartupTimer(startup_config.get('target_first_telemetry_ms', 1500))
+    pipeline_config = config.get('pipeline', {})
+    multiprocess = not args.replay and (args.multiprocess or pipeline_config.get('mode') == "multiprocess")
+
+    # Network first: robot sockets are bound and the RefBox connect is under way before Tk and
+    # the UI are loaded. Until the UI is attached, log lines and RefBox status wait in a queue.
+    logic = None
+    replay = None
+    if not multiprocess:
+        from world_process import HeadlessUI
+        logic = BaseStationLogic(HeadlessUI(config, queue.Queue(maxsize=1000)))
+        logic.startup = startup
+        if args.replay:
+            # Captured robot and RefBox traffic takes the place of the live sockets
+            from pcap_replay import PcapReplay
+            replay = PcapReplay(args.replay, config, logic.robots, logic.handle_refbox_message, speed=args.replay_speed)
+            threading.Thread(target=replay.run, daemon=True).start()
+            logic.log(f"Replaying {args.replay} at speed {args.replay_speed}.\n")
+        else:
+            # Initial connection attempts
+            logic.connect_to_robots() 
+            startup.mark("sockets bound")
+            if startup_config.get('connect_refbox', True):
+                logic.connect_to_refbox()
 
-    logic = BaseStationLogic(app)
-    app.logic = logic # Make logic accessible from UI (e.g., for button commands)
+    import tkinter as tk
+    from base_station_UI import BaseStationUI
+    root = tk.Tk()
+    if logic:
+        app = BaseStationUI(root, config, robots=logic.robots, world=logic.global_world)
+    else:
+        app = BaseStationUI(root, config)
+    watchdog = start_watchdog(root, config) # Reports callbacks that block the Tk loop
+
+    if multiprocess:
+        run_multiprocess(root, app, pipeline_config)
+        if watchdog:
+            watchdog.stop()
+            watchdog.print_report()
+        return
 
-    # Initial connection attempts
-    logic.connect_to_robots() 
-    # logic.connect_to_refbox() # Optionally auto-connect to refbox on startup
+    logic.attach_ui(app) # Make logic accessible from UI (e.g., for button commands)
+    startup.mark("UI built")
 
     # Start the periodic update loop
     logic.update_world_state_and_ui() 
@@ -129,8 +552,31 @@ def main():
 
     # Cleanup on exit
     print("Closing application. Disconnecting services...")
-    logic.disconnect_from_robots()
-    logic.stop_refbox()
+    if replay:
+        replay.stop()
+    logic.close()
+    if watchdog:
+        watchdog.stop()
+        watchdog.print_report()
+    print("Application closed.")
+
+
+def run_multiprocess(root, app, pipeline_config):
+    # The UI only consumes snapshots; robots, RefBox and fusion live in the worker process
+    from world_process import WorldProcessClient
+    client = WorldProcessClient(
+        app,
+        slots=pipeline_config.get('ring_slots', 8),
+        slot_size=pipeline_config.get('slot_size', 65536),
+        tick_s=pipeline_config.get('tick_ms', 30) / 1000.0
+    )
+    app.logic = client
+    client.start()
+
+    root.mainloop()
+
+    print("Closing application. Stopping world worker...")
+    client.stop()
     print("Application closed.")
 
 
@@ -1,83 +1,95 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import os
 import json
 import math
+import time
+
+from robot_logic import Robot, GlobalWorldMap, create_robots_from_config
+from communication import PRIORITY_SAFETY, PRIORITY_MOTION, PRIORITY_PARAMETERS, PRIORITY_DIAGNOSTICS
+from field_view import FieldRenderer
+from config_loader import CONFIG_FILE, read_config, config_error_message
+from assets import asset_cache
+from event_bus import LOG, REFEREE
 try:
-    from PIL import Image, ImageTk
-    PIL_AVAILABLE = True
+    import numpy as np
+    from history import WorldHistory
+    from heatmap import Heatmaps, LAYERS as HEATMAP_LAYERS
+    from telemetry_store import TelemetryStore, COLUMNS as TELEMETRY_COLUMNS
+    NUMPY_AVAILABLE = True
 except ImportError:
-    PIL_AVAILABLE = False
-    print("Pillow library not found. Images will not be loaded.")
-
-from robot_logic import Robot, GlobalWorldMap 
-CONFIG_FILE = "config.json"
-
-# load_config function (assuming it's unchanged and working)
-def load_config():
+    NUMPY_AVAILABLE = False
+    print("NumPy not found. Position trails, heatmaps and telemetry plots are disabled.")
+# load_config: read_config (config_loader.py) with an error dialog
+def load_config(path=CONFIG_FILE):
     try:
-        with open(CONFIG_FILE, 'r') as f:
-            config = json.load(f)
-        config.setdefault('refbox', {"ip": "127.0.0.1", "port": 28097})
-        config.setdefault('robots', [])
-        config.setdefault('opponents', [])
-        config.setdefault('field_dimensions', [12, 9])
-        config.setdefault('local_map_view_range_m', 6) 
-        return config
-    except FileNotFoundError:
-        messagebox.showerror("Error", f"Configuration file '{CONFIG_FILE}' not found.")
-        return None
-    except json.JSONDecodeError:
-        messagebox.showerror("Error", f"Error decoding JSON from '{CONFIG_FILE}'.")
+        return read_config(path)
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        messagebox.showerror("Error", config_error_message(path, e))
         return None
 
 class BaseStationUI:
-    def __init__(self, root):
+    def __init__(self, root, config=None, robots=None, title="Team Era Base Station", world=None):
+        # root may be a Toplevel when several sessions share one Tk (see sessions.py)
+        # robots/world: already created (and connected) before the UI, see main() in base_station.py
         self.root = root
-        self.root.title("Team Era Base Station")
+        self.root.title(title)
         self.root.geometry("1200x800")
 
-        self.config = load_config()
+        self.config = config if config is not None else load_config()
         if not self.config:
             self.root.destroy() 
             return
 
-        self.global_world = GlobalWorldMap(field_dims=self.config['field_dimensions'])
-        # local_map_view_range_m is no longer used for zoom, but keep if other uses exist
+        self.global_world = world if world is not None else \
+            GlobalWorldMap(field_dims=self.config['field_dimensions'],
+                           tracker_config=self.config.get('tracking'),
+                           ball_filter_config=self.config.get('ball_filter'))
+        # Initial width/height (m) of the robot-centric map in the detail windows
         self.local_map_view_range_m = self.config.get('local_map_view_range_m', 6) 
+        self.log_max_lines = self.config.get('log_max_lines', 2000)
+        self.referee_events = None # RefBox and log queues on the logic's EventBus, drained by pump_bus_events
+        self.log_events = None
         self.current_detailed_robot = None
         self.logging_text = None
-        self.robot_param_labels = {} # Initialize here
+        self.detail_windows = {} # robot_id -> RobotDetailWindow, kept and reused once opened
+        self.telemetry_windows = {} # robot_id -> TelemetryPlotWindow, likewise
 
         # HOME ROBOTS
-        self.robots = []
-        for r_idx, r_conf in enumerate(self.config.get('robots', [])):
-            self.robots.append(Robot(
-                robot_id=r_conf['id'], name=r_conf.get('name', "Player"), color=r_conf.get('color', "blue"),
-                ip_address=r_conf.get('ip'), send_to_port=r_conf.get('send_to_port'),
-                base_station_listen_port=r_conf.get('base_listen_port'),
-                initial_pos=r_conf.get('initial_pos', [1 + r_idx, 1]),
-                initial_orient=r_conf.get('initial_orient', 0)
-            ))
-        
-        if not self.robots:
-             self.robots = [Robot(i + 1, "Player", "blue", initial_pos=(1+i,1), initial_orient=0) for i in range(5)]
-
-        # OPPONENT ROBOTS
-        self.opponents = []
-        for idx, o_conf in enumerate(self.config.get('opponents', [])):
-            opponent = Robot(robot_id=o_conf['id'], name=o_conf.get('name', "Opponent"), color=o_conf.get('color', "red"),
-                             initial_pos=o_conf.get('initial_pos', [10 + idx, 1]),
-                             initial_orient=o_conf.get('initial_orient', 180))
-            opponent.wifi_handler = None 
-            self.opponents.append(opponent)
-        
-        if not self.opponents: 
-            self.opponents = [Robot(i + 1, "Opponent", color="red", initial_pos=(10+i,7), initial_orient=180) for i in range(5)]
+        self.robots = robots if robots is not None else create_robots_from_config(self.config)
+
+        # OPPONENT ROBOTS are tracked from the robots' obstacle detections (global_world.opponents)
+
+        # Recent positions of the robots and the ball, drawn as trails (filled by the world update)
+        trails_config = self.config.get('trails', {})
+        self.trail_seconds = trails_config.get('seconds', 5)
+        self.history = None
+        if NUMPY_AVAILABLE and trails_config.get('enabled', True):
+            self.history = WorldHistory(capacity=trails_config.get('capacity', 256))
+
+        # Per-robot telemetry history (battery, speed, packet rate, ...), recorded by every status packet
+        self.telemetry = None
+        if NUMPY_AVAILABLE:
+            store_config = self.config.get('telemetry_store', {})
+            self.telemetry = TelemetryStore(chunk_size=store_config.get('chunk_size', 4096),
+                                            chunks_in_memory=store_config.get('chunks_in_memory', 16),
+                                            spill_dir=store_config.get('spill_dir'))
+            self.telemetry.attach(self.robots)
+
+        # Per-half heatmaps of where robots and ball spent time (filled by the world update while playing)
+        self.heatmap_config = self.config.get('heatmap', {})
+        self.heatmaps = None
+        if NUMPY_AVAILABLE:
+            self.heatmaps = Heatmaps(self.config['field_dimensions'], cell_m=self.heatmap_config.get('cell_m', 0.1))
+        self.heatmap_photo = None
+        self.heatmap_drawn = None # (layer, half, size) of heatmap_photo
+        self.heatmap_drawn_at = 0.0
+        self.heatmap_revision = None # heatmaps.revision the photo was generated from
 
         self.logic = None 
         self.is_playing = False
-        self.robot_images = {} 
+        # Decoded (and resized) images, shared with other sessions and optionally cached on disk
+        self.assets = asset_cache(self.config.get('startup', {}).get('image_cache_dir') or None)
+        self.more_panel = None # Heatmap/export controls, built on first "More..." click
 
         self.setup_ui()
 
@@ -87,29 +99,26 @@ class BaseStationUI:
         banner_frame.pack(fill=tk.X)
         banner_frame.pack_propagate(0)
 
-        def load_logo(path, size, parent, text_if_fail):
-            if PIL_AVAILABLE:
-                try:
-                    img = ImageTk.PhotoImage(Image.open(path).resize(size))
-                    label = tk.Label(parent, image=img, bg=parent.cget("bg"))
-                    label.image = img 
-                    return label
-                except Exception as e:
-                    print(f"Failed to load image {path}: {e}")
+        # Logos start as text and get their images after the first paint (load_logos)
+        def logo_label(parent, text_if_fail):
             return tk.Label(parent, text=text_if_fail, fg="white", bg=parent.cget("bg"), font=("Arial", 12))
 
-        team_logo_label = load_logo("robocup_logo.png", (180, 60), banner_frame, "Team Logo")
+        team_logo_label = logo_label(banner_frame, "Team Logo")
         team_logo_label.pack(side=tk.LEFT, padx=10)
         
         center_logo_frame = tk.Frame(banner_frame, bg="#a8328d")
         center_logo_frame.pack(side=tk.LEFT, expand=True)
-        msl_logo_label = load_logo("era_logo.png", (80,80), center_logo_frame, "MSL")
+        msl_logo_label = logo_label(center_logo_frame, "MSL")
         msl_logo_label.pack()
         
         right_frame = tk.Frame(banner_frame, bg="#a8328d")
         right_frame.pack(side=tk.RIGHT, padx=10)
-        institute_logo_label = load_logo("iitk_logo.png", (60,60), right_frame, "IITK")
+        institute_logo_label = logo_label(right_frame, "IITK")
         institute_logo_label.pack(side=tk.RIGHT, padx=5)
+        self.logo_labels = [(team_logo_label, "robocup_logo.png", (180, 60)),
+                            (msl_logo_label, "era_logo.png", (80, 80)),
+                            (institute_logo_label, "iitk_logo.png", (60, 60))]
+        self.root.after(100, self.load_logos) # Once the window has been drawn
 
         self.refbox_status_label = tk.Label(right_frame, text="RefBox: Disconnected", fg="red", bg="#a8328d", font=("Arial", 10, "bold"))
         self.refbox_status_label.pack(side=tk.RIGHT, padx=10)
@@ -131,6 +140,8 @@ class BaseStationUI:
         robot_grid = tk.Frame(left_panel)
         robot_grid.pack(fill=tk.BOTH, expand=True)
 
+        bot_photo = self.assets.photo("bot.png", (120, 90)) # One decode for all cards
+
         for i, robot in enumerate(self.robots):
             row = i // 2
             col = i % 2
@@ -149,25 +160,12 @@ class BaseStationUI:
             img_label_container.pack_propagate(False) # Prevent children from resizing this container
 
             robot_image_label = None 
-            if PIL_AVAILABLE:
-                try:
-                    bot_img_path = "bot.png" 
-                    # Ensure bot.png is in the correct path or provide an absolute path for testing
-                    # print(f"DEBUG: Trying to load bot image from: {os.path.abspath(bot_img_path)}")
-                    bot_img = Image.open(bot_img_path).resize((120, 90)) # Resized image
-                    bot_photo = ImageTk.PhotoImage(bot_img)
-                    robot_image_label = tk.Label(img_label_container, image=bot_photo, bg=img_label_container.cget("bg"))
-                    robot_image_label.image = bot_photo # Keep a reference!
-                except FileNotFoundError:
-                    print(f"ERROR: bot.png not found at {os.path.abspath(bot_img_path)}")
-                    robot_image_label = tk.Label(img_label_container, text="bot.png missing", fg="red", bg="white", width=18, height=4)
-                except Exception as e:
-                    print(f"Error loading bot.png: {e}")
-                    # Fallback text label if image loading fails, give it explicit size
-                    robot_image_label = tk.Label(img_label_container, text="No Image", fg="black", bg="white", width=18, height=4) # width/height in text units
+            if bot_photo:
+                # The cache keeps the PhotoImage referenced
+                robot_image_label = tk.Label(img_label_container, image=bot_photo, bg=img_label_container.cget("bg"))
             else:
-                # Fallback text label if Pillow is not available
-                robot_image_label = tk.Label(img_label_container, text="No Image (PIL)", fg="black", bg="white", width=18, height=4)
+                # Fallback text label if bot.png is missing or Pillow is not available, give it explicit size
+                robot_image_label = tk.Label(img_label_container, text="No Image", fg="black", bg="white", width=18, height=4) # width/height in text units
             
             if robot_image_label:
                 # Place the label (image or text) in the center of its container
@@ -197,6 +195,7 @@ class BaseStationUI:
         tk.Label(middle_panel, text="Global Field View", font=("Arial", 12, "bold")).pack(pady=(0,5))
         self.field_canvas = tk.Canvas(middle_panel, bg="#3A5F0B", height=400) # Darker green
         self.field_canvas.pack(fill=tk.BOTH, expand=True, pady=5)
+        self.field_renderer = FieldRenderer(self.field_canvas, self.global_world.field_dimensions)
         self.draw_field()
         self.field_canvas.bind("<Configure>", lambda e: self.redraw_field())
 
@@ -222,6 +221,37 @@ class BaseStationUI:
         tk.Button(additional_btn_frame, text="Reset Positions", width=12, command=self.reset_position, font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
         tk.Button(additional_btn_frame, text="Camera Check", width=12, command=self.camera_check, font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
 
+        if self.heatmaps:
+            self.heatmap_visible = tk.BooleanVar(value=False)
+            self.heatmap_layer = tk.StringVar(value=HEATMAP_LAYERS[0])
+            # Heatmap and export controls are rarely needed: built on the first click
+            self.more_button = tk.Button(additional_btn_frame, text="More...", width=8, command=self.toggle_more_panel, font=("Arial", 10))
+            self.more_button.pack(side=tk.LEFT, padx=10)
+            self.more_parent = additional_btn_frame
+
+    def load_logos(self):
+        for label, path, size in self.logo_labels:
+            photo = self.assets.photo(path, size)
+            if photo and label.winfo_exists():
+                label.config(image=photo, text="")
+
+    def toggle_more_panel(self):
+        if self.more_panel is None:
+            self.more_panel = tk.Frame(self.more_parent)
+            tk.Checkbutton(self.more_panel, text="Heatmap", variable=self.heatmap_visible,
+                           command=self.redraw_field, font=("Arial", 10)).pack(side=tk.LEFT, padx=(10,0))
+            layer_menu = tk.OptionMenu(self.more_panel, self.heatmap_layer, *HEATMAP_LAYERS,
+                                       command=lambda _: self.redraw_field())
+            layer_menu.config(font=("Arial", 10))
+            layer_menu.pack(side=tk.LEFT)
+            tk.Button(self.more_panel, text="Export Heatmaps", width=14, command=self.export_heatmaps, font=("Arial", 10)).pack(side=tk.LEFT, padx=10)
+        if self.more_panel.winfo_manager(): # Packed
+            self.more_panel.pack_forget()
+            self.more_button.config(text="More...")
+        else:
+            self.more_panel.pack(side=tk.LEFT)
+            self.more_button.config(text="Less")
+
     # ... (handle_refbox_connect, update_refbox_status, log_refbox_message - assumed unchanged) ...
     def handle_refbox_connect(self):
         if self.logic:
@@ -244,337 +274,137 @@ class BaseStationUI:
     def log_refbox_message(self, message):
         self.log_message(f"RefBox: {message}\n")
 
-    # Drawing functions: draw_field, redraw_field (modified highlight_robot_id in draw_robots_on_field)
+    # Events from other threads arrive through the logic's EventBus (event_bus.py): queued there
+    # without waiting and applied here on the Tk thread, so no widget is touched from a network thread
+    def connect_bus(self, bus):
+        self.referee_events = bus.subscribe(REFEREE, "ui-referee", maxsize=256)
+        self.log_events = bus.subscribe(LOG, "ui-log", maxsize=self.log_max_lines) # Older lines would be trimmed anyway
+        subscriptions = [self.referee_events, self.log_events]
+        if self.telemetry:
+            subscriptions.append(self.telemetry.subscribe(bus))
+        return subscriptions
+
+    def pump_bus_events(self, limit=500):
+        """Apply queued events (at most limit per topic so a burst can't stall a frame); Tk thread only."""
+        if not self.log_events:
+            return
+        for event in self.referee_events.drain(limit):
+            if event.connected is not None:
+                self.update_refbox_status(event.connected)
+            if event.message is not None:
+                self.log_refbox_message(event.message)
+        for event in self.log_events.drain(limit):
+            self.log_message(event.text)
+
+    # Drawing: the field canvas keeps its items and only moves them (see field_view.py)
     def draw_field(self):
+        renderer = self.field_renderer
         try:
-            w = self.field_canvas.winfo_width()
-            h = self.field_canvas.winfo_height()
-        except tk.TclError: 
-            return
-        if w <=1 or h <=1: 
+            if not renderer.begin():
+                return
+        except tk.TclError:
             return
-
-        self.field_canvas.delete("all")
-        self.draw_soccer_lines(self.field_canvas, w, h, self.global_world.field_dimensions)
-        # For global field, no specific robot is highlighted by default unless we add such a feature
-        self.draw_robots_on_field(self.field_canvas, self.robots, w, h, self.global_world.field_dimensions, highlight_robot_id=None)
-        self.draw_robots_on_field(self.field_canvas, self.opponents, w, h, self.global_world.field_dimensions)
-        self.draw_ball_on_field(self.field_canvas, self.global_world.ball_position, w, h, self.global_world.field_dimensions)
+        if self.heatmaps and self.heatmap_visible.get():
+            self.draw_heatmap()
+        if self.history:
+            self.draw_trails()
+        interception = self.global_world.interception
+        interceptor_id = interception["robot_id"] if interception else None
+        renderer.robots("team", self.robots, highlight_robot_id=interceptor_id)
+        renderer.robots("opponent", self.global_world.opponents)
+        interceptor = next((r for r in self.robots if r.robot_id == interceptor_id), None)
+        if interceptor:
+            renderer.intercept("intercept", interceptor.position[0], interceptor.position[1], *interception["point"])
+        ball = self.global_world.ball_position
+        if ball and len(ball) >= 2:
+            renderer.ball("ball", ball[0], ball[1])
+        renderer.end()
 
     def redraw_field(self):
         self.draw_field()
 
-    def draw_soccer_lines(self, canvas, canvas_w, canvas_h, field_dims_m, view_center_m=None, view_range_m=None):
-        # ... (This function seemed okay, ensure it correctly handles view_center_m=None for full field) ...
-        field_w_m, field_h_m = field_dims_m
-        
-        if view_center_m and view_range_m: 
-            scale_x = canvas_w / view_range_m
-            scale_y = canvas_h / view_range_m
-            origin_x_canvas, origin_y_canvas = 0, 0
-            view_tl_m_x = view_center_m[0] - view_range_m / 2
-            view_tl_m_y = view_center_m[1] - view_range_m / 2
-        else: 
-            margin = 10 
-            drawable_w = canvas_w - 2 * margin
-            drawable_h = canvas_h - 2 * margin
-            scale_x = drawable_w / field_w_m
-            scale_y = drawable_h / field_h_m
-            origin_x_canvas, origin_y_canvas = margin, margin
-            view_tl_m_x, view_tl_m_y = 0, 0
-
-        def m_to_px(m_x, m_y):
-            px_x = origin_x_canvas + (m_x - view_tl_m_x) * scale_x
-            px_y = origin_y_canvas + (m_y - view_tl_m_y) * scale_y
-            return px_x, px_y
-
-        tl_px = m_to_px(0, 0)
-        br_px = m_to_px(field_w_m, field_h_m)
-        canvas.create_rectangle(tl_px[0], tl_px[1], br_px[0], br_px[1], outline="white", width=2)
-
-        cl_start_px = m_to_px(field_w_m / 2, 0)
-        cl_end_px = m_to_px(field_w_m / 2, field_h_m)
-        canvas.create_line(cl_start_px[0], cl_start_px[1], cl_end_px[0], cl_end_px[1], fill="white", width=2)
-
-        center_circle_radius_m = 0.75 
-        cc_center_m_x, cc_center_m_y = field_w_m / 2, field_h_m / 2
-        cc_tl_px = m_to_px(cc_center_m_x - center_circle_radius_m, cc_center_m_y - center_circle_radius_m)
-        cc_br_px = m_to_px(cc_center_m_x + center_circle_radius_m, cc_center_m_y + center_circle_radius_m)
-        canvas.create_oval(cc_tl_px[0], cc_tl_px[1], cc_br_px[0], cc_br_px[1], outline="white", width=2)
-        
-        goal_width_m = 0.6 
-        goal_depth_px = 5 
-        
-        blue_goal_y1_m = field_h_m / 2 - goal_width_m / 2
-        blue_goal_y2_m = field_h_m / 2 + goal_width_m / 2
-        # Ensure scale_x is not zero before division
-        blue_goal_depth_m = goal_depth_px / scale_x if scale_x != 0 else 0.1 
-        bg1_px = m_to_px(0, blue_goal_y1_m)
-        bg2_px = m_to_px(blue_goal_depth_m , blue_goal_y2_m) 
-        canvas.create_rectangle(bg1_px[0]-goal_depth_px, bg1_px[1], bg2_px[0], bg2_px[1], fill="#4169E1", outline="#4169E1")
-
-        yellow_goal_y1_m = field_h_m / 2 - goal_width_m / 2
-        yellow_goal_y2_m = field_h_m / 2 + goal_width_m / 2
-        yellow_goal_depth_m = goal_depth_px / scale_x if scale_x != 0 else 0.1
-        yg1_px = m_to_px(field_w_m - yellow_goal_depth_m, yellow_goal_y1_m)
-        yg2_px = m_to_px(field_w_m, yellow_goal_y2_m)
-        canvas.create_rectangle(yg1_px[0], yg1_px[1], yg2_px[0]+goal_depth_px, yg2_px[1], fill="#FFD700", outline="#FFD700")
-
-
-    def draw_robots_on_field(self, canvas, robots_to_draw, canvas_w, canvas_h, field_dims_m, 
-                             view_center_m=None, view_range_m=None, highlight_robot_id=None):
-        field_w_m, field_h_m = field_dims_m
-        robot_radius_px = 8 
-
-        if view_center_m and view_range_m: 
-            scale_x = canvas_w / view_range_m
-            scale_y = canvas_h / view_range_m
-            origin_x_canvas, origin_y_canvas = 0,0
-            view_tl_m_x = view_center_m[0] - view_range_m / 2
-            view_tl_m_y = view_center_m[1] - view_range_m / 2
-        else: 
-            margin = 10
-            drawable_w = canvas_w - 2 * margin
-            drawable_h = canvas_h - 2 * margin
-            scale_x = drawable_w / field_w_m if field_w_m > 0 else 1
-            scale_y = drawable_h / field_h_m if field_h_m > 0 else 1
-            origin_x_canvas, origin_y_canvas = margin, margin
-            view_tl_m_x, view_tl_m_y = field_w_m/2,field_h_m/2
-
-        for robot_obj in robots_to_draw: 
-            if not hasattr(robot_obj, 'position') or not robot_obj.position or len(robot_obj.position) < 2:
-                # print(f"Skipping robot {robot_obj.robot_id if hasattr(robot_obj, 'robot_id') else 'Unknown'} due to missing/invalid position.")
+    def draw_heatmap(self):
+        # One image for the whole layer, regenerated on toggle, layer/half change or resize, else every refresh_s
+        now = time.monotonic()
+        size = self.field_renderer.field_size_px()
+        drawn = (self.heatmap_layer.get(), self.heatmaps.half, size)
+        refresh_s = self.heatmap_config.get('refresh_s', 2)
+        stale = self.heatmaps.revision != self.heatmap_revision and now - self.heatmap_drawn_at >= refresh_s
+        if self.heatmap_photo is None or drawn != self.heatmap_drawn or stale:
+            self.heatmap_revision = self.heatmaps.revision
+            data = self.heatmaps.ppm(drawn[0], size[0], size[1])
+            if self.heatmap_photo is None:
+                self.heatmap_photo = tk.PhotoImage(data=data, format="PPM")
+            else:
+                self.heatmap_photo.configure(data=data, format="PPM", width=size[0], height=size[1])
+            self.heatmap_drawn = drawn
+            self.heatmap_drawn_at = now
+        self.field_renderer.background_image("heatmap", self.heatmap_photo, self.heatmap_drawn)
+
+    def export_heatmaps(self):
+        directory = filedialog.askdirectory(title="Export Heatmaps") or None
+        if not directory:
+            return
+        try:
+            for half in list(self.heatmaps.halves):
+                paths = self.heatmaps.export(directory, half)
+                self.log_message(f"Heatmaps for {half} exported ({len(paths)} files) to {directory}\n")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export heatmaps: {e}")
+
+    def draw_trails(self):
+        now = time.monotonic()
+        # Trails also shrink while nothing moves, so refresh them at least every 100 ms
+        tick = int(now * 10)
+        rings = [(f"trail:{robot.robot_id}", self.history.robots.get(robot.robot_id), robot.color) for robot in self.robots]
+        rings.append(("trail:ball", self.history.ball, "orange"))
+        for key, ring, color in rings:
+            if ring is None:
                 continue
-            rx_m, ry_m = robot_obj.position[0], robot_obj.position[1]
-
-            cx_px = origin_x_canvas + (rx_m + view_tl_m_x) * scale_x
-            cy_px = origin_y_canvas + (-ry_m + view_tl_m_y) * scale_y
-            
-            canvas.create_oval(cx_px - robot_radius_px, cy_px - robot_radius_px, 
-                               cx_px + robot_radius_px, cy_px + robot_radius_px, 
-                               fill=robot_obj.color, outline="white", width=1)
-            
-            angle_rad = robot_obj.orientation
-            line_len_px = 15 
-            x_end_px = cx_px + line_len_px * math.cos(angle_rad)
-            y_end_px = cy_px - line_len_px * math.sin(angle_rad)
-            canvas.create_line(cx_px, cy_px, x_end_px, y_end_px, fill="white", width=2)
-            
-            canvas.create_text(cx_px, cy_px, text=str(robot_obj.robot_id), fill="black", font=("Arial", 7, "bold"))
-
-            if highlight_robot_id is not None and robot_obj.robot_id == highlight_robot_id:
-                 # Check if the robot to be highlighted is one of our team's robots
-                 is_our_team_detailed_robot = any(r.robot_id == highlight_robot_id and r.color != "red" for r in self.robots) # crude check
-                 if is_our_team_detailed_robot:
-                    canvas.create_oval(cx_px - robot_radius_px - 3, cy_px - robot_radius_px - 3,
-                                   cx_px + robot_radius_px + 3, cy_px + robot_radius_px + 3,
-                                   outline="yellow", width=2)
-
-
-    def draw_ball_on_field(self, canvas, ball_pos_m, canvas_w, canvas_h, field_dims_m, view_center_m=None, view_range_m=None):
-        if not ball_pos_m or len(ball_pos_m) < 2: return
-
-        field_w_m, field_h_m = field_dims_m
-        ball_radius_px = 5
-
-        if view_center_m and view_range_m:
-            scale_x = canvas_w / view_range_m
-            scale_y = canvas_h / view_range_m
-            origin_x_canvas, origin_y_canvas = 0,0
-            view_tl_m_x = view_center_m[0] - view_range_m / 2
-            view_tl_m_y = view_center_m[1] - view_range_m / 2
-        else: 
-            margin = 10
-            drawable_w = canvas_w - 2 * margin
-            drawable_h = canvas_h - 2 * margin
-            scale_x = drawable_w / field_w_m if field_w_m > 0 else 1
-            scale_y = drawable_h / field_h_m if field_h_m > 0 else 1
-            origin_x_canvas, origin_y_canvas = margin, margin
-            view_tl_m_x, view_tl_m_y = field_w_m/2,field_h_m/2
-
-        bx_m, by_m = ball_pos_m[0], ball_pos_m[1]
-        cx_px = origin_x_canvas + (bx_m + view_tl_m_x) * scale_x
-        cy_px = origin_y_canvas + (-by_m + view_tl_m_y) * scale_y
-        
-        canvas.create_oval(cx_px - ball_radius_px, cy_px - ball_radius_px, 
-                           cx_px + ball_radius_px, cy_px + ball_radius_px, 
-                           fill="orange", outline="black", width=1)
-
-
-    def draw_obstacles_on_field(self, canvas, obstacles_m, canvas_w, canvas_h, field_dims_m, view_center_m=None, view_range_m=None):
-        # ... (This function seemed okay, ensure it correctly handles view_center_m=None for full field) ...
-        if not obstacles_m: return
-
-        field_w_m, field_h_m = field_dims_m
-        obstacle_radius_px = 4
-
-        if view_center_m and view_range_m:
-            scale_x = canvas_w / view_range_m
-            scale_y = canvas_h / view_range_m
-            origin_x_canvas, origin_y_canvas = 0,0
-            view_tl_m_x = view_center_m[0] - view_range_m / 2
-            view_tl_m_y = view_center_m[1] - view_range_m / 2
-        else: 
-            margin = 10
-            drawable_w = canvas_w - 2 * margin
-            drawable_h = canvas_h - 2 * margin
-            scale_x = drawable_w / field_w_m if field_w_m > 0 else 1
-            scale_y = drawable_h / field_h_m if field_h_m > 0 else 1
-            origin_x_canvas, origin_y_canvas = margin, margin
-            view_tl_m_x, view_tl_m_y = field_w_m/2,field_h_m/2
-        
-        for obs_m in obstacles_m:
-            if not obs_m or len(obs_m) < 2: continue
-            ox_m, oy_m = obs_m[0], obs_m[1]
-            cx_px = origin_x_canvas + (ox_m + view_tl_m_x) * scale_x
-            cy_px = origin_y_canvas + (-oy_m + view_tl_m_y) * scale_y
-            
-            canvas.create_rectangle(cx_px - obstacle_radius_px, cy_px - obstacle_radius_px, 
-                                   cx_px + obstacle_radius_px, cy_px + obstacle_radius_px, 
-                                   fill="gray", outline="black")
-
+            samples = ring.recent(self.trail_seconds, now)
+            self.field_renderer.trail(key, samples[:, 1], samples[:, 2], color, (ring.revision, tick))
 
     def show_robot_detail(self, robot):
-        print(f"DEBUG: show_robot_detail called for {robot.name}, ID: {robot.robot_id}") # DEBUG LINE
         if not isinstance(robot, Robot):
             print(f"DEBUG: Invalid robot object passed to show_robot_detail: {robot}")
             return
 
         self.current_detailed_robot = robot
-        detail_window = tk.Toplevel(self.root)
-        detail_window.title(f"Detailed View - {robot.name}")
-        detail_window.geometry("800x650")
-        detail_window.transient(self.root) # Keep on top
-        # detail_window.grab_set() # Make it modal (optional, can be annoying)
-
-
-        info_frame = tk.Frame(detail_window, pady=5)
-        info_frame.pack(fill=tk.X)
-        tk.Label(info_frame, text=f"{robot.name}", font=("Arial", 16, "bold")).pack(side=tk.LEFT, padx=20)
-        status_text = "Connected" if robot.connected else "Disconnected"
-        status_color = "green" if robot.connected else "red"
-        tk.Label(info_frame, text=f"Status: {status_text}", fg=status_color, font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=20)
-        tk.Label(info_frame, text=f"Battery: {robot.parameters.get('battery_level', 'N/A')}%", font=("Arial", 12)).pack(side=tk.LEFT, padx=20)
-        tk.Button(info_frame, text="Parameters...", command=self.open_parameters_window, font=("Arial", 10)).pack(side=tk.RIGHT, padx=20)
-
-        content_frame = tk.Frame(detail_window)
-        content_frame.pack(fill=tk.BOTH, expand=True, padx=10)
-
-        param_display_frame = tk.LabelFrame(content_frame, text="Current Parameters", padx=10, pady=10)
-        param_display_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0,10))
-        
-        self.robot_param_labels.clear() # Clear previous labels if any
-        for i, (param, value) in enumerate(robot.parameters.items()):
-            tk.Label(param_display_frame, text=param.replace('_', ' ').title() + ":", font=("Arial", 9)).grid(row=i, column=0, sticky="w", pady=2)
-            val_label = tk.Label(param_display_frame, text=str(value), font=("Arial", 9, "bold"))
-            val_label.grid(row=i, column=1, sticky="e", padx=5, pady=2)
-            self.robot_param_labels[param] = val_label
-
-        local_map_frame = tk.Frame(content_frame)
-        local_map_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
-        tk.Label(local_map_frame, text="Local World Map (Robot's Perception on Full Field)", font=("Arial", 11, "bold")).pack(pady=(0,5))
-        local_map_canvas = tk.Canvas(local_map_frame, bg="#556B2F", relief=tk.SUNKEN, bd=1)
-        local_map_canvas.pack(fill=tk.BOTH, expand=True)
-
-        def update_local_map_display(event=None):
-            # print(f"DEBUG: update_local_map_display for {robot.name}") 
-            if not robot: 
-                return
-            try:
-                if not local_map_canvas.winfo_exists(): 
-                    return
-                w_local = local_map_canvas.winfo_width()
-                h_local = local_map_canvas.winfo_height()
-            except tk.TclError:
-                return 
-            if w_local <= 1 or h_local <= 1:
-                return
-
-            local_map_canvas.delete("all")
-            
-            # 1. Draw Soccer Lines (Full Field View)
-            self.draw_soccer_lines(local_map_canvas, w_local, h_local, 
-                                   self.global_world.field_dimensions, 
-                                   view_center_m=None, view_range_m=None) # view_...=None for full field
-            
-            # 2. Draw ONLY the current detailed robot, highlighted
-            #    Pass it as a list containing just this one robot.
-            self.draw_robots_on_field(local_map_canvas, [robot], w_local, h_local, # MODIFIED: Only current robot
-                                       self.global_world.field_dimensions,
-                                       view_center_m=None, view_range_m=None, 
-                                       highlight_robot_id=robot.robot_id) 
-            
-            # 3. Draw the ball AS PERCEIVED BY THIS ROBOT
-            if robot.local_ball_position: # This is from the robot's own sensors
-                 self.draw_ball_on_field(local_map_canvas, robot.local_ball_position, w_local, h_local,
-                                        self.global_world.field_dimensions,
-                                        view_center_m=None, view_range_m=None)
-
-            # 4. Draw obstacles AS PERCEIVED BY THIS ROBOT
-            if robot.local_obstacles: # These are from the robot's own sensors
-                # Assuming robot.local_obstacles is a list of [x, y] coordinates
-                # These will be drawn as generic obstacles.
-                self.draw_obstacles_on_field(local_map_canvas, robot.local_obstacles, w_local, h_local,
-                                             self.global_world.field_dimensions,
-                                             view_center_m=None, view_range_m=None)
-            # print(f"DEBUG: Local map for {robot.name} updated. Ball: {robot.local_ball_position}, Obstacles: {len(robot.local_obstacles)}")
-
-        # Store references and schedule initial draw
-        robot.local_map_canvas = local_map_canvas # Store on the robot object
-        robot.update_local_map_display_func = update_local_map_display # Store on the robot object
-
-        local_map_canvas.bind("<Configure>", update_local_map_display)
-        # Use 'after' on the detail_window or root to schedule the first draw.
-        # Ensure it's called after the window is likely visible and sized.
-        detail_window.after(100, update_local_map_display) 
-
-        control_frame = tk.Frame(detail_window, pady=10)
-        control_frame.pack(fill=tk.X)
-        tk.Button(control_frame, text="Test Kick Angle", command=lambda: self.test_robot("test_kick_angle"), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
-        tk.Button(control_frame, text="Charge", command=lambda: self.test_robot("charge"), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
-        tk.Button(control_frame, text="Kick", command=lambda: self.test_robot("kick"), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
-        tk.Button(control_frame, text="Close", command=detail_window.destroy, font=("Arial", 9, "bold")).pack(side=tk.RIGHT, padx=10)
+        window = self.detail_windows.get(robot.robot_id)
+        if window and window.exists():
+            window.show()
+        else:
+            max_rate_hz = self.config.get('detail_view', {}).get('max_rate_hz', 10)
+            self.detail_windows[robot.robot_id] = RobotDetailWindow(self, robot, max_rate_hz)
 
-        movement_controls_frame = tk.Frame(detail_window, pady=5)
-        movement_controls_frame.pack()
-        btn_font = ("Arial", 10)
-        btn_width = 4
-        tk.Button(movement_controls_frame, text="↑", width=btn_width, font=btn_font, command=lambda: self.move_robot("forward")).grid(row=0, column=1, padx=2, pady=2)
-        tk.Button(movement_controls_frame, text="←", width=btn_width, font=btn_font, command=lambda: self.move_robot("left")).grid(row=1, column=0, padx=2, pady=2)
-        tk.Button(movement_controls_frame, text="Stop", width=btn_width, font=btn_font, command=lambda: self.move_robot("stop")).grid(row=1, column=1, padx=2, pady=2)
-        tk.Button(movement_controls_frame, text="→", width=btn_width, font=btn_font, command=lambda: self.move_robot("right")).grid(row=1, column=2, padx=2, pady=2)
-        tk.Button(movement_controls_frame, text="↓", width=btn_width, font=btn_font, command=lambda: self.move_robot("backward")).grid(row=2, column=1, padx=2, pady=2)
-        tk.Button(movement_controls_frame, text="⟲", width=btn_width, font=btn_font, command=lambda: self.move_robot("rotate_left")).grid(row=1, column=3, padx=5, pady=2) 
-        tk.Button(movement_controls_frame, text="⟳", width=btn_width, font=btn_font, command=lambda: self.move_robot("rotate_right")).grid(row=1, column=4, padx=5, pady=2)
-        
-        # print(f"DEBUG: show_robot_detail for {robot.name} window setup finished.") # DEBUG
+    def show_telemetry_plot(self, robot):
+        if not self.telemetry:
+            messagebox.showinfo("Telemetry", "Telemetry plots need NumPy.")
+            return
+        window = self.telemetry_windows.get(robot.robot_id)
+        if window and window.exists():
+            window.show()
+        else:
+            self.telemetry_windows[robot.robot_id] = TelemetryPlotWindow(self, robot)
 
-    def refresh_robot_detail_view(self):
-        if self.current_detailed_robot and \
-           hasattr(self.current_detailed_robot, 'local_map_canvas') and \
-           self.current_detailed_robot.local_map_canvas.winfo_exists() and \
-           hasattr(self.current_detailed_robot, 'update_local_map_display_func'):
-            
-            # Update parameter display
-            if self.robot_param_labels: # Check if the dict itself exists
-                 for param, value in self.current_detailed_robot.parameters.items():
-                     if param in self.robot_param_labels and self.robot_param_labels[param].winfo_exists():
-                         self.robot_param_labels[param].config(text=str(value))
-            # Update map
-            self.current_detailed_robot.update_local_map_display_func()
-        # else:
-            # print("DEBUG: refresh_robot_detail_view: No current_detailed_robot or its canvas/func is missing/destroyed.")
+    def refresh_robot_detail_view(self, force=False):
+        # Hidden and iconified windows skip themselves; visible ones redraw at most max_rate_hz
+        now = time.monotonic()
+        for window in self.detail_windows.values():
+            window.refresh(now, force=force)
 
     # ... (open_parameters_window and other methods - assumed mostly unchanged, check for parent=param_window in messageboxes) ...
-    def open_parameters_window(self):
-        if not self.current_detailed_robot:
-            if not self.robots:
-                messagebox.showerror("Error", "No robots available to configure.")
-                return
-            self.current_detailed_robot = self.robots[0] 
+    def open_parameters_window(self, robot=None):
+        if robot is None:
+            if not self.current_detailed_robot:
+                if not self.robots:
+                    messagebox.showerror("Error", "No robots available to configure.")
+                    return
+                self.current_detailed_robot = self.robots[0] 
+            robot = self.current_detailed_robot
 
         param_window = tk.Toplevel(self.root)
-        param_window.title(f"Parameters - {self.current_detailed_robot.name}")
+        param_window.title(f"Parameters - {robot.name}")
         param_window.geometry("450x550") 
         param_window.transient(self.root) 
         param_window.grab_set() 
@@ -582,13 +412,23 @@ class BaseStationUI:
         main_param_frame = tk.Frame(param_window, padx=15, pady=15)
         main_param_frame.pack(fill=tk.BOTH, expand=True)
         
-        tk.Label(main_param_frame, text=f"Configure Parameters for {self.current_detailed_robot.name}", font=("Arial", 13, "bold")).pack(pady=(0,15))
+        tk.Label(main_param_frame, text=f"Configure Parameters for {robot.name}", font=("Arial", 13, "bold")).pack(pady=(0,5))
+        # Versioned sync with the robot (param_sync.py); not in multiprocess mode, where robots live in the worker
+        param_sync = getattr(self.logic, 'param_sync', None)
+        sync_label = tk.Label(main_param_frame, font=("Arial", 9), fg="grey")
+        sync_label.pack(pady=(0,10))
+
+        def show_sync_state():
+            if param_sync and sync_label.winfo_exists():
+                sync_label.config(text=param_sync.describe(robot))
+                param_window.after(500, show_sync_state)
+        show_sync_state()
 
         entries_frame = tk.Frame(main_param_frame)
         entries_frame.pack(fill=tk.X)
 
         entries = {}
-        for i, (param, value) in enumerate(self.current_detailed_robot.parameters.items()):
+        for i, (param, value) in enumerate(robot.parameters.items()):
             row_frame = tk.Frame(entries_frame)
             row_frame.pack(fill=tk.X, pady=3)
             tk.Label(row_frame, text=param.replace('_', ' ').title() + ":", width=25, anchor="w", font=("Arial", 10)).pack(side=tk.LEFT)
@@ -613,48 +453,63 @@ class BaseStationUI:
                     except ValueError:
                         updated_params[param] = value_str 
                 
-                self.current_detailed_robot.set_parameters(updated_params)
-                self.refresh_robot_detail_view() 
+                robot.set_parameters(updated_params)
+                self.refresh_robot_detail_view(force=True)
                 if 'battery_level' in updated_params and \
-                   hasattr(self.current_detailed_robot, 'battery_label') and \
-                   self.current_detailed_robot.battery_label.winfo_exists():
-                    self.current_detailed_robot.battery_label.config(text=f"Batt: {updated_params['battery_level']}%")
+                   hasattr(robot, 'battery_label') and \
+                   robot.battery_label.winfo_exists():
+                    robot.battery_label.config(text=f"Batt: {updated_params['battery_level']}%")
 
-                self.log_message(f"Parameters for {self.current_detailed_robot.name} updated locally.\n")
+                self.log_message(f"Parameters for {robot.name} updated locally.\n")
             except ValueError:
                 messagebox.showerror("Error", "Invalid parameter value. Please enter appropriate values.", parent=param_window)
 
         def send_parameters_to_robot():
             save_current_parameters() 
-            self.log_message(f"Sending parameters to {self.current_detailed_robot.name}:\n")
+            if param_sync:
+                # Only values the robot doesn't already hold go out; the log shows its confirmation
+                param_sync.update(robot, robot.parameters)
+                param_sync.flush()
+                messagebox.showinfo("Sent", f"Changed parameters sent to {robot.name}.", parent=param_window)
+                return
+            self.log_message(f"Sending parameters to {robot.name}:\n")
             param_data_to_send = {}
-            for param, val in self.current_detailed_robot.parameters.items():
+            for param, val in robot.parameters.items():
                 self.log_message(f"  {param}: {val}\n")
                 param_data_to_send[param] = val
             
             if param_data_to_send:
                  msg_to_send = json.dumps({"type": "set_parameters", "parameters": param_data_to_send})
-                 self.current_detailed_robot.send_to_robot(msg_to_send)
-            messagebox.showinfo("Sent", f"Parameters sent to {self.current_detailed_robot.name}.", parent=param_window)
+                 robot.send_to_robot(msg_to_send, PRIORITY_PARAMETERS)
+            messagebox.showinfo("Sent", f"Parameters sent to {robot.name}.", parent=param_window)
 
         def send_to_all_robots():
             save_current_parameters() 
-            current_params = self.current_detailed_robot.parameters.copy()
+            current_params = robot.parameters.copy()
             
             num_sent = 0
+            if param_sync:
+                # One patch per robot with whatever differs from what it holds, all sent in one pass
+                for rbt in self.robots:
+                    if rbt.connected:
+                        param_sync.update(rbt, current_params)
+                        num_sent += 1
+                param_sync.flush()
+                messagebox.showinfo("Sent to All", f"Changed parameters sent to {num_sent} connected robots.", parent=param_window)
+                return
             for rbt in self.robots: # Renamed to rbt to avoid conflict
                 if rbt.connected:
                     rbt.set_parameters(current_params) 
                     param_data_to_send = current_params
                     msg_to_send = json.dumps({"type": "set_parameters", "parameters": param_data_to_send})
-                    rbt.send_to_robot(msg_to_send)
+                    rbt.send_to_robot(msg_to_send, PRIORITY_PARAMETERS)
                     self.log_message(f"Sent parameters to {rbt.name}\n")
                     num_sent +=1
             messagebox.showinfo("Sent to All", f"Parameters sent to {num_sent} connected robots.", parent=param_window)
 
         def save_params_to_file_action():
             save_current_parameters() 
-            self.save_parameters_to_file(self.current_detailed_robot.parameters, parent_window=param_window)
+            self.save_parameters_to_file(robot.parameters, parent_window=param_window)
 
         def load_params_from_file_action():
             loaded_params = self.load_parameters_from_file(parent_window=param_window)
@@ -710,28 +565,28 @@ class BaseStationUI:
                 return None
         return None
 
-    def move_robot(self, direction):
-        # ... (No changes, but ensure self.current_detailed_robot is valid) ...
-        if self.current_detailed_robot and self.current_detailed_robot.connected:
+    def move_robot(self, direction, robot=None):
+        robot = robot or self.current_detailed_robot
+        if robot and robot.connected:
             msg = {"type": "move", "direction": direction}
-            self.current_detailed_robot.send_to_robot(json.dumps(msg))
-            self.log_message(f"Move command '{direction}' sent to {self.current_detailed_robot.name}\n")
-        elif not self.current_detailed_robot :
+            robot.send_to_robot(json.dumps(msg), PRIORITY_MOTION)
+            self.log_message(f"Move command '{direction}' sent to {robot.name}\n")
+        elif not robot:
              self.log_message("No robot selected for movement.\n")
         else:
-            self.log_message(f"Cannot move {self.current_detailed_robot.name}: Not connected.\n")
+            self.log_message(f"Cannot move {robot.name}: Not connected.\n")
 
 
-    def test_robot(self, test_action):
-        # ... (No changes, but ensure self.current_detailed_robot is valid) ...
-        if self.current_detailed_robot and self.current_detailed_robot.connected:
+    def test_robot(self, test_action, robot=None):
+        robot = robot or self.current_detailed_robot
+        if robot and robot.connected:
             msg = {"type": "test", "action": test_action}
-            self.current_detailed_robot.send_to_robot(json.dumps(msg))
-            self.log_message(f"Test command '{test_action}' sent to {self.current_detailed_robot.name}\n")
-        elif not self.current_detailed_robot :
+            robot.send_to_robot(json.dumps(msg), PRIORITY_DIAGNOSTICS)
+            self.log_message(f"Test command '{test_action}' sent to {robot.name}\n")
+        elif not robot:
              self.log_message("No robot selected for test command.\n")
         else:
-            self.log_message(f"Cannot test {self.current_detailed_robot.name}: Not connected.\n")
+            self.log_message(f"Cannot test {robot.name}: Not connected.\n")
 
     def save_log(self):
         # ... (No changes) ...
@@ -750,6 +605,10 @@ class BaseStationUI:
         # ... (No changes) ...
         if self.logging_text and self.logging_text.winfo_exists():
             self.logging_text.insert(tk.END, msg)
+            # Keep only the newest lines; the widget would otherwise grow for the whole match
+            lines = int(self.logging_text.index("end-1c").split(".")[0])
+            if lines > self.log_max_lines:
+                self.logging_text.delete("1.0", f"{lines - self.log_max_lines + 1}.0")
             self.logging_text.see(tk.END) 
 
     def play_pause(self):
@@ -761,7 +620,7 @@ class BaseStationUI:
         
         for robot_obj in self.robots: # Renamed to avoid conflict
             if robot_obj.connected:
-                robot_obj.send_to_robot(json.dumps({"type": "command", "command": command_type}))
+                robot_obj.send_to_robot(json.dumps({"type": "command", "command": command_type}), PRIORITY_SAFETY)
         if not any(r.connected for r in self.robots):
             self.log_message("No robots connected to send Play/Pause command.\n")
 
@@ -770,7 +629,7 @@ class BaseStationUI:
         self.log_message("Sending RESET POSITION command to all connected robots...\n")
         for robot_obj in self.robots: # Renamed to avoid conflict
             if robot_obj.connected:
-                robot_obj.send_to_robot(json.dumps({"type": "command", "command": "RESET_POSITION"}))
+                robot_obj.send_to_robot(json.dumps({"type": "command", "command": "RESET_POSITION"}), PRIORITY_SAFETY)
         if not any(r.connected for r in self.robots):
             self.log_message("No robots connected to send Reset Position command.\n")
 
@@ -779,16 +638,283 @@ class BaseStationUI:
         self.log_message("Sending CHECK CAMERA command to all connected robots...\n")
         for robot_obj in self.robots: # Renamed to avoid conflict
             if robot_obj.connected:
-                robot_obj.send_to_robot(json.dumps({"type": "command", "command": "CHECK_CAMERA"}))
+                robot_obj.send_to_robot(json.dumps({"type": "command", "command": "CHECK_CAMERA"}), PRIORITY_DIAGNOSTICS)
         if not any(r.connected for r in self.robots):
             self.log_message("No robots connected to send Camera Check command.\n")
             
     def update_robot_ui_elements(self):
         for robot_obj in self.robots: # Renamed variable
             if hasattr(robot_obj, 'status_label') and robot_obj.status_label.winfo_exists():
-                status_text = "Connected" if robot_obj.connected else "Disconnected"
-                status_color = "green" if robot_obj.connected else "red"
+                if robot_obj.connected and robot_obj.silent:
+                    status_text, status_color = "Silent", "orange" # Link up, but no status packets
+                else:
+                    status_text = "Connected" if robot_obj.connected else "Disconnected"
+                    status_color = "green" if robot_obj.connected else "red"
                 robot_obj.status_label.config(text=status_text, fg=status_color)
             if hasattr(robot_obj, 'battery_label') and robot_obj.battery_label.winfo_exists():
                 robot_obj.battery_label.config(text=f"Batt: {robot_obj.parameters.get('battery_level', 'N/A')}%")
-        self.refresh_robot_detail_view()
\ No newline at end of file
+        self.refresh_robot_detail_view()
+
+
+class RobotDetailWindow:
+    """Detail view of one robot. Built once per robot and reused: closing only withdraws it."""
+    def __init__(self, ui, robot, max_rate_hz=10):
+        self.ui = ui
+        self.robot = robot
+        self.min_interval_s = 1.0 / max_rate_hz
+        self.last_refresh = 0.0
+        self.shown_values = {} # label -> text last shown, so unchanged labels are not reconfigured
+
+        # Robot-centric map: follows the robot (heading up unless disabled); wheel zooms, wheel-drag pans
+        self.view_range_m = ui.local_map_view_range_m
+        self.rotate_with_heading = ui.config.get('detail_view', {}).get('rotate_with_heading', True)
+        self.pan_m = [0.0, 0.0] # View centre relative to the robot, along screen right/up
+        self.drag_from = None
+
+        self.window = tk.Toplevel(ui.root)
+        self.window.title(f"Detailed View - {robot.name}")
+        self.window.geometry("800x650")
+        self.window.transient(ui.root) # Keep on top
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+        # Buttons without an explicit robot (e.g. the parameters dialog) act on the focused window's robot
+        self.window.bind("<FocusIn>", lambda event: setattr(ui, 'current_detailed_robot', robot))
+
+        info_frame = tk.Frame(self.window, pady=5)
+        info_frame.pack(fill=tk.X)
+        tk.Label(info_frame, text=f"{robot.name}", font=("Arial", 16, "bold")).pack(side=tk.LEFT, padx=20)
+        self.status_label = tk.Label(info_frame, font=("Arial", 12, "bold"))
+        self.status_label.pack(side=tk.LEFT, padx=20)
+        self.battery_label = tk.Label(info_frame, font=("Arial", 12))
+        self.battery_label.pack(side=tk.LEFT, padx=20)
+        tk.Button(info_frame, text="Parameters...", command=lambda: ui.open_parameters_window(robot), font=("Arial", 10)).pack(side=tk.RIGHT, padx=20)
+        tk.Button(info_frame, text="Telemetry...", command=lambda: ui.show_telemetry_plot(robot), font=("Arial", 10)).pack(side=tk.RIGHT)
+
+        content_frame = tk.Frame(self.window)
+        content_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        self.param_display_frame = tk.LabelFrame(content_frame, text="Current Parameters", padx=10, pady=10)
+        self.param_display_frame.pack(side=tk.LEFT, fill=tk.Y, padx=(0,10))
+        self.param_labels = {}
+
+        local_map_frame = tk.Frame(content_frame)
+        local_map_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        tk.Label(local_map_frame, text="Local World Map (Robot's Perception)", font=("Arial", 11, "bold")).pack(pady=(0,5))
+        tk.Label(local_map_frame, text="Wheel: zoom   Wheel-drag: pan   Double-click: recentre", font=("Arial", 8)).pack()
+        self.local_map_canvas = tk.Canvas(local_map_frame, bg="#556B2F", relief=tk.SUNKEN, bd=1)
+        self.local_map_canvas.pack(fill=tk.BOTH, expand=True)
+        self.renderer = FieldRenderer(self.local_map_canvas, ui.global_world.field_dimensions)
+        canvas = self.local_map_canvas
+        canvas.bind("<Configure>", lambda event: self.refresh(force=True))
+        canvas.bind("<MouseWheel>", lambda event: self.zoom(1 if event.delta > 0 else -1)) # Windows/macOS
+        canvas.bind("<Button-4>", lambda event: self.zoom(1)) # X11
+        canvas.bind("<Button-5>", lambda event: self.zoom(-1))
+        canvas.bind("<ButtonPress-2>", self.start_pan)
+        canvas.bind("<B2-Motion>", self.pan)
+        canvas.bind("<Double-Button-1>", lambda event: self.reset_view())
+
+        control_frame = tk.Frame(self.window, pady=10)
+        control_frame.pack(fill=tk.X)
+        tk.Button(control_frame, text="Test Kick Angle", command=lambda: ui.test_robot("test_kick_angle", robot), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        tk.Button(control_frame, text="Charge", command=lambda: ui.test_robot("charge", robot), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        tk.Button(control_frame, text="Kick", command=lambda: ui.test_robot("kick", robot), font=("Arial", 9)).pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        tk.Button(control_frame, text="Close", command=self.hide, font=("Arial", 9, "bold")).pack(side=tk.RIGHT, padx=10)
+
+        movement_controls_frame = tk.Frame(self.window, pady=5)
+        movement_controls_frame.pack()
+        btn_font = ("Arial", 10)
+        btn_width = 4
+        move = ui.move_robot
+        tk.Button(movement_controls_frame, text="↑", width=btn_width, font=btn_font, command=lambda: move("forward", robot)).grid(row=0, column=1, padx=2, pady=2)
+        tk.Button(movement_controls_frame, text="←", width=btn_width, font=btn_font, command=lambda: move("left", robot)).grid(row=1, column=0, padx=2, pady=2)
+        tk.Button(movement_controls_frame, text="Stop", width=btn_width, font=btn_font, command=lambda: move("stop", robot)).grid(row=1, column=1, padx=2, pady=2)
+        tk.Button(movement_controls_frame, text="→", width=btn_width, font=btn_font, command=lambda: move("right", robot)).grid(row=1, column=2, padx=2, pady=2)
+        tk.Button(movement_controls_frame, text="↓", width=btn_width, font=btn_font, command=lambda: move("backward", robot)).grid(row=2, column=1, padx=2, pady=2)
+        tk.Button(movement_controls_frame, text="⟲", width=btn_width, font=btn_font, command=lambda: move("rotate_left", robot)).grid(row=1, column=3, padx=5, pady=2)
+        tk.Button(movement_controls_frame, text="⟳", width=btn_width, font=btn_font, command=lambda: move("rotate_right", robot)).grid(row=1, column=4, padx=5, pady=2)
+
+        self.refresh(force=True)
+
+    def exists(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def show(self):
+        self.window.deiconify()
+        self.window.lift()
+        self.refresh(force=True)
+
+    def hide(self):
+        self.window.withdraw()
+
+    def is_visible(self):
+        try:
+            return self.window.state() in ("normal", "zoomed")
+        except tk.TclError:
+            return False
+
+    def zoom(self, steps):
+        max_range_m = 1.5 * max(self.ui.global_world.field_dimensions)
+        self.view_range_m = min(max(self.view_range_m / 1.2 ** steps, 1.0), max_range_m)
+        self.refresh(force=True)
+
+    def start_pan(self, event):
+        self.drag_from = (event.x, event.y)
+
+    def pan(self, event):
+        if self.drag_from is None or self.renderer.view is None:
+            return
+        scale = self.renderer.scale_x
+        self.pan_m[0] -= (event.x - self.drag_from[0]) / scale
+        self.pan_m[1] += (event.y - self.drag_from[1]) / scale
+        self.drag_from = (event.x, event.y)
+        self.refresh(force=True)
+
+    def reset_view(self):
+        self.view_range_m = self.ui.local_map_view_range_m
+        self.pan_m = [0.0, 0.0]
+        self.refresh(force=True)
+
+    def view_center(self):
+        x, y = self.robot.position[0], self.robot.position[1]
+        if self.rotate_with_heading:
+            heading = self.robot.orientation
+            right = (math.sin(heading), -math.cos(heading))
+            up = (math.cos(heading), math.sin(heading))
+        else:
+            right, up = (1.0, 0.0), (0.0, 1.0)
+        return (x + self.pan_m[0] * right[0] + self.pan_m[1] * up[0],
+                y + self.pan_m[0] * right[1] + self.pan_m[1] * up[1])
+
+    def set_label(self, key, label, **options):
+        # Only touch the widget when its content changed
+        if self.shown_values.get(key) != options:
+            label.config(**options)
+            self.shown_values[key] = options
+
+    def refresh(self, now=None, force=False):
+        if now is None:
+            now = time.monotonic()
+        if not self.is_visible():
+            return
+        if not force and now - self.last_refresh < self.min_interval_s:
+            return
+        self.last_refresh = now
+        robot = self.robot
+
+        self.set_label("status", self.status_label,
+                       text=f"Status: {'Connected' if robot.connected else 'Disconnected'}",
+                       fg="green" if robot.connected else "red")
+        self.set_label("battery", self.battery_label, text=f"Battery: {robot.parameters.get('battery_level', 'N/A')}%")
+        for param, value in robot.parameters.items():
+            if param not in self.param_labels:
+                row = len(self.param_labels)
+                tk.Label(self.param_display_frame, text=param.replace('_', ' ').title() + ":", font=("Arial", 9)).grid(row=row, column=0, sticky="w", pady=2)
+                self.param_labels[param] = tk.Label(self.param_display_frame, font=("Arial", 9, "bold"))
+                self.param_labels[param].grid(row=row, column=1, sticky="e", padx=5, pady=2)
+            self.set_label(("param", param), self.param_labels[param], text=str(value))
+
+        # Local map around this robot (highlighted) with what it perceives itself; off-screen entities are culled
+        renderer = self.renderer
+        renderer.set_view(self.view_center(), self.view_range_m,
+                          self.robot.orientation if self.rotate_with_heading else None)
+        try:
+            if not renderer.begin():
+                return
+        except tk.TclError:
+            return
+        renderer.robots("robot", [robot], highlight_robot_id=robot.robot_id)
+        ball = robot.local_ball_position
+        if ball and len(ball) >= 2:
+            renderer.ball("ball", ball[0], ball[1])
+        renderer.obstacles("obstacle", robot.local_obstacles)
+        renderer.end()
+
+
+class TelemetryPlotWindow:
+    """Time plot of one telemetry column of a robot, whole match or recent. Reused like RobotDetailWindow."""
+    RANGES = {"Whole match": None, "Last 5 min": 300.0, "Last 60 s": 60.0}
+    REFRESH_MS = 1000
+
+    def __init__(self, ui, robot):
+        self.ui = ui
+        self.robot = robot
+        self.series = ui.telemetry.series_for(robot.robot_id)
+
+        self.window = tk.Toplevel(ui.root)
+        self.window.title(f"Telemetry - {robot.name}")
+        self.window.geometry("700x320")
+        self.window.protocol("WM_DELETE_WINDOW", self.hide)
+
+        controls = tk.Frame(self.window)
+        controls.pack(fill=tk.X, padx=5, pady=5)
+        self.column = tk.StringVar(value="battery")
+        tk.OptionMenu(controls, self.column, *TELEMETRY_COLUMNS, command=lambda value: self.refresh()).pack(side=tk.LEFT)
+        self.range_name = tk.StringVar(value="Whole match")
+        for name in self.RANGES:
+            tk.Radiobutton(controls, text=name, variable=self.range_name, value=name, command=self.refresh).pack(side=tk.LEFT)
+        self.summary_label = tk.Label(controls, font=("Arial", 9))
+        self.summary_label.pack(side=tk.RIGHT)
+
+        self.canvas = tk.Canvas(self.window, bg="white")
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda event: self.refresh())
+        # Retained items: the envelope polyline and axis labels are only moved/re-texted
+        self.line = self.canvas.create_line(0, 0, 0, 0, fill="#1f5fbf", state="hidden")
+        self.top_label = self.canvas.create_text(5, 5, anchor="nw", font=("Arial", 8))
+        self.bottom_label = self.canvas.create_text(5, 0, anchor="sw", font=("Arial", 8))
+        self.tick()
+
+    def exists(self):
+        try:
+            return bool(self.window.winfo_exists())
+        except tk.TclError:
+            return False
+
+    def show(self):
+        self.window.deiconify()
+        self.window.lift()
+        self.refresh()
+
+    def hide(self):
+        self.window.withdraw()
+
+    def tick(self):
+        if not self.exists():
+            return
+        if self.window.state() == "normal":
+            self.refresh()
+        self.window.after(self.REFRESH_MS, self.tick)
+
+    def refresh(self):
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width < 50 or height < 40:
+            return
+        window_s = self.RANGES[self.range_name.get()]
+        start = time.monotonic() - window_s if window_s else None
+        # One bin per two pixels: a min/max envelope that looks like the full-resolution plot
+        t, lo, hi = self.series.query(self.column.get(), start=start, max_points=max(width // 2, 10))
+        valid = ~(np.isnan(lo) | np.isnan(hi))
+        t, lo, hi = t[valid], lo[valid], hi[valid]
+        if len(t) < 2:
+            self.canvas.itemconfigure(self.line, state="hidden")
+            self.summary_label.config(text="No data")
+            return
+        t_first, t_last = (start if start is not None else t[0]), t[-1]
+        v_min, v_max = float(lo.min()), float(hi.max())
+        span_v = (v_max - v_min) or 1.0
+        margin = 15
+        xs = margin + (t - t_first) / max(t_last - t_first, 1e-9) * (width - 2 * margin)
+        ys_lo = height - margin - (lo - v_min) / span_v * (height - 2 * margin)
+        ys_hi = height - margin - (hi - v_min) / span_v * (height - 2 * margin)
+        points = np.empty((len(t) * 2, 2))
+        points[0::2, 0] = points[1::2, 0] = xs
+        points[0::2, 1] = ys_lo
+        points[1::2, 1] = ys_hi
+        self.canvas.coords(self.line, *points.ravel().tolist())
+        self.canvas.itemconfigure(self.line, state="normal")
+        self.canvas.itemconfigure(self.top_label, text=f"{v_max:.2f}")
+        self.canvas.coords(self.bottom_label, 5, height - 2)
+        self.canvas.itemconfigure(self.bottom_label, text=f"{v_min:.2f}")
+        self.summary_label.config(text=f"{t_last - t_first:.0f} s, {self.series.samples} samples")
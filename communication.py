@@ -1,8 +1,169 @@
+import errno
+import heapq
+import selectors
 import socket
 import threading
+import json
+import time
+from collections import deque
+
+# Commands understood from the MSL RefBox
+REFBOX_COMMANDS = {
+    "START", "STOP", "DROP_BALL", "PARK", "END_GAME", "GAME_OVER", "HALF_TIME", "RESET",
+    "FIRST_HALF", "SECOND_HALF", "FIRST_HALF_OVERTIME", "SECOND_HALF_OVERTIME", "WELCOME",
+    "KICKOFF", "FREEKICK", "GOALKICK", "THROWIN", "CORNER", "PENALTY",
+    "GOAL", "SUBGOAL", "REPAIR", "YELLOW_CARD", "DOUBLE_YELLOW", "RED_CARD", "SUBSTITUTION", "IS_ALIVE"
+}
+
+def decode_refbox_message(message):
+    """Split a RefBox message into (command, data).
+
+    Accepts the JSON protocol ({"command": "STOP", "targetTeam": ...}) as well as
+    a bare command word. command is None if the message carries no known command;
+    data is the decoded JSON dict, or None for plain-text messages.
+    """
+    text = message.strip().strip("\0")
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        command = str(data.get("command", "")).upper()
+    else:
+        data = None
+        command = text.upper()
+    return (command if command in REFBOX_COMMANDS else None), data
+
+def split_refbox_stream(buffer):
+    """Split buffered RefBox TCP data into (messages, remainder).
+
+    Messages are NUL- or newline-terminated. An unterminated tail is returned as
+    the remainder only while it looks like an incomplete JSON message; older
+    RefBox versions send bare, unterminated words, which are passed on as is.
+    """
+    parts = buffer.replace("\n", "\0").split("\0")
+    remainder = parts.pop()
+    if remainder.strip():
+        try:
+            json.loads(remainder)
+            complete = True
+        except ValueError:
+            complete = not remainder.lstrip().startswith("{")
+        if complete:
+            parts.append(remainder)
+            remainder = ""
+    return [part.strip() for part in parts if part.strip()], remainder
+
+def parse_refbox_command(message):
+    """Return the RefBox command in a message (e.g. "STOP"), or None if it carries none."""
+    return decode_refbox_message(message)[0]
+
+
+class NetworkLoop:
+    """One selector thread serving many sockets (e.g. every robot and RefBox link of several sessions).
+
+    Handlers given a loop register non-blocking sockets here instead of each
+    starting a receive thread. Callbacks run on the loop thread and must not
+    block. watch/unwatch may be called from any thread.
+    """
+    def __init__(self, name="network-loop"):
+        self.name = name
+        self.selector = selectors.DefaultSelector()
+        self.wakeup_receiver, self.wakeup_sender = socket.socketpair()
+        self.wakeup_receiver.setblocking(False)
+        self.selector.register(self.wakeup_receiver, selectors.EVENT_READ, self._drain_wakeup)
+        self.calls = deque() # (function, args) to run on the loop thread
+        self.timers = [] # heap of [when, sequence, function, args]
+        self.timer_sequence = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self._wake()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+
+    def in_loop(self):
+        return self.thread is threading.current_thread()
+
+    def call_soon(self, function, *args):
+        with self.lock:
+            self.calls.append((function, args))
+        self._wake()
+
+    def call_later(self, delay_s, function, *args):
+        with self.lock:
+            self.timer_sequence += 1
+            heapq.heappush(self.timers, [time.monotonic() + delay_s, self.timer_sequence, function, args])
+        self._wake()
+
+    def watch(self, sock, events, callback):
+        """Call callback(sock, mask) when sock is ready for events (selectors.EVENT_READ / EVENT_WRITE)."""
+        if not self.in_loop():
+            self.call_soon(self.watch, sock, events, callback)
+            return
+        try:
+            self.selector.modify(sock, events, callback)
+        except KeyError:
+            self.selector.register(sock, events, callback)
+
+    def unwatch(self, sock, close=False):
+        if not self.in_loop():
+            self.call_soon(self.unwatch, sock, close)
+            return
+        try:
+            self.selector.unregister(sock)
+        except (KeyError, ValueError):
+            pass
+        if close:
+            sock.close()
+
+    def _wake(self):
+        try:
+            self.wakeup_sender.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass # Already awake
+
+    def _drain_wakeup(self, sock, mask):
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _run(self):
+        while self.running:
+            with self.lock:
+                timeout = max(0.0, self.timers[0][0] - time.monotonic()) if self.timers else None
+            for key, mask in self.selector.select(timeout):
+                self._call(key.data, key.fileobj, mask)
+            with self.lock:
+                calls, self.calls = self.calls, deque()
+                now = time.monotonic()
+                while self.timers and self.timers[0][0] <= now:
+                    _, _, function, args = heapq.heappop(self.timers)
+                    calls.append((function, args))
+            for function, args in calls:
+                self._call(function, *args)
+        print(f"{self.name} stopped.")
+
+    def _call(self, function, *args):
+        try:
+            function(*args)
+        except Exception as e:
+            print(f"Error in {self.name} callback {getattr(function, '__qualname__', function)}: {e}")
+
 
 class WiFiHandler:
-    def __init__(self, remote_ip, remote_port, local_listen_port, on_receive_callback):
+    def __init__(self, remote_ip, remote_port, local_listen_port, on_receive_callback, network=None):
         self.remote_ip = remote_ip
         self.remote_port = remote_port
         self.local_listen_port = local_listen_port # Port for this handler to listen on
@@ -12,6 +173,7 @@ class WiFiHandler:
         self.receive_thread = None
         self.on_receive_callback = on_receive_callback
         self.is_listening = False
+        self.network = network # Shared NetworkLoop; None gives this handler its own receive thread
 
     def connect(self):
         try:
@@ -20,8 +182,12 @@ class WiFiHandler:
             self.socket.bind(('', self.local_listen_port))
             self.connected = True # Indicates socket is ready for sending
             self.is_listening = True
-            self.receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
-            self.receive_thread.start()
+            if self.network:
+                self.socket.setblocking(False)
+                self.network.watch(self.socket, selectors.EVENT_READ, self._on_readable)
+            else:
+                self.receive_thread = threading.Thread(target=self.receive_loop, daemon=True)
+                self.receive_thread.start()
             print(f"WiFiHandler for robot at {self.remote_ip} listening on port {self.local_listen_port}, sending to port {self.remote_port}")
             return True
         except Exception as e:
@@ -34,6 +200,9 @@ class WiFiHandler:
     def disconnect(self):
         self.is_listening = False
         self.connected = False
+        if self.socket and self.network:
+            self.network.unwatch(self.socket, close=True) # Closed on the loop thread, after unregistering
+            self.socket = None
         if self.socket:
             try:
                 # To unblock recvfrom, send a dummy packet to itself
@@ -54,10 +223,13 @@ class WiFiHandler:
 
 
     def send(self, message):
+        return self.send_bytes(message.encode())
+
+    def send_bytes(self, data):
         if self.socket and self.connected: # Check 'connected' for ability to send
             try:
-                self.socket.sendto(message.encode(), (self.remote_ip, self.remote_port))
-                # print(f"Sent to {self.remote_ip}:{self.remote_port}: {message}") # Optional: for debugging
+                self.socket.sendto(data, (self.remote_ip, self.remote_port))
+                # print(f"Sent to {self.remote_ip}:{self.remote_port}: {data}") # Optional: for debugging
                 return True
             except Exception as e:
                 print(f"Failed to send message to {self.remote_ip}:{self.remote_port}: {e}")
@@ -92,9 +264,24 @@ class WiFiHandler:
                 break
         print(f"Receive loop stopped for robot {self.remote_ip} on port {self.local_listen_port}.")
 
+    def _on_readable(self, sock, mask):
+        # Network loop callback: drain what is queued, but yield to other sockets after a burst
+        for _ in range(64):
+            try:
+                data, addr = sock.recvfrom(1024)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                if self.is_listening:
+                    print(f"Socket error for {self.remote_ip} on port {self.local_listen_port}: {e}")
+                return
+            if data and self.on_receive_callback:
+                with self.lock:
+                    self.on_receive_callback(data.decode())
+
 
 class RefBoxHandler:
-    def __init__(self, ip, port, on_receive_callback, on_disconnect_callback):
+    def __init__(self, ip, port, on_receive_callback, on_disconnect_callback, network=None):
         self.ip = ip
         self.port = port
         self.socket = None
@@ -102,8 +289,15 @@ class RefBoxHandler:
         self.running = False
         self.on_receive_callback = on_receive_callback
         self.on_disconnect_callback = on_disconnect_callback
+        self.network = network # Shared NetworkLoop; None gives the connection its own thread
+        self.buffer = ""
 
     def connect(self):
+        if self.network:
+            if not self.connected and not self.socket:
+                self.running = True
+                self.network.call_soon(self._start_connect)
+            return
         if not self.connected:
             self.running = True
             # Ensure the listening thread is only started once if connect is called multiple times
@@ -121,13 +315,16 @@ class RefBoxHandler:
                 if self.on_receive_callback: # Initial connection message
                     self.on_receive_callback("Connection Established with RefBox.")
 
+                buffer = ""
                 while self.running:
                     data = s.recv(1024)
                     if not data:
                         break
-                    message = data.decode("utf-8").strip()
-                    if message and self.on_receive_callback:
-                        self.on_receive_callback(message)
+                    buffer += data.decode("utf-8", errors="replace")
+                    messages, buffer = split_refbox_stream(buffer)
+                    for message in messages:
+                        if self.on_receive_callback:
+                            self.on_receive_callback(message)
         except ConnectionRefusedError:
             print(f"RefBox connection refused at {self.ip}:{self.port}.")
             if self.on_receive_callback:
@@ -146,12 +343,80 @@ class RefBoxHandler:
                 self.on_disconnect_callback()
             print("RefBox connection closed or failed.")
 
+    def _start_connect(self):
+        # Non-blocking connect on the network loop; completion is signalled by writability
+        if self.socket or not self.running:
+            return
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        self.socket = sock
+        self.buffer = ""
+        error = sock.connect_ex((self.ip, self.port))
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self._connection_closed(f"RefBox connection error: {errno.errorcode.get(error, error)}")
+            return
+        self.network.watch(sock, selectors.EVENT_WRITE, self._on_connected)
+
+    def _on_connected(self, sock, mask):
+        error = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if error == errno.ECONNREFUSED:
+            print(f"RefBox connection refused at {self.ip}:{self.port}.")
+            self._connection_closed(f"RefBox connection refused at {self.ip}:{self.port}.")
+            return
+        if error:
+            print(f"RefBox connection error: {errno.errorcode.get(error, error)}")
+            self._connection_closed(f"RefBox connection error: {errno.errorcode.get(error, error)}")
+            return
+        self.connected = True
+        self.network.watch(sock, selectors.EVENT_READ, self._on_readable)
+        print(f"Connected to RefBox at {self.ip}:{self.port}")
+        if self.on_receive_callback:
+            self.on_receive_callback("Connection Established with RefBox.")
+
+    def _on_readable(self, sock, mask):
+        try:
+            data = sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"RefBox connection error: {e}")
+            self._connection_closed(f"RefBox connection error: {e}")
+            return
+        if not data:
+            self._connection_closed()
+            return
+        self.buffer += data.decode("utf-8", errors="replace")
+        messages, self.buffer = split_refbox_stream(self.buffer)
+        for message in messages:
+            if self.on_receive_callback and self.running:
+                self.on_receive_callback(message)
+
+    def _connection_closed(self, message=None):
+        # Same callbacks, in the same order, as the end of _listen_loop
+        if self.socket:
+            self.network.unwatch(self.socket, close=True)
+            self.socket = None
+        self.connected = False
+        if message and self.on_receive_callback:
+            self.on_receive_callback(message)
+        if self.on_disconnect_callback:
+            self.on_disconnect_callback()
+        print("RefBox connection closed or failed.")
+
     def stop(self):
         self.running = False
-        if self.socket:
+        if self.network:
+            if self.socket:
+                self.network.unwatch(self.socket, close=True)
+                self.socket = None
+            self.connected = False
+            print("RefBox handler stopped.")
+            return
+        sock = self.socket # The listen thread clears self.socket as soon as shutdown() wakes it
+        if sock:
             try:
-                self.socket.shutdown(socket.SHUT_RDWR) # Gracefully shutdown
-                self.socket.close()
+                sock.shutdown(socket.SHUT_RDWR) # Gracefully shutdown
+                sock.close()
             except OSError as e:
                 print(f"Error closing RefBox socket: {e}")
             finally:
@@ -159,4 +424,168 @@ class RefBoxHandler:
         self.connected = False # Ensure connected is false
         if hasattr(self, 'listen_thread') and self.listen_thread.is_alive():
             self.listen_thread.join(timeout=1.0)
-        print("RefBox handler stopped.")
\ No newline at end of file
+        print("RefBox handler stopped.")
+
+# Outgoing traffic priority classes, highest first
+PRIORITY_SAFETY = 0       # Referee commands, STOP/PAUSE
+PRIORITY_MOTION = 1       # Movement and positioning commands
+PRIORITY_PARAMETERS = 2   # Parameter uploads
+PRIORITY_DIAGNOSTICS = 3  # Tests, camera checks, telemetry settings
+PRIORITY_NAMES = {PRIORITY_SAFETY: "safety", PRIORITY_MOTION: "motion",
+                  PRIORITY_PARAMETERS: "parameters", PRIORITY_DIAGNOSTICS: "diagnostics"}
+
+
+class TokenBucket:
+    """Byte-rate limiter: refills at rate bytes/s up to burst bytes."""
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def try_consume(self, amount, now):
+        self.refill(now)
+        # A message larger than the burst is let through once the bucket is full
+        if self.tokens >= min(amount, self.burst):
+            self.tokens -= amount
+            return True
+        return False
+
+    def force_consume(self, amount, now):
+        """Take tokens even if that drives the bucket negative (safety traffic)."""
+        self.refill(now)
+        self.tokens -= amount
+
+    def wait_time(self, amount):
+        needed = min(amount, self.burst) - self.tokens
+        return max(0.0, needed / self.rate) if self.rate > 0 else 1.0
+
+
+class OutboundScheduler:
+    """Non-blocking, priority-aware send queue drained on its own network thread.
+
+    submit() only enqueues, so UI callbacks never wait on a socket. The sender
+    thread always serves the highest priority class first. Every robot has a
+    token bucket; safety messages skip the rate check (but still use up tokens),
+    so their worst-case latency is one pass of the loop and never waits behind
+    a parameter upload. Lower classes wait for tokens. Once a robot has
+    max_queue_per_robot messages queued, a new message displaces the oldest
+    one of the lowest class that is not above its own; if there is none it is
+    dropped itself. Safety messages are never dropped and always queued.
+    """
+    def __init__(self, rate_bytes_per_s=20000, burst_bytes=4096, max_queue_per_robot=64):
+        self.rate_bytes_per_s = rate_bytes_per_s
+        self.burst_bytes = burst_bytes
+        self.max_queue_per_robot = max_queue_per_robot
+        self.queues = {priority: {} for priority in PRIORITY_NAMES} # priority -> {handler: deque}
+        self.buckets = {} # handler -> TokenBucket
+        self.condition = threading.Condition()
+        self.running = False
+        self.sender_thread = None
+        # Per-priority statistics: queueing latency (enqueue -> sendto) and drops
+        self.stats = {priority: {"sent": 0, "dropped": 0, "max_latency_s": 0.0, "last_latency_s": 0.0}
+                      for priority in PRIORITY_NAMES}
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.sender_thread = threading.Thread(target=self._send_loop, daemon=True)
+            self.sender_thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.sender_thread and self.sender_thread.is_alive():
+            self.sender_thread.join(timeout=1.0)
+
+    def submit(self, handler, message, priority=PRIORITY_MOTION, enqueued_at=None):
+        """Queue message for handler (a WiFiHandler). Never blocks on the network.
+
+        enqueued_at (time.monotonic()) lets callers measure latency from an
+        earlier event, e.g. the RefBox packet that caused this message.
+        """
+        if enqueued_at is None:
+            enqueued_at = time.monotonic()
+        with self.condition:
+            if self._queued_for(handler) >= self.max_queue_per_robot and not self._make_room(handler, priority):
+                self.stats[priority]["dropped"] += 1
+                return False
+            self.queues[priority].setdefault(handler, deque()).append((message.encode(), enqueued_at))
+            self.condition.notify()
+        return True
+
+    def _queued_for(self, handler):
+        return sum(len(queues.get(handler, ())) for queues in self.queues.values())
+
+    def _make_room(self, handler, priority):
+        """Drop handler's oldest message of the lowest class not above priority, never a safety one.
+        Returns False if a message of this priority has to be dropped instead."""
+        for lower in sorted(self.queues, reverse=True):
+            if lower < priority or lower == PRIORITY_SAFETY:
+                break
+            queue = self.queues[lower].get(handler)
+            if queue:
+                queue.popleft()
+                self.stats[lower]["dropped"] += 1
+                return True
+        return priority == PRIORITY_SAFETY # Over the limit rather than lose a STOP
+
+    def priority_stats(self, priority):
+        """Copy of the statistics of one priority class."""
+        with self.condition:
+            return dict(self.stats[priority])
+
+    def pending(self):
+        with self.condition:
+            return sum(len(q) for queues in self.queues.values() for q in queues.values())
+
+    def _bucket_for(self, handler):
+        bucket = self.buckets.get(handler)
+        if bucket is None:
+            bucket = self.buckets[handler] = TokenBucket(self.rate_bytes_per_s, self.burst_bytes)
+        return bucket
+
+    def _next_message(self, now):
+        """Pick the next sendable message, or return (None, wait_seconds)."""
+        wait = None
+        blocked = set() # Handlers whose head message of a higher class is waiting for tokens
+        for priority in sorted(self.queues):
+            for handler, queue in self.queues[priority].items():
+                if not queue or handler in blocked:
+                    continue # Lower classes must not use up the tokens the waiting message needs
+                data, enqueued_at = queue[0]
+                bucket = self._bucket_for(handler)
+                if priority == PRIORITY_SAFETY:
+                    bucket.force_consume(len(data), now)
+                elif not bucket.try_consume(len(data), now):
+                    blocked.add(handler)
+                    handler_wait = bucket.wait_time(len(data))
+                    wait = handler_wait if wait is None else min(wait, handler_wait)
+                    continue
+                queue.popleft()
+                return (priority, handler, data, enqueued_at), None
+        return None, wait
+
+    def _send_loop(self):
+        while True:
+            with self.condition:
+                if not self.running:
+                    break
+                item, wait = self._next_message(time.monotonic())
+                if item is None:
+                    self.condition.wait(timeout=wait)
+                    continue
+            priority, handler, data, enqueued_at = item
+            handler.send_bytes(data)
+            latency = time.monotonic() - enqueued_at
+            with self.condition:
+                stats = self.stats[priority]
+                stats["sent"] += 1
+                stats["last_latency_s"] = latency
+                stats["max_latency_s"] = max(stats["max_latency_s"], latency)
+        print("Outbound scheduler stopped.")
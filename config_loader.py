@@ -0,0 +1,51 @@
+import json
+
+# Reading config.json, kept free of Tk so the base station can bind its robot
+# sockets and connect the RefBox before the UI libraries are even imported.
+
+CONFIG_FILE = "config.json"
+
+
+def apply_defaults(config):
+    config.setdefault('refbox', {"ip": "127.0.0.1", "port": 28097})
+    config.setdefault('robots', [])
+    config.setdefault('field_dimensions', [12, 9])
+    config.setdefault('local_map_view_range_m', 6) 
+    config.setdefault('log_max_lines', 2000)
+    config.setdefault('telemetry', {})
+    config['telemetry'].setdefault('active_rate_hz', 50)
+    config['telemetry'].setdefault('idle_rate_hz', 2)
+    config.setdefault('scheduler', {"rate_bytes_per_s": 20000, "burst_bytes": 4096, "max_queue_per_robot": 64})
+    config.setdefault('game_state', {"dispatch_budget_ms": 5})
+    config.setdefault('positioning', {"cell_size_m": 0.5, "keep_away_m": 3.0})
+    config.setdefault('tracking', {})
+    config.setdefault('ball_filter', {})
+    config.setdefault('interception', {"enabled": True, "horizon_s": 3.0, "step_s": 0.05, "reach_m": 0.2,
+                                       "ball_friction": 0.6, "send_role_hints": False})
+    config.setdefault('shared_memory', {"enabled": False, "name": "basestation_world"})
+    config.setdefault('pipeline', {"mode": "threaded", "ring_slots": 8, "slot_size": 65536, "tick_ms": 30})
+    config.setdefault('heatmap', {"cell_m": 0.1, "refresh_s": 2, "export_dir": ""})
+    config.setdefault('trails', {"enabled": True, "seconds": 5, "capacity": 256})
+    config.setdefault('detail_view', {"max_rate_hz": 10, "rotate_with_heading": True})
+    config.setdefault('dashboard', {"enabled": False, "host": "0.0.0.0", "port": 8080, "max_rate_hz": 10})
+    config.setdefault('watchdog', {"enabled": True, "threshold_ms": 250, "interval_ms": 50,
+                                   "log_file": "stalls.log", "max_log_bytes": 1000000})
+    config.setdefault('telemetry_store', {"chunk_size": 4096, "chunks_in_memory": 16, "spill_dir": ""})
+    config.setdefault('planning', {"resolution_m": 0.05, "obstacle_radius_m": 0.25, "robot_radius_m": 0.25,
+                                   "planning_cell_m": 0.2, "time_budget_ms": 20})
+    config.setdefault('param_sync', {"retry_ms": 300, "max_attempts": 5})
+    config.setdefault('event_bus', {"metrics_interval_s": 10, "log_metrics": False})
+    config.setdefault('startup', {"connect_refbox": True, "target_first_telemetry_ms": 1500, "image_cache_dir": ".image_cache"})
+    return config
+
+
+def read_config(path=CONFIG_FILE):
+    """Config with defaults filled in. Raises FileNotFoundError or json.JSONDecodeError."""
+    with open(path, 'r') as f:
+        return apply_defaults(json.load(f))
+
+
+def config_error_message(path, error):
+    if isinstance(error, FileNotFoundError):
+        return f"Configuration file '{path}' not found."
+    return f"Error decoding JSON from '{path}'."
@@ -0,0 +1,301 @@
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import threading
+import time
+
+# Browser dashboard: an asyncio HTTP server that serves a small field view at
+# "/" and streams world updates over a WebSocket at "/ws". Runs on its own
+# thread and event loop; the base station hands it snapshots with publish().
+#
+# Each client first gets a full frame, then deltas against what that client
+# last received. A client is sent at most max_rate_hz frames per second and
+# always the newest snapshot: while a slow client is still draining, newer
+# snapshots replace older ones instead of queueing, so intermediate frames are
+# dropped rather than building up a backlog.
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+def flatten_snapshot(snapshot):
+    """Snapshot -> {entity key: value}, rounded to the cm so jitter does not defeat delta encoding.
+
+    The ball is left out until some robot has seen it (its position is only a placeholder before)."""
+    def r(values):
+        return [round(v, 2) for v in values] if values else values
+    entities = {"obstacles": [r(obs) for obs in snapshot["obstacles"]]}
+    if snapshot.get("ball_known", True):
+        entities["ball"] = r(snapshot["ball"])
+    for robot in snapshot["robots"]:
+        entities[f"robot:{robot['id']}"] = {"p": r(robot["position"]), "o": round(robot["orientation"], 2),
+                                            "c": robot["connected"], "b": robot["battery"]}
+    for opponent in snapshot["opponents"]:
+        entities[f"opp:{opponent['id']}"] = {"p": r(opponent["position"]), "v": r(opponent["velocity"])}
+    return entities
+
+
+def encode_frame(payload, opcode=0x1):
+    """Unmasked server-to-client WebSocket frame."""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 65536:
+        header += bytes([126]) + struct.pack("!H", length)
+    else:
+        header += bytes([127]) + struct.pack("!Q", length)
+    return header + payload
+
+
+async def read_frame(reader):
+    """Read one client frame; returns (opcode, payload)."""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class DashboardServer:
+    def __init__(self, field_dims, host="0.0.0.0", port=8080, max_rate_hz=10.0, send_timeout_s=5.0):
+        self.field_dims = list(field_dims)
+        self.host = host
+        self.port = port
+        self.min_interval_s = 1.0 / max_rate_hz
+        self.send_timeout_s = send_timeout_s
+        self.loop = None
+        self.thread = None
+        self.server = None
+        self.latest = None # (sequence, entities) of the newest snapshot
+        self.sequence = 0
+        self.clients = {} # writer -> asyncio.Event set when there is something new for that client
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def start(self):
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait(timeout=2.0)
+
+    def stop(self):
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(timeout=2.0)
+
+    def has_clients(self):
+        return bool(self.clients)
+
+    def publish(self, snapshot):
+        """Hand a world snapshot (GlobalWorldMap.snapshot()) to the server. Thread-safe, never blocks."""
+        if not self.loop or not self.clients:
+            return
+        entities = flatten_snapshot(snapshot)
+        self.loop.call_soon_threadsafe(self._set_latest, entities)
+
+    def _set_latest(self, entities):
+        self.sequence += 1
+        self.latest = (self.sequence, entities)
+        for wake in self.clients.values():
+            wake.set()
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, self.host, self.port))
+            print(f"Dashboard serving on http://{self.host}:{self.port}/")
+        except OSError as e:
+            print(f"Dashboard could not listen on {self.host}:{self.port}: {e}")
+            self.loop = None
+            ready.set()
+            return
+        ready.set()
+        self.loop.run_forever()
+        self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+        print("Dashboard stopped.")
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5.0)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        lines = request.decode("latin-1").split("\r\n")
+        parts = lines[0].split()
+        path = parts[1] if len(parts) > 1 else "/"
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        if path == "/ws" and headers.get("upgrade", "").lower() == "websocket" and "sec-websocket-key" in headers:
+            await self._serve_websocket(reader, writer, headers["sec-websocket-key"])
+        elif path == "/":
+            body = DASHBOARD_HTML.encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+                         + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+            await writer.drain()
+            writer.close()
+        else:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+    async def _serve_websocket(self, reader, writer, key):
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        await writer.drain()
+        wake = asyncio.Event()
+        self.clients[writer] = wake
+        receiver = asyncio.ensure_future(self._receive_loop(reader, writer))
+        receiver.add_done_callback(lambda _: wake.set())
+        try:
+            await self._send_loop(writer, receiver, wake)
+        except (ConnectionError, asyncio.TimeoutError, asyncio.CancelledError):
+            pass # Client went away, stalled past send_timeout_s, or the server is shutting down
+        finally:
+            self.clients.pop(writer, None)
+            receiver.cancel()
+            writer.close()
+
+    async def _send_loop(self, writer, receiver, wake):
+        sent_sequence = 0
+        sent = None # Entities as last sent to this client
+        writer.write(encode_frame(json.dumps({"type": "hello", "field": self.field_dims}).encode()))
+        await writer.drain()
+        while not receiver.done():
+            if self.latest is None or self.latest[0] == sent_sequence:
+                await wake.wait()
+                wake.clear()
+                continue
+            started = time.monotonic()
+            sequence, entities = self.latest
+            self.frames_dropped += max(0, sequence - sent_sequence - 1) if sent is not None else 0
+            if sent is None:
+                message = {"type": "full", "seq": sequence, "set": entities}
+            else:
+                changed = {k: v for k, v in entities.items() if sent.get(k) != v}
+                removed = [k for k in sent if k not in entities]
+                message = {"type": "delta", "seq": sequence, "set": changed, "del": removed}
+            writer.write(encode_frame(json.dumps(message, separators=(",", ":")).encode()))
+            await asyncio.wait_for(writer.drain(), timeout=self.send_timeout_s)
+            sent, sent_sequence = entities, sequence
+            self.frames_sent += 1
+            await asyncio.sleep(max(0.0, self.min_interval_s - (time.monotonic() - started)))
+
+    async def _receive_loop(self, reader, writer):
+        try:
+            while True:
+                opcode, payload = await read_frame(reader)
+                if opcode == 0x8: # Close
+                    writer.write(encode_frame(payload[:2], opcode=0x8))
+                    return
+                if opcode == 0x9: # Ping
+                    writer.write(encode_frame(payload, opcode=0xA))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return
+
+
+DASHBOARD_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Team Era Base Station</title>
+<style>
+  body { margin: 0; background: #222; color: #eee; font-family: Arial, sans-serif; }
+  #bar { padding: 6px 10px; background: #a8328d; font-weight: bold; }
+  canvas { display: block; margin: 10px auto; background: #3A5F0B; }
+</style>
+</head>
+<body>
+<div id="bar">Team Era Base Station <span id="status">connecting...</span></div>
+<canvas id="field" width="900" height="600"></canvas>
+<script>
+const canvas = document.getElementById("field");
+const ctx = canvas.getContext("2d");
+const status = document.getElementById("status");
+let field = [12, 9];
+let world = {};
+let dirty = false;
+
+function toPx(x, y) {
+  const margin = 10;
+  const sx = (canvas.width - 2 * margin) / field[0];
+  const sy = (canvas.height - 2 * margin) / field[1];
+  return [margin + (x + field[0] / 2) * sx, margin + (-y + field[1] / 2) * sy];
+}
+
+function dot(x, y, r, fill) {
+  const [px, py] = toPx(x, y);
+  ctx.beginPath(); ctx.arc(px, py, r, 0, 2 * Math.PI);
+  ctx.fillStyle = fill; ctx.fill(); ctx.strokeStyle = "white"; ctx.stroke();
+  return [px, py];
+}
+
+function draw() {
+  if (dirty) {
+    dirty = false;
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.strokeStyle = "white"; ctx.lineWidth = 2;
+    const [x0, y0] = toPx(-field[0] / 2, field[1] / 2);
+    const [x1, y1] = toPx(field[0] / 2, -field[1] / 2);
+    ctx.strokeRect(x0, y0, x1 - x0, y1 - y0);
+    ctx.beginPath(); ctx.moveTo((x0 + x1) / 2, y0); ctx.lineTo((x0 + x1) / 2, y1); ctx.stroke();
+    ctx.lineWidth = 1;
+    for (const obs of world.obstacles || []) dot(obs[0], obs[1], 4, "gray");
+    for (const [key, value] of Object.entries(world)) {
+      if (key.startsWith("robot:")) {
+        const [px, py] = dot(value.p[0], value.p[1], 8, value.c ? "blue" : "#557");
+        ctx.beginPath(); ctx.moveTo(px, py);
+        ctx.lineTo(px + 15 * Math.cos(value.o), py - 15 * Math.sin(value.o)); ctx.stroke();
+        ctx.fillStyle = "white"; ctx.fillText(key.slice(6), px - 3, py + 3);
+      } else if (key.startsWith("opp:")) {
+        dot(value.p[0], value.p[1], 8, "red");
+      }
+    }
+    if (world.ball) dot(world.ball[0], world.ball[1], 5, "orange");
+  }
+  requestAnimationFrame(draw);
+}
+
+function connect() {
+  const ws = new WebSocket(`ws://${location.host}/ws`);
+  ws.onopen = () => { status.textContent = "live"; };
+  ws.onclose = () => { status.textContent = "disconnected, retrying..."; setTimeout(connect, 1000); };
+  ws.onmessage = (event) => {
+    const msg = JSON.parse(event.data);
+    if (msg.type === "hello") { field = msg.field; world = {}; }
+    if (msg.type === "full") world = {};
+    Object.assign(world, msg.set || {});
+    for (const key of msg.del || []) delete world[key];
+    dirty = true;
+  };
+}
+
+connect();
+requestAnimationFrame(draw);
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,224 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+# In-process publish/subscribe between the network threads, the world fusion
+# and the UI.
+#
+# Topics are typed: each has a fixed set of fields and events are namedtuples
+# of them. A subscriber either gets a callback run on the publisher's thread
+# (only for cheap, thread-safe handlers) or its own bounded queue that it
+# drains from its own thread (the Tk loop drains the UI's). Each queue has a
+# policy for when it is full:
+#
+#   DROP_OLDEST  the oldest queued event is discarded (maxsize=1: latest only).
+#                The publisher never waits, so a slow consumer like the UI
+#                can't hold up ingestion; drops are counted.
+#   LOSSLESS     the publisher waits for room (backpressure), at most
+#                max_block_s, after which the event is dropped and counted
+#                so a stuck consumer can't wedge a network thread for good.
+#
+# metrics() gives per-topic throughput, drops and publish-to-consume lag;
+# publish_metrics() puts them on the BUS_METRICS topic at most every interval.
+
+DROP_OLDEST = "drop_oldest"
+LOSSLESS = "lossless"
+
+
+class Topic:
+    def __init__(self, name, event_name, fields):
+        self.name = name
+        self.event_type = namedtuple(event_name, fields)
+
+    def __repr__(self):
+        return f"Topic({self.name})"
+
+
+TELEMETRY = Topic("telemetry", "TelemetryEvent", ("robot_id", "status", "received_at")) # One robot status packet
+PARAM_REPLIES = Topic("param_replies", "ParamReplyEvent", ("robot_id", "message")) # param_ack / param_state from a robot
+PLAN_REQUESTS = Topic("plan_requests", "PlanRequestEvent", ("robot_id", "request")) # plan_request from a robot
+REFEREE = Topic("referee", "RefereeEvent", ("message", "connected")) # RefBox message and/or connection change (else None)
+COMMANDS = Topic("commands", "CommandEvent", ("robot_id", "message", "priority")) # Every message sent to a robot
+WORLD = Topic("world", "WorldEvent", ("time", "snapshot")) # GlobalWorldMap.snapshot() after each fusion tick
+LOG = Topic("log", "LogEvent", ("text",)) # Event log lines for the operator
+BUS_METRICS = Topic("bus_metrics", "BusMetricsEvent", ("metrics",))
+
+
+class TopicStats:
+    def __init__(self):
+        self.published = 0
+        self.dropped = 0
+        self.consumed = 0
+        self.window_published = 0 # Since the last metrics() call
+        self.window_lag_sum = 0.0
+        self.window_lag_max = 0.0
+        self.window_consumed = 0
+
+
+class Subscription:
+    def __init__(self, bus, topic, name, callback, policy, maxsize, max_block_s):
+        self.bus = bus
+        self.topic = topic
+        self.name = name
+        self.callback = callback
+        self.policy = policy
+        self.maxsize = max(1, maxsize)
+        self.max_block_s = max_block_s
+        self.queue = deque() # (published_at, event)
+        self.condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def offer(self, published_at, event):
+        """Called by the publisher."""
+        if self.callback:
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"Error in {self.topic.name} subscriber {self.name}: {e}")
+            lag = time.monotonic() - published_at
+            self.bus.record_consumed(self.topic, 1, lag, lag)
+            return
+        with self.condition:
+            if len(self.queue) >= self.maxsize:
+                if self.policy == LOSSLESS:
+                    self.condition.wait_for(lambda: len(self.queue) < self.maxsize or self.closed, self.max_block_s)
+                if self.closed:
+                    return
+                if len(self.queue) >= self.maxsize:
+                    self.dropped += 1
+                    self.bus.record_dropped(self.topic)
+                    if self.policy == LOSSLESS:
+                        return # Timed out: this event is lost, the queue keeps its order
+                    self.queue.popleft()
+            self.queue.append((published_at, event))
+            self.condition.notify()
+
+    def drain(self, limit=None):
+        """Queued events, oldest first (at most limit); never waits."""
+        with self.condition:
+            count = len(self.queue) if limit is None else min(limit, len(self.queue))
+            items = [self.queue.popleft() for _ in range(count)]
+            if items:
+                self.condition.notify_all() # Room for waiting LOSSLESS publishers
+        self._consumed(items)
+        return [event for _, event in items]
+
+    def get(self, timeout=None):
+        """Next event, waiting up to timeout; None if there is none."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.queue or self.closed, timeout) or not self.queue:
+                return None
+            item = self.queue.popleft()
+            self.condition.notify_all()
+        self._consumed([item])
+        return item[1]
+
+    def pending(self):
+        return len(self.queue)
+
+    def _consumed(self, items):
+        if items:
+            now = time.monotonic()
+            lags = [now - published_at for published_at, _ in items]
+            self.bus.record_consumed(self.topic, len(lags), sum(lags), max(lags))
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {} # topic name -> list of Subscription, replaced (not mutated) on change
+        self.stats = {} # topic name -> TopicStats
+        self.metrics_time = time.monotonic()
+        self.next_metrics = None
+
+    def subscribe(self, topic, name, callback=None, policy=DROP_OLDEST, maxsize=256, max_block_s=0.05):
+        """Subscribe to topic. With callback, it runs on the publishing thread; otherwise drain() the
+        returned Subscription's queue from the consumer's thread."""
+        subscription = Subscription(self, topic, name, callback, policy, maxsize, max_block_s)
+        with self.lock:
+            self.subscriptions[topic.name] = self.subscriptions.get(topic.name, []) + [subscription]
+            self.stats.setdefault(topic.name, TopicStats())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            current = self.subscriptions.get(subscription.topic.name, [])
+            self.subscriptions[subscription.topic.name] = [s for s in current if s is not subscription]
+        subscription.close()
+
+    def has_subscribers(self, topic):
+        return bool(self.subscriptions.get(topic.name))
+
+    def publish(self, topic, **fields):
+        """Build the topic's event from fields and hand it to every subscriber; returns the event."""
+        event = topic.event_type(**fields)
+        published_at = time.monotonic()
+        with self.lock:
+            stats = self.stats.get(topic.name)
+            if stats is None:
+                stats = self.stats[topic.name] = TopicStats()
+            stats.published += 1
+            stats.window_published += 1
+        for subscription in self.subscriptions.get(topic.name, ()):
+            subscription.offer(published_at, event)
+        return event
+
+    def record_dropped(self, topic):
+        with self.lock:
+            self.stats[topic.name].dropped += 1
+
+    def record_consumed(self, topic, count, lag_sum_s, lag_max_s):
+        with self.lock:
+            stats = self.stats[topic.name]
+            stats.consumed += count
+            stats.window_consumed += count
+            stats.window_lag_sum += lag_sum_s
+            stats.window_lag_max = max(stats.window_lag_max, lag_max_s)
+
+    def metrics(self, now=None):
+        """Per topic: totals, publish rate and consume lag since the previous call, and queue depths."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            elapsed = max(now - self.metrics_time, 1e-9)
+            self.metrics_time = now
+            result = {}
+            for name, stats in self.stats.items():
+                result[name] = {
+                    "published": stats.published,
+                    "dropped": stats.dropped,
+                    "rate_hz": stats.window_published / elapsed,
+                    "lag_ms_avg": stats.window_lag_sum / stats.window_consumed * 1000.0 if stats.window_consumed else 0.0,
+                    "lag_ms_max": stats.window_lag_max * 1000.0,
+                    "subscribers": {s.name: {"queued": s.pending(), "dropped": s.dropped}
+                                    for s in self.subscriptions.get(name, ())},
+                }
+                stats.window_published = stats.window_consumed = 0
+                stats.window_lag_sum = stats.window_lag_max = 0.0
+        return result
+
+    def publish_metrics(self, interval_s, now=None):
+        """Publish metrics() on BUS_METRICS if interval_s has passed since the last time."""
+        now = time.monotonic() if now is None else now
+        if self.next_metrics is None:
+            self.next_metrics = now + interval_s # The first report covers a full interval
+            return
+        if now < self.next_metrics:
+            return
+        self.next_metrics = now + interval_s
+        self.publish(BUS_METRICS, metrics=self.metrics(now))
+
+
+def format_metrics(metrics):
+    """One line per topic with traffic, for the log."""
+    lines = []
+    for name, m in sorted(metrics.items()):
+        if m["published"]:
+            lines.append(f"  {name}: {m['rate_hz']:.1f}/s, lag {m['lag_ms_avg']:.1f} ms avg / {m['lag_ms_max']:.1f} ms max, "
+                         f"{m['dropped']} dropped")
+    return "\n".join(lines)
@@ -0,0 +1,301 @@
+import math
+
+# Retained-item field rendering for Tk canvases.
+#
+# Canvas items are created once per entity and afterwards only moved
+# (coords) or restyled (itemconfigure), and only when something actually
+# changed. The field markings are laid out again only when the canvas is
+# resized or the view moves. A frame is drawn between begin() and end();
+# entities that were not drawn in a frame are hidden, not deleted, so they
+# can be reused.
+#
+# The view is either the whole field (default) or a window of range_m metres
+# around a centre point, optionally rotated so that a given heading points
+# up (set_view). In a window view, entities outside the canvas are culled
+# before any canvas item is touched.
+#
+# World coordinates are the base station's field frame: metres, origin at the
+# field centre, x towards the opponent goal, y up.
+
+CENTER_CIRCLE_RADIUS_M = 0.75
+GOAL_WIDTH_M = 0.6
+GOAL_DEPTH_PX = 5
+
+
+class FieldRenderer:
+    def __init__(self, canvas, field_dims, margin=10):
+        self.canvas = canvas
+        self.field_w, self.field_h = field_dims
+        self.margin = margin
+        self.width = 0
+        self.height = 0
+        self.scale_x = 1.0
+        self.scale_y = 1.0
+        self.view = None # (center_x, center_y, range_m, heading) or None for the whole field
+        self.angle = 0.0 # Rotation from field to screen, radians
+        self.cos_a = 1.0
+        self.sin_a = 0.0
+        self.offset_x = 0.0 # Screen position of world (0, 0) before rotation is applied
+        self.offset_y = 0.0
+        self.center = (0.0, 0.0)
+        self.cull_radius_m = 0.0
+        self.items = {} # key -> tuple of canvas item ids
+        self.drawn = {} # key -> arguments it was last drawn with
+        self.visible = set() # Keys currently shown
+        self.touched = set() # Keys drawn in the current frame
+        self.layout_version = 0 # Bumped whenever the transform changes
+        self.static_items = None
+
+    def set_view(self, center=None, range_m=None, heading=None):
+        """Show range_m metres around center (rotated so heading points up if given), or the whole field if center is None."""
+        view = None if center is None else (center[0], center[1], range_m, heading)
+        if view != self.view:
+            self.view = view
+            self._update_transform()
+
+    def resize(self, width=None, height=None):
+        """Take the canvas size (or the given one) and lay out the field markings again. Returns False if too small."""
+        if width is None:
+            width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return False
+        if (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self._update_transform()
+        return True
+
+    def _update_transform(self):
+        if self.width <= 1 or self.height <= 1:
+            return
+        if self.view is None:
+            self.scale_x = (self.width - 2 * self.margin) / self.field_w if self.field_w > 0 else 1
+            self.scale_y = (self.height - 2 * self.margin) / self.field_h if self.field_h > 0 else 1
+            self.angle = 0.0
+            self.offset_x = self.margin + self.field_w / 2 * self.scale_x
+            self.offset_y = self.margin + self.field_h / 2 * self.scale_y
+            self.center = (0.0, 0.0)
+        else:
+            center_x, center_y, range_m, heading = self.view
+            self.scale_x = self.scale_y = min(self.width, self.height) / range_m
+            self.angle = 0.0 if heading is None else math.pi / 2 - heading
+            self.offset_x = self.width / 2
+            self.offset_y = self.height / 2
+            self.center = (center_x, center_y)
+        self.cos_a = math.cos(self.angle)
+        self.sin_a = math.sin(self.angle)
+        # Half-diagonal of the canvas in metres: anything farther from the centre is off screen
+        self.cull_radius_m = math.hypot(self.width / self.scale_x, self.height / self.scale_y) / 2
+        self.layout_version += 1
+        self.layout_static()
+
+    def to_px(self, x, y):
+        dx, dy = x - self.center[0], y - self.center[1]
+        u = dx * self.cos_a - dy * self.sin_a
+        v = dx * self.sin_a + dy * self.cos_a
+        return self.offset_x + u * self.scale_x, self.offset_y - v * self.scale_y
+
+    def to_world(self, px, py):
+        u = (px - self.offset_x) / self.scale_x
+        v = (self.offset_y - py) / self.scale_y
+        return (self.center[0] + u * self.cos_a + v * self.sin_a,
+                self.center[1] - u * self.sin_a + v * self.cos_a)
+
+    def in_view(self, x, y, margin_px=10):
+        """Cheap visibility test in world coordinates; always True for the whole-field view."""
+        if self.view is None:
+            return True
+        dx, dy = x - self.center[0], y - self.center[1]
+        reach = self.cull_radius_m + margin_px / self.scale_x
+        if dx * dx + dy * dy > reach * reach:
+            return False
+        px, py = self.to_px(x, y)
+        return -margin_px <= px <= self.width + margin_px and -margin_px <= py <= self.height + margin_px
+
+    def layout_static(self):
+        """Field lines and goals; created on first use, then only moved."""
+        canvas = self.canvas
+        if self.static_items is None:
+            self.static_items = {
+                "border": canvas.create_polygon(0, 0, 0, 0, outline="white", fill="", width=2, tags="static"),
+                "center_line": canvas.create_line(0, 0, 0, 0, fill="white", width=2, tags="static"),
+                "center_circle": canvas.create_oval(0, 0, 0, 0, outline="white", width=2, tags="static"),
+                "own_goal": canvas.create_polygon(0, 0, 0, 0, fill="#4169E1", outline="#4169E1", tags="static"),
+                "opponent_goal": canvas.create_polygon(0, 0, 0, 0, fill="#FFD700", outline="#FFD700", tags="static"),
+            }
+        half_w, half_h = self.field_w / 2, self.field_h / 2
+        corners = [self.to_px(-half_w, half_h), self.to_px(half_w, half_h),
+                   self.to_px(half_w, -half_h), self.to_px(-half_w, -half_h)]
+        canvas.coords(self.static_items["border"], *[v for corner in corners for v in corner])
+        canvas.coords(self.static_items["center_line"], *self.to_px(0, half_h), *self.to_px(0, -half_h))
+        cx, cy = self.to_px(0, 0)
+        rx, ry = CENTER_CIRCLE_RADIUS_M * self.scale_x, CENTER_CIRCLE_RADIUS_M * self.scale_y
+        canvas.coords(self.static_items["center_circle"], cx - rx, cy - ry, cx + rx, cy + ry)
+        depth = GOAL_DEPTH_PX / self.scale_x
+        for key, goal_x in (("own_goal", -half_w), ("opponent_goal", half_w)):
+            goal = [self.to_px(goal_x - depth, GOAL_WIDTH_M / 2), self.to_px(goal_x + depth, GOAL_WIDTH_M / 2),
+                    self.to_px(goal_x + depth, -GOAL_WIDTH_M / 2), self.to_px(goal_x - depth, -GOAL_WIDTH_M / 2)]
+            canvas.coords(self.static_items[key], *[v for corner in goal for v in corner])
+        self._lower_layers()
+
+    def _lower_layers(self):
+        # Bottom to top: background images, field markings, everything else
+        self.canvas.tag_lower("static")
+        self.canvas.tag_lower("background")
+
+    def field_size_px(self):
+        """Size of the whole field in pixels at the current scale."""
+        return max(1, int(round(self.field_w * self.scale_x))), max(1, int(round(self.field_h * self.scale_y)))
+
+    # Frame
+
+    def begin(self):
+        """Start a frame. Returns False (draw nothing) if the canvas has no usable size yet."""
+        self.touched = set()
+        return self.resize()
+
+    def end(self):
+        """Hide everything that was not drawn in this frame."""
+        for key in self.visible - self.touched:
+            for item in self.items[key]:
+                self.canvas.itemconfigure(item, state="hidden")
+            self.drawn.pop(key, None)
+        self.visible = set(self.touched)
+
+    def _update(self, key, args, create, place):
+        """Create the items for key once, then re-place them only if args or the layout changed."""
+        self.touched.add(key)
+        args = (self.layout_version,) + args
+        if self.drawn.get(key) == args:
+            return
+        if key not in self.items:
+            self.items[key] = create()
+        if key not in self.visible:
+            for item in self.items[key]:
+                self.canvas.itemconfigure(item, state="normal")
+            self.visible.add(key)
+        place(self.items[key]) # After showing, so place() can hide parts again
+        self.drawn[key] = args
+
+    # Entities
+
+    def robot(self, key, x, y, orientation, fill, label, highlight=False, radius_px=8):
+        canvas = self.canvas
+
+        def create():
+            return (canvas.create_oval(0, 0, 0, 0, outline="white", width=1),
+                    canvas.create_line(0, 0, 0, 0, fill="white", width=2),
+                    canvas.create_text(0, 0, fill="black", font=("Arial", 7, "bold")),
+                    canvas.create_oval(0, 0, 0, 0, outline="yellow", width=2))
+
+        def place(items):
+            body, heading, text, ring = items
+            cx, cy = self.to_px(x, y)
+            r = radius_px
+            canvas.coords(body, cx - r, cy - r, cx + r, cy + r)
+            canvas.itemconfigure(body, fill=fill)
+            screen_orientation = orientation + self.angle
+            canvas.coords(heading, cx, cy, cx + 15 * math.cos(screen_orientation), cy - 15 * math.sin(screen_orientation))
+            canvas.coords(text, cx, cy)
+            canvas.itemconfigure(text, text=label)
+            canvas.coords(ring, cx - r - 3, cy - r - 3, cx + r + 3, cy + r + 3)
+            canvas.itemconfigure(ring, state="normal" if highlight else "hidden")
+
+        self._update(key, (x, y, orientation, fill, label, highlight), create, place)
+
+    def ball(self, key, x, y, radius_px=5):
+        if not self.in_view(x, y):
+            return
+        canvas = self.canvas
+
+        def create():
+            return (canvas.create_oval(0, 0, 0, 0, fill="orange", outline="black", width=1),)
+
+        def place(items):
+            cx, cy = self.to_px(x, y)
+            canvas.coords(items[0], cx - radius_px, cy - radius_px, cx + radius_px, cy + radius_px)
+
+        self._update(key, (x, y), create, place)
+
+    def obstacle(self, key, x, y, half_size_px=4):
+        canvas = self.canvas
+
+        def create():
+            return (canvas.create_rectangle(0, 0, 0, 0, fill="gray", outline="black"),)
+
+        def place(items):
+            cx, cy = self.to_px(x, y)
+            s = half_size_px
+            canvas.coords(items[0], cx - s, cy - s, cx + s, cy + s)
+
+        self._update(key, (x, y), create, place)
+
+    def trail(self, key, xs, ys, color, revision, width=1):
+        """One polyline through the points (xs, ys: NumPy arrays), re-placed only when revision changes."""
+        if len(xs) < 2:
+            return
+        canvas = self.canvas
+
+        def create():
+            item = canvas.create_line(0, 0, 0, 0, fill=color, width=width)
+            canvas.tag_lower(item) # Under the entities, above the field markings
+            self._lower_layers()
+            return (item,)
+
+        def place(items):
+            dx, dy = xs - self.center[0], ys - self.center[1]
+            px = self.offset_x + (dx * self.cos_a - dy * self.sin_a) * self.scale_x
+            py = self.offset_y - (dx * self.sin_a + dy * self.cos_a) * self.scale_y
+            flat = [None] * (2 * len(px))
+            flat[0::2] = px.tolist()
+            flat[1::2] = py.tolist()
+            canvas.coords(items[0], flat)
+
+        self._update(key, (revision,), create, place)
+
+    def background_image(self, key, image, revision):
+        """A PhotoImage covering the whole field (see field_size_px), under the field markings."""
+        canvas = self.canvas
+
+        def create():
+            item = canvas.create_image(0, 0, anchor="nw", tags="background")
+            self._lower_layers()
+            return (item,)
+
+        def place(items):
+            canvas.coords(items[0], *self.to_px(-self.field_w / 2, self.field_h / 2))
+            canvas.itemconfigure(items[0], image=image)
+
+        self._update(key, (revision,), create, place)
+
+    def intercept(self, key, robot_x, robot_y, x, y):
+        """Dashed line from a robot to where it will meet the ball, with a ring at that point."""
+        canvas = self.canvas
+
+        def create():
+            return (canvas.create_line(0, 0, 0, 0, fill="yellow", dash=(4, 3)),
+                    canvas.create_oval(0, 0, 0, 0, outline="yellow", width=2))
+
+        def place(items):
+            rx, ry = self.to_px(robot_x, robot_y)
+            px, py = self.to_px(x, y)
+            canvas.coords(items[0], rx, ry, px, py)
+            canvas.coords(items[1], px - 7, py - 7, px + 7, py + 7)
+
+        self._update(key, (robot_x, robot_y, x, y), create, place)
+
+    def robots(self, prefix, robots, highlight_robot_id=None):
+        for robot in robots:
+            if not robot.position or len(robot.position) < 2:
+                continue
+            if not self.in_view(robot.position[0], robot.position[1]):
+                continue
+            self.robot(f"{prefix}:{robot.robot_id}", robot.position[0], robot.position[1], robot.orientation,
+                       robot.color, str(robot.robot_id), highlight=robot.robot_id == highlight_robot_id)
+
+    def obstacles(self, prefix, obstacles):
+        # Keyed by on-screen index: a pool of squares that grows to the largest number visible at once
+        i = 0
+        for obs in obstacles or ():
+            if obs and len(obs) >= 2 and self.in_view(obs[0], obs[1]):
+                self.obstacle(f"{prefix}:{i}", obs[0], obs[1])
+                i += 1
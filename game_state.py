@@ -0,0 +1,164 @@
+import json
+import time
+from communication import PRIORITY_SAFETY, PRIORITY_MOTION
+
+# Game states
+STATE_STOPPED = "STOPPED"     # Ball out of play, robots hold position
+STATE_PLAYING = "PLAYING"     # Ball in play
+STATE_SET_PIECE = "SET_PIECE" # Robots move to set-piece positions, waiting for START
+STATE_PARKED = "PARKED"       # Robots leave the field / go to their home positions
+STATE_ENDED = "ENDED"         # Half or game over
+
+SET_PIECE_COMMANDS = {"KICKOFF", "FREEKICK", "GOALKICK", "THROWIN", "CORNER", "PENALTY", "DROP_BALL"}
+HALF_START_COMMANDS = {"FIRST_HALF", "SECOND_HALF", "FIRST_HALF_OVERTIME", "SECOND_HALF_OVERTIME"}
+HALF_END_COMMANDS = {"HALF_TIME", "END_GAME", "GAME_OVER"}
+
+# RefBox command -> (new state, command sent to the robots). None keeps the current state / sends nothing.
+TRANSITIONS = {
+    "START": (STATE_PLAYING, "PLAY"),
+    "STOP": (STATE_STOPPED, "PAUSE"),
+    "PARK": (STATE_PARKED, "RESET_POSITION"),
+    "RESET": (STATE_STOPPED, "PAUSE"),
+    "FIRST_HALF": (STATE_STOPPED, "PAUSE"),
+    "SECOND_HALF": (STATE_STOPPED, "PAUSE"),
+    "FIRST_HALF_OVERTIME": (STATE_STOPPED, "PAUSE"),
+    "SECOND_HALF_OVERTIME": (STATE_STOPPED, "PAUSE"),
+    "HALF_TIME": (STATE_ENDED, "PAUSE"),
+    "END_GAME": (STATE_ENDED, "PAUSE"),
+    "GAME_OVER": (STATE_ENDED, "PAUSE"),
+}
+for _set_piece in SET_PIECE_COMMANDS:
+    TRANSITIONS[_set_piece] = (STATE_SET_PIECE, "SET_PIECE")
+
+
+class GameStateMachine:
+    """Tracks the game state from RefBox commands and fans out robot commands immediately.
+
+    on_refbox_command() is meant to be called on the RefBox network thread: it
+    does not touch Tk or print. Each dispatch is timed from the moment the
+    RefBox message was received; the time until every robot has its command
+    queued is checked against dispatch_budget_s, and the scheduler's safety
+    statistics measure the rest of the way to sendto() (see latency_report()).
+    Violations are counted and flagged in latency_report(); the state
+    listeners (BaseStationLogic) put them in the event log.
+
+    With a PositioningEngine and a world map, set pieces also send each robot
+    a MOVE_TO target looked up for the current ball position. The lookup
+    runs after the state command has gone to every robot, so a cache miss
+    (a full assignment) never counts against or delays that fan-out.
+    """
+    def __init__(self, robots, scheduler=None, team=None, dispatch_budget_s=0.005, positioning=None, world=None):
+        self.robots = robots
+        self.scheduler = scheduler
+        self.positioning = positioning
+        self.world = world
+        self.team = team # Our targetTeam id in RefBox messages; None treats every set piece as ours
+        self.dispatch_budget_s = dispatch_budget_s
+        self.state = STATE_STOPPED
+        self.last_command = None
+        self.set_piece = None       # e.g. "FREEKICK" while in STATE_SET_PIECE
+        self.set_piece_ours = None  # True if the set piece is for our team
+        self.state_listeners = []   # Called as listener(machine, command) on the network thread
+        self.dispatch_count = 0
+        self.budget_violations = 0
+        self.last_dispatch_latency_s = 0.0
+        self.max_dispatch_latency_s = 0.0
+        self.last_over_budget = False
+        self.last_placement_latency_s = 0.0 # Reception to the last MOVE_TO queued, for set pieces
+
+    def add_state_listener(self, listener):
+        self.state_listeners.append(listener)
+
+    def is_ours(self, target_team):
+        if not self.team or not target_team:
+            return True
+        return target_team == self.team
+
+    def on_refbox_command(self, command, data=None, received_at=None):
+        """Apply a RefBox command and dispatch the matching robot command.
+
+        data is the decoded RefBox message (dict) if any; received_at is the
+        time.monotonic() timestamp of reception. Returns True if robots were
+        commanded.
+        """
+        if received_at is None:
+            received_at = time.monotonic()
+        transition = TRANSITIONS.get(command)
+        self.last_command = command
+        if transition is None:
+            return False
+
+        new_state, robot_command = transition
+        target_team = (data or {}).get("targetTeam")
+        self.state = new_state
+        if new_state == STATE_SET_PIECE:
+            self.set_piece = command
+            self.set_piece_ours = self.is_ours(target_team)
+        elif new_state != STATE_PLAYING:
+            self.set_piece = None
+            self.set_piece_ours = None
+
+        message = {"type": "command", "command": robot_command, "refbox": command}
+        if self.set_piece:
+            message["set_piece"] = self.set_piece
+            message["ours"] = self.set_piece_ours
+        self.dispatch(json.dumps(message), received_at)
+        if new_state == STATE_SET_PIECE:
+            self.send_placements(self.placement_messages(command), received_at)
+
+        for listener in self.state_listeners:
+            try:
+                listener(self, command)
+            except Exception as e:
+                print(f"Game state listener error: {e}")
+        return True
+
+    def placement_messages(self, command):
+        """Per-robot MOVE_TO messages for the set piece, {robot_id: message}."""
+        if not self.positioning or not self.world:
+            return {}
+        if not getattr(self.world, 'ball_known', True) and self.set_piece != "KICKOFF":
+            return {} # Ball not seen yet: no placement for a guessed spot (a kick-off is at the centre anyway)
+        robot_ids = [robot.robot_id for robot in self.robots if robot.connected]
+        targets = self.positioning.targets(self.set_piece, self.set_piece_ours, self.world.ball_position, robot_ids)
+        return {robot_id: json.dumps({"type": "command", "command": "MOVE_TO", "refbox": command,
+                                      "target": [round(value, 3) for value in target]})
+                for robot_id, target in targets.items()}
+
+    def dispatch(self, message, received_at):
+        """Send message to every connected robot and record the latency against the budget."""
+        for robot in self.robots:
+            if robot.connected:
+                robot.send_to_robot(message, PRIORITY_SAFETY, enqueued_at=received_at)
+
+        latency = time.monotonic() - received_at
+        self.dispatch_count += 1
+        self.last_dispatch_latency_s = latency
+        self.max_dispatch_latency_s = max(self.max_dispatch_latency_s, latency)
+        self.last_over_budget = latency > self.dispatch_budget_s
+        if self.last_over_budget:
+            self.budget_violations += 1
+
+    def send_placements(self, placements, received_at):
+        for robot in self.robots:
+            if robot.connected and robot.robot_id in placements:
+                robot.send_to_robot(placements[robot.robot_id], PRIORITY_MOTION, enqueued_at=received_at)
+        self.last_placement_latency_s = time.monotonic() - received_at
+
+    def latency_report(self):
+        """Dispatch latency statistics; end-to-end numbers come from the scheduler's safety class."""
+        report = {
+            "state": self.state,
+            "dispatches": self.dispatch_count,
+            "budget_ms": self.dispatch_budget_s * 1000,
+            "budget_violations": self.budget_violations,
+            "last_dispatch_ms": self.last_dispatch_latency_s * 1000,
+            "last_over_budget": self.last_over_budget,
+            "last_placement_ms": self.last_placement_latency_s * 1000,
+            "max_dispatch_ms": self.max_dispatch_latency_s * 1000,
+        }
+        if self.scheduler:
+            safety = self.scheduler.priority_stats(PRIORITY_SAFETY)
+            report["last_send_ms"] = safety["last_latency_s"] * 1000
+            report["max_send_ms"] = safety["max_latency_s"] * 1000
+        return report
@@ -0,0 +1,133 @@
+import os
+import struct
+import threading
+import time
+import zlib
+import numpy as np
+
+# Time-weighted occupancy heatmaps of our robots, the opponents and the ball,
+# kept per half. Every world update adds the elapsed time to the cell under
+# each entity, so the cost per tick is O(entities) and a grid cell holds the
+# seconds spent there. The ball only counts while some robot sees it, not
+# while the filter holds its last position. Rendering (colormap + scaling)
+# only happens when an image is asked for.
+
+LAYERS = ("team", "opponents", "ball")
+FIELD_RGB = np.array([0x3A, 0x5F, 0x0B], dtype=np.float32) # Canvas background, shown where nothing was seen
+MAX_STEP_S = 0.5 # Longer gaps between updates (e.g. a stall) are not credited to the last positions
+
+
+def hot_colormap(size=256):
+    """Black-red-yellow-white lookup table, (size, 3) uint8."""
+    t = np.linspace(0.0, 1.0, size)
+    lut = np.stack([np.clip(3 * t, 0, 1), np.clip(3 * t - 1, 0, 1), np.clip(3 * t - 2, 0, 1)], axis=1)
+    return (lut * 255).astype(np.uint8)
+
+
+HOT = hot_colormap()
+
+
+def encode_png(rgb):
+    """Minimal RGB PNG encoder (zlib only), rgb: (h, w, 3) uint8."""
+    height, width, _ = rgb.shape
+    raw = b"".join(b"\x00" + rgb[row].tobytes() for row in range(height)) # Filter type 0 per row
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b""))
+
+
+class Heatmaps:
+    def __init__(self, field_dims, cell_m=0.1, half="FIRST_HALF"):
+        self.field_w, self.field_h = field_dims
+        self.cell_m = cell_m
+        self.nx = int(np.ceil(self.field_w / cell_m))
+        self.ny = int(np.ceil(self.field_h / cell_m))
+        self.halves = {} # half name -> {layer: (ny, nx) float32 seconds}
+        self.lock = threading.Lock() # start_half() may come from the RefBox thread
+        self.last_time = None
+        self.revision = 0 # Bumped on every accumulation, for renderers deciding whether to regenerate
+        self.start_half(half)
+
+    def start_half(self, half):
+        with self.lock:
+            if half not in self.halves:
+                self.halves[half] = {layer: np.zeros((self.ny, self.nx), dtype=np.float32) for layer in LAYERS}
+            self.half = half
+            self.last_time = None
+            self.revision += 1
+
+    def reset(self, half=None):
+        with self.lock:
+            for grid in self.halves[half or self.half].values():
+                grid.fill(0)
+            self.revision += 1
+
+    def cell(self, x, y):
+        ix = int((x + self.field_w / 2) / self.cell_m)
+        iy = int((y + self.field_h / 2) / self.cell_m)
+        if 0 <= ix < self.nx and 0 <= iy < self.ny:
+            return iy, ix
+        return None
+
+    def accumulate(self, world, robots, active=True, now=None):
+        """Credit the time since the previous call to the current positions. Nothing is counted while not active."""
+        if now is None:
+            now = time.monotonic()
+        if not active:
+            self.last_time = None
+            return
+        if self.last_time is None:
+            self.last_time = now
+            return
+        dt = min(now - self.last_time, MAX_STEP_S)
+        self.last_time = now
+        with self.lock:
+            grids = self.halves[self.half]
+            for layer, positions in (("team", [r.position for r in robots if r.connected]),
+                                     ("opponents", [track.position for track in world.opponents]),
+                                     ("ball", [world.ball_position] if world.ball_in_sight else [])):
+                grid = grids[layer]
+                for position in positions:
+                    if position and len(position) >= 2:
+                        cell = self.cell(position[0], position[1])
+                        if cell:
+                            grid[cell] += dt
+            self.revision += 1
+
+    def grid(self, layer, half=None):
+        with self.lock:
+            return self.halves[half or self.half][layer].copy()
+
+    def rgb(self, layer, width, height, half=None):
+        """Colormapped image of a layer, (height, width, 3) uint8, +y up, blended over the field colour."""
+        grid = self.grid(layer, half)
+        peak = grid.max()
+        level = np.sqrt(grid / peak) if peak > 0 else grid # sqrt so briefly visited areas still show
+        colour = HOT[(level * 255).astype(np.uint8)].astype(np.float32)
+        alpha = np.clip(level * 1.5, 0, 1)[..., None]
+        cells = (FIELD_RGB * (1 - alpha) + colour * alpha).astype(np.uint8)
+        # Colour at grid resolution, then scale up by nearest neighbour (a gather of whole rows and columns)
+        rows = ((np.arange(height) + 0.5) * self.ny / height).astype(int)[::-1] # Top image row = +y edge
+        cols = ((np.arange(width) + 0.5) * self.nx / width).astype(int)
+        return cells.take(rows, axis=0).take(cols, axis=1)
+
+    def ppm(self, layer, width, height, half=None):
+        """Binary PPM data for tk.PhotoImage(data=...)."""
+        return b"P6 %d %d 255\n" % (width, height) + self.rgb(layer, width, height, half).tobytes()
+
+    def export(self, directory, half=None, pixels_per_cell=4):
+        """Write heatmap_<half>_<layer>.png and .npy for every layer; returns the written paths."""
+        half = half or self.half
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for layer in LAYERS:
+            base = os.path.join(directory, f"heatmap_{half.lower()}_{layer}")
+            np.save(base + ".npy", self.grid(layer, half))
+            image = self.rgb(layer, self.nx * pixels_per_cell, self.ny * pixels_per_cell, half)
+            with open(base + ".png", "wb") as f:
+                f.write(encode_png(image))
+            paths += [base + ".npy", base + ".png"]
+        return paths
@@ -0,0 +1,70 @@
+import time
+import numpy as np
+
+# Recent pose history for trails: one fixed-size ring buffer per robot and one
+# for the fused ball. Memory is allocated once; old samples are overwritten.
+
+
+class PoseRing:
+    """Ring buffer of (t, x, y, theta) samples."""
+    def __init__(self, capacity):
+        self.data = np.zeros((capacity, 4), dtype=np.float64)
+        self.capacity = capacity
+        self.index = 0 # Next slot to write
+        self.count = 0
+        self.revision = 0 # Total samples ever appended; tells renderers when to update
+
+    def append(self, t, x, y, theta=0.0):
+        self.data[self.index] = (t, x, y, theta)
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.revision += 1
+
+    def ordered(self):
+        """All samples, oldest first."""
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return np.concatenate((self.data[self.index:], self.data[:self.index]))
+
+    def recent(self, seconds, now=None):
+        """Samples of the last `seconds`, oldest first."""
+        if now is None:
+            now = time.monotonic()
+        samples = self.ordered()
+        return samples[samples[:, 0] >= now - seconds]
+
+    def clear(self):
+        self.index = 0
+        self.count = 0
+        self.revision += 1
+
+
+class WorldHistory:
+    """Pose rings for the team's robots and the fused ball, filled once per world update."""
+    def __init__(self, capacity=256, min_step_m=0.01):
+        self.capacity = capacity
+        self.min_step_m = min_step_m # Samples closer than this to the previous one are skipped
+        self.robots = {} # robot_id -> PoseRing
+        self.ball = PoseRing(capacity)
+
+    def _append(self, ring, now, x, y, theta=0.0):
+        if ring.count:
+            last = ring.data[ring.index - 1]
+            if abs(last[1] - x) < self.min_step_m and abs(last[2] - y) < self.min_step_m:
+                last[0] = now # Standing still: keep the newest sample current instead of adding one
+                return
+        ring.append(now, x, y, theta)
+
+    def record(self, world, robots, now=None):
+        if now is None:
+            now = time.monotonic()
+        for robot in robots:
+            if not robot.connected or not robot.position or len(robot.position) < 2:
+                continue
+            ring = self.robots.get(robot.robot_id)
+            if ring is None:
+                ring = self.robots[robot.robot_id] = PoseRing(self.capacity)
+            self._append(ring, now, robot.position[0], robot.position[1], robot.orientation)
+        ball = world.ball_position
+        if world.ball_known and ball and len(ball) >= 2:
+            self._append(self.ball, now, ball[0], ball[1])
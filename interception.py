@@ -0,0 +1,85 @@
+import numpy as np
+
+# Time-to-ball for the whole team, vectorised over robots x future ball
+# positions. The ball rolls from the filtered position/velocity and slows
+# down exponentially (ball_friction, 1/s), staying inside the field. Each
+# robot starts from rest, accelerates at parameters["acceleration"] up to
+# parameters["max_speed"] and runs straight at the ball. A robot can
+# intercept at sample time t if it can get within reach_m of where the ball
+# will be at t; its interception time is the first such t.
+
+
+def travel_times(distance, max_speed, acceleration):
+    """Time to cover distance (..., M) from rest with per-robot limits (..., 1); trapezoidal profile."""
+    ramp_distance = max_speed ** 2 / (2 * acceleration) # Distance covered while reaching max_speed
+    accelerating = np.sqrt(2 * distance / acceleration)
+    cruising = max_speed / acceleration + (distance - ramp_distance) / max_speed
+    return np.where(distance <= ramp_distance, accelerating, cruising)
+
+
+class InterceptionPredictor:
+    def __init__(self, field_dims, horizon_s=3.0, step_s=0.05, reach_m=0.2, ball_friction=0.6, switch_margin_s=0.2):
+        self.half_w = field_dims[0] / 2
+        self.half_h = field_dims[1] / 2
+        self.times = np.arange(0.0, horizon_s + 1e-9, step_s) # (M,)
+        self.reach_m = reach_m
+        self.ball_friction = ball_friction
+        self.switch_margin_s = switch_margin_s # A new interceptor has to be this much faster to take over
+        if ball_friction > 0:
+            self.travel_factor = (1 - np.exp(-ball_friction * self.times)) / ball_friction
+        else:
+            self.travel_factor = self.times.copy()
+        self.interceptor_id = None
+
+    def ball_path(self, ball_position, ball_velocity):
+        """Predicted ball positions at self.times, (M, 2)."""
+        path = np.asarray(ball_position[:2], dtype=float) + np.outer(self.travel_factor, ball_velocity[:2])
+        np.clip(path[:, 0], -self.half_w, self.half_w, out=path[:, 0])
+        np.clip(path[:, 1], -self.half_h, self.half_h, out=path[:, 1])
+        return path
+
+    def intercept_times(self, positions, max_speeds, accelerations, path):
+        """Per robot: first time it can reach the ball (inf if not within the horizon) and the index of that sample."""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2) # (N, 2)
+        distance = np.hypot(path[None, :, 0] - positions[:, 0, None], path[None, :, 1] - positions[:, 1, None])
+        distance = np.maximum(distance - self.reach_m, 0.0) # (N, M)
+        needed = travel_times(distance, np.asarray(max_speeds, dtype=float)[:, None],
+                              np.asarray(accelerations, dtype=float)[:, None])
+        feasible = needed <= self.times[None, :]
+        first = feasible.argmax(axis=1)
+        reachable = feasible[np.arange(len(first)), first]
+        return np.where(reachable, self.times[first], np.inf), first
+
+    def predict(self, world, robots):
+        """Update world.interception with the team's best interceptor; returns it (or None)."""
+        team = [r for r in robots if r.connected and not r.silent and r.position and len(r.position) >= 2]
+        if not team or not world.ball_known: # Nothing to intercept before the ball has been seen
+            world.interception = None
+            self.interceptor_id = None
+            return None
+        path = self.ball_path(world.ball_position, world.ball_velocity)
+        times, first = self.intercept_times(
+            [r.position[:2] for r in team],
+            [max(float(r.parameters.get("max_speed", 2.0)), 0.1) for r in team],
+            [max(float(r.parameters.get("acceleration", 1.5)), 0.1) for r in team],
+            path)
+
+        best = int(np.argmin(times))
+        # Hysteresis: keep the current interceptor unless another robot is clearly faster
+        ids = [r.robot_id for r in team]
+        if self.interceptor_id in ids:
+            current = ids.index(self.interceptor_id)
+            if times[current] <= times[best] + self.switch_margin_s:
+                best = current
+        if not np.isfinite(times[best]):
+            world.interception = None
+            self.interceptor_id = None
+            return None
+        self.interceptor_id = ids[best]
+        world.interception = {
+            "robot_id": ids[best],
+            "time_s": float(times[best]),
+            "point": path[first[best]].tolist(),
+            "times": {robot_id: (float(t) if np.isfinite(t) else None) for robot_id, t in zip(ids, times)},
+        }
+        return world.interception
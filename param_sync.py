@@ -0,0 +1,220 @@
+import json
+import threading
+import time
+from communication import PRIORITY_PARAMETERS
+
+# Versioned parameter sets shared by the base station and each robot.
+#
+# The robot numbers its parameter set; every accepted change bumps the
+# version. The base station keeps, per robot, the values the operator wants
+# (desired) and the last set the robot confirmed (acked, at its version), and
+# only sends the difference:
+#
+#   base -> robot  {"type": "param_query"}
+#   robot -> base  {"type": "param_state", "version": 7, "parameters": {...}}
+#   base -> robot  {"type": "param_patch", "base": 7, "version": 8, "set": {"max_speed": 2.5}}
+#   robot -> base  {"type": "param_ack", "version": 8}
+#
+# A robot applies a patch only on top of the version it was computed from;
+# otherwise it answers with its full state and the base station diffs again.
+# One patch per robot is in flight at a time and is resent until acked, so
+# edits made meanwhile are coalesced into the next patch. Robots put
+# "param_version" in their status; when it differs from the acked version
+# (e.g. after a reboot) the base station queries the robot and re-applies the
+# operator's values. Robots that never answer a query get the old whole-set
+# "set_parameters" message instead.
+
+REPORTED_PARAMETERS = {"battery_level"} # Come from the robot's status, not settings to send
+
+
+class ParameterStore:
+    """Robot side: the versioned parameter set, answering param_query/param_patch messages."""
+    def __init__(self, parameters):
+        self.lock = threading.Lock()
+        self.parameters = dict(parameters)
+        self.version = 0
+
+    def state(self):
+        return {"type": "param_state", "version": self.version, "parameters": dict(self.parameters)}
+
+    def handle(self, message):
+        """Reply (a dict to send back) to a parameter message; None if there is nothing to answer."""
+        kind = message.get("type")
+        with self.lock:
+            if kind == "param_query":
+                return self.state()
+            if kind == "param_patch":
+                changes = message.get("set")
+                if message.get("base") == self.version and isinstance(changes, dict):
+                    self.parameters.update(changes)
+                    self.version = message.get("version", self.version + 1)
+                    return {"type": "param_ack", "version": self.version}
+                if message.get("version") == self.version:
+                    return {"type": "param_ack", "version": self.version} # Resent patch whose ack was lost
+                return self.state()
+            if kind == "set_parameters" and isinstance(message.get("parameters"), dict):
+                # Whole set from an older base station
+                self.parameters.update(message["parameters"])
+                self.version += 1
+        return None
+
+
+class RobotParameterSync:
+    """Base station side state for one robot."""
+    def __init__(self, robot):
+        self.robot = robot
+        self.desired = {} # Values set by the operator; the robot's own values stand for the rest
+        self.acked = None # Parameters the robot confirmed, None while unknown
+        self.version = None # The robot's version of acked
+        self.in_flight = None # {"version", "set", "sent_at", "attempts"} of the unacknowledged patch
+        self.query_sent_at = None
+        self.queries = 0 # Unanswered queries since the last state
+        self.legacy = False # Robot doesn't answer queries: send whole sets
+        self.legacy_dirty = False
+
+    def changes(self):
+        return {key: value for key, value in self.desired.items() if self.acked.get(key) != value}
+
+
+class ParameterSync:
+    """Keeps every robot's parameters in line with the operator's, sending compact patches."""
+    def __init__(self, robots, retry_s=0.3, max_attempts=5, log=print):
+        self.lock = threading.Lock() # Edits from the UI thread, acks from the network thread
+        self.retry_s = retry_s
+        self.max_attempts = max_attempts
+        self.log = log
+        self.states = {robot.robot_id: RobotParameterSync(robot) for robot in robots}
+
+    def update(self, robot, parameters):
+        """Set values for robot; they are sent by the next flush()."""
+        with self.lock:
+            state = self.states[robot.robot_id]
+            settings = {key: value for key, value in parameters.items() if key not in REPORTED_PARAMETERS}
+            state.desired.update(settings)
+            state.legacy_dirty = True
+            robot.parameters.update(settings)
+
+    def flush(self, now=None):
+        """Send pending changes of all robots, one patch each."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for state in self.states.values():
+                self._send_pending(state, now)
+
+    def reconcile(self, robot, now=None):
+        """Forget what the robot is known to hold and ask it (e.g. on (re)connect)."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            state = self.states[robot.robot_id]
+            state.acked = state.version = state.in_flight = None
+            state.queries = 0
+            self._query(state, now)
+
+    def describe(self, robot):
+        with self.lock:
+            state = self.states[robot.robot_id]
+            if state.legacy:
+                return "Robot does not report its parameters"
+            if state.acked is None:
+                return "Robot parameters unknown"
+            pending = len(state.changes())
+            return f"Robot holds version {state.version}" + (f", {pending} change(s) pending" if pending else ", in sync")
+
+    def tick(self, now=None):
+        """Resend unacknowledged patches and queries; call periodically."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for state in self.states.values():
+                if not state.robot.can_send():
+                    continue
+                flight = state.in_flight
+                if flight and now - flight["sent_at"] >= self.retry_s:
+                    if flight["attempts"] >= self.max_attempts:
+                        # Lost track of the robot's version: start over from its state
+                        state.acked = state.version = state.in_flight = None
+                        state.queries = 0
+                        self._query(state, now)
+                    else:
+                        self._send_patch(state, flight, now)
+                elif state.acked is None and not state.legacy and self._query_due(state, now):
+                    if state.queries >= self.max_attempts:
+                        state.legacy = True
+                        self.log(f"{state.robot.name} does not answer parameter queries; sending whole parameter sets.\n")
+                        self._send_pending(state, now)
+                    else:
+                        self._query(state, now)
+
+    # Messages from the robot (network thread)
+    def robot(self, robot_id):
+        state = self.states.get(robot_id)
+        return state.robot if state else None
+
+    def handle_message(self, robot, message, now=None):
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            state = self.states[robot.robot_id]
+            kind = message.get("type")
+            if kind == "param_ack":
+                flight = state.in_flight
+                if flight and message.get("version") == flight["version"]:
+                    state.acked.update(flight["set"])
+                    state.version = flight["version"]
+                    state.in_flight = None
+                    self.log(f"{robot.name} confirmed parameters version {state.version} "
+                             f"({', '.join(sorted(flight['set']))}).\n")
+                    self._send_pending(state, now)
+            elif kind == "param_state" and isinstance(message.get("parameters"), dict):
+                state.acked = dict(message["parameters"])
+                state.version = message.get("version", 0)
+                state.in_flight = None
+                state.queries = 0
+                state.legacy = False
+                # Show what the robot holds, except where the operator's values are about to replace it
+                robot.parameters.update({key: value for key, value in state.acked.items() if key not in state.desired})
+                self._send_pending(state, now)
+
+    def check_version(self, robot, version, now=None):
+        """Status packets carry the robot's version; a mismatch means it changed behind our back."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            state = self.states[robot.robot_id]
+            if not robot.can_send() or state.in_flight or (state.acked is not None and version == state.version):
+                return
+            if state.legacy: # It does keep a version after all (e.g. it was only unreachable)
+                state.legacy = False
+                state.queries = 0
+            if self._query_due(state, now):
+                self._query(state, now)
+
+    # Sending (with the lock held)
+    def _query_due(self, state, now):
+        return state.query_sent_at is None or now - state.query_sent_at >= self.retry_s
+
+    def _query(self, state, now):
+        state.query_sent_at = now
+        state.queries += 1
+        if state.robot.can_send():
+            state.robot.send_to_robot(json.dumps({"type": "param_query"}), PRIORITY_PARAMETERS)
+
+    def _send_pending(self, state, now):
+        if state.in_flight or not state.robot.can_send():
+            return
+        if state.legacy:
+            if state.legacy_dirty and state.desired:
+                state.robot.send_to_robot(json.dumps({"type": "set_parameters", "parameters": state.desired}), PRIORITY_PARAMETERS)
+                state.legacy_dirty = False
+            return
+        if state.acked is None:
+            return # Waiting for the robot's state
+        changes = state.changes()
+        if changes:
+            flight = {"version": state.version + 1, "set": changes, "sent_at": now, "attempts": 0}
+            state.in_flight = flight
+            self._send_patch(state, flight, now)
+
+    def _send_patch(self, state, flight, now):
+        flight["sent_at"] = now
+        flight["attempts"] += 1
+        state.robot.send_to_robot(json.dumps(
+            {"type": "param_patch", "base": flight["version"] - 1, "version": flight["version"], "set": flight["set"]},
+            separators=(",", ":")), PRIORITY_PARAMETERS)
@@ -0,0 +1,236 @@
+import heapq
+import math
+import time
+import numpy as np
+
+# Grids use the field frame of the base station: metres, origin at the field
+# centre. Arrays are indexed [iy, ix]; cell (ix, iy) covers
+# x in [-W/2 + ix*res, -W/2 + (ix+1)*res), and likewise for y.
+
+
+class OccupancyGrid:
+    """Incremental occupancy grid and clipped distance field over the field.
+
+    Obstacles are discs of obstacle_radius_m around the fused obstacle points.
+    distance holds, per cell, the distance (m) from the cell centre to the
+    nearest obstacle surface, clipped to max_distance_m. update() diffs the
+    new obstacle list against the previous one and only recomputes the
+    windows around obstacles that appeared or disappeared, so a tick where
+    nothing moved costs a set comparison.
+    """
+    def __init__(self, field_dims, resolution_m=0.05, obstacle_radius_m=0.25, max_distance_m=1.0):
+        self.field_w, self.field_h = field_dims
+        self.resolution_m = resolution_m
+        self.obstacle_radius_m = obstacle_radius_m
+        self.max_distance_m = max_distance_m
+        self.nx = int(math.ceil(self.field_w / resolution_m))
+        self.ny = int(math.ceil(self.field_h / resolution_m))
+        self.occupancy = np.zeros((self.ny, self.nx), dtype=np.uint8)
+        self.distance = np.full((self.ny, self.nx), max_distance_m, dtype=np.float32)
+        self.cell_x = -self.field_w / 2 + (np.arange(self.nx, dtype=np.float32) + 0.5) * resolution_m
+        self.cell_y = -self.field_h / 2 + (np.arange(self.ny, dtype=np.float32) + 0.5) * resolution_m
+        self.obstacles = set() # Obstacle centres, rounded to 1 cm so jitter-free points compare equal
+        self.obstacle_array = np.zeros((0, 2), dtype=np.float32)
+        self.version = 0 # Bumped whenever the grid changes, for consumers that cache derived data
+
+    def world_to_cell(self, x, y):
+        ix = int((x + self.field_w / 2) / self.resolution_m)
+        iy = int((y + self.field_h / 2) / self.resolution_m)
+        return min(max(ix, 0), self.nx - 1), min(max(iy, 0), self.ny - 1)
+
+    def cell_to_world(self, ix, iy):
+        return float(self.cell_x[ix]), float(self.cell_y[iy])
+
+    def update(self, obstacles):
+        """Bring the grid in line with obstacles (list of [x, y]). Returns the number of windows recomputed."""
+        new_obstacles = {(round(obs[0], 2), round(obs[1], 2)) for obs in obstacles if obs and len(obs) >= 2}
+        changed = new_obstacles ^ self.obstacles
+        if not changed:
+            return 0
+        self.obstacles = new_obstacles
+        self.obstacle_array = np.array(sorted(new_obstacles), dtype=np.float32).reshape(-1, 2)
+        reach = self.obstacle_radius_m + self.max_distance_m
+        for ox, oy in changed:
+            self._recompute_window(ox - reach, oy - reach, ox + reach, oy + reach)
+        self.version += 1
+        return len(changed)
+
+    def _recompute_window(self, x0, y0, x1, y1):
+        ix0, iy0 = self.world_to_cell(x0, y0)
+        ix1, iy1 = self.world_to_cell(x1, y1)
+        xs = self.cell_x[ix0:ix1 + 1]
+        ys = self.cell_y[iy0:iy1 + 1]
+        window = np.full((len(ys), len(xs)), self.max_distance_m + self.obstacle_radius_m, dtype=np.float32)
+        if len(self.obstacle_array):
+            reach = self.obstacle_radius_m + self.max_distance_m
+            obs = self.obstacle_array
+            near = obs[(obs[:, 0] > x0 - reach) & (obs[:, 0] < x1 + reach) &
+                       (obs[:, 1] > y0 - reach) & (obs[:, 1] < y1 + reach)]
+            for ox, oy in near:
+                np.minimum(window, np.hypot(xs[None, :] - ox, ys[:, None] - oy), out=window)
+        window -= self.obstacle_radius_m
+        self.occupancy[iy0:iy1 + 1, ix0:ix1 + 1] = window <= 0
+        self.distance[iy0:iy1 + 1, ix0:ix1 + 1] = np.clip(window, 0, self.max_distance_m)
+
+
+class PathPlanner:
+    """A* over a coarse clearance grid, smoothed any-angle (Theta*-style) on the path.
+
+    The search runs on planning_cell_m cells whose clearance is the minimum of
+    the fine distance field inside them, so a 22x14 m field at 5 cm becomes a
+    ~7.7k cell search. Cells closer than robot_radius_m to an obstacle are
+    blocked, and cells inside the safety margin cost extra. The resulting
+    cell path is string-pulled with line-of-sight checks on the same grid.
+    The heuristic is inflated by heuristic_weight (weighted A*), trading a
+    few percent of path length for far fewer expansions around long walls.
+    plan() gives up (returns None) after time_budget_s.
+    """
+    def __init__(self, grid, robot_radius_m=0.25, planning_cell_m=0.2, safety_margin_m=0.3,
+                 heuristic_weight=2.0, time_budget_s=0.02):
+        self.grid = grid
+        self.heuristic_weight = heuristic_weight
+        self.robot_radius_m = robot_radius_m
+        self.safety_margin_m = safety_margin_m
+        self.time_budget_s = time_budget_s
+        self.factor = max(1, int(round(planning_cell_m / grid.resolution_m)))
+        self.cell_m = self.factor * grid.resolution_m
+        self.cnx = int(math.ceil(grid.nx / self.factor))
+        self.cny = int(math.ceil(grid.ny / self.factor))
+        self.clearance = None
+        self.clearance_version = None
+        self.start_cells = frozenset() # Cells under the requesting robot, free for the current plan()
+        self.last_plan_time_s = 0.0
+
+    def _update_clearance(self):
+        if self.clearance_version == self.grid.version:
+            return
+        f = self.factor
+        padded = np.empty((self.cny * f, self.cnx * f), dtype=np.float32)
+        padded[:self.grid.ny, :self.grid.nx] = self.grid.distance
+        # Partial blocks at the far edges take the values of the last field row/column
+        if self.cny * f > self.grid.ny:
+            padded[self.grid.ny:, :] = padded[self.grid.ny - 1:self.grid.ny, :]
+        if self.cnx * f > self.grid.nx:
+            padded[:, self.grid.nx:] = padded[:, self.grid.nx - 1:self.grid.nx]
+        self.clearance = padded.reshape(self.cny, f, self.cnx, f).min(axis=(1, 3))
+        self.clearance_list = self.clearance.tolist() # Python lists index much faster inside the search loop
+        self.clearance_version = self.grid.version
+
+    def to_cell(self, x, y):
+        cx = int((x + self.grid.field_w / 2) / self.cell_m)
+        cy = int((y + self.grid.field_h / 2) / self.cell_m)
+        return min(max(cx, 0), self.cnx - 1), min(max(cy, 0), self.cny - 1)
+
+    def to_world(self, cx, cy):
+        return (-self.grid.field_w / 2 + (cx + 0.5) * self.cell_m,
+                -self.grid.field_h / 2 + (cy + 0.5) * self.cell_m)
+
+    def free(self, cx, cy):
+        return self.clearance_list[cy][cx] >= self.robot_radius_m or (cx, cy) in self.start_cells
+
+    def footprint(self, x, y):
+        """Coarse cells within robot_radius_m (plus one cell) of (x, y)."""
+        reach = int(math.ceil(self.robot_radius_m / self.cell_m)) + 1
+        cx, cy = self.to_cell(x, y)
+        cells = set()
+        for ix in range(max(cx - reach, 0), min(cx + reach, self.cnx - 1) + 1):
+            for iy in range(max(cy - reach, 0), min(cy + reach, self.cny - 1) + 1):
+                wx, wy = self.to_world(ix, iy)
+                if math.hypot(wx - x, wy - y) <= self.robot_radius_m + self.cell_m:
+                    cells.add((ix, iy))
+        return frozenset(cells)
+
+    def line_of_sight(self, a, b):
+        """True if every coarse cell on the segment a-b is free (supercover DDA)."""
+        (x0, y0), (x1, y1) = a, b
+        dx, dy = abs(x1 - x0), abs(y1 - y0)
+        sx = 1 if x1 > x0 else -1
+        sy = 1 if y1 > y0 else -1
+        x, y = x0, y0
+        err = dx - dy
+        for _ in range(dx + dy):
+            e2 = 2 * err
+            if e2 > -dy:
+                err -= dy
+                x += sx
+            else:
+                err += dx
+                y += sy
+            if not self.free(x, y):
+                return False
+        return True
+
+    def plan(self, start, goal):
+        """Waypoints [[x, y], ...] from start to goal, or None if no path was found in time."""
+        started = time.perf_counter()
+        self._update_clearance()
+        s = self.to_cell(*start)
+        g = self.to_cell(*goal)
+        # The robot's own body (or a teammate's report of it) must not block its way out
+        self.start_cells = self.footprint(*start)
+        if not self.free(*g):
+            return None
+        start_cells = self.start_cells
+        clearance = self.clearance_list
+        blocked = self.robot_radius_m
+        safe = self.robot_radius_m + self.safety_margin_m
+        sqrt2 = math.sqrt(2)
+        neighbours = [(1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+                      (1, 1, sqrt2), (1, -1, sqrt2), (-1, 1, sqrt2), (-1, -1, sqrt2)]
+        gx, gy = g
+        weight = self.heuristic_weight
+
+        def heuristic(cx, cy):
+            dx, dy = abs(cx - gx), abs(cy - gy)
+            return weight * ((dx + dy) + (sqrt2 - 2) * min(dx, dy))
+
+        open_heap = [(heuristic(*s), 0.0, s)]
+        cost_so_far = {s: 0.0}
+        came_from = {s: None}
+        expansions = 0
+        while open_heap:
+            _, cost, current = heapq.heappop(open_heap)
+            if current == g:
+                break
+            if cost > cost_so_far[current]:
+                continue
+            expansions += 1
+            if expansions % 256 == 0 and time.perf_counter() - started > self.time_budget_s:
+                self.last_plan_time_s = time.perf_counter() - started
+                return None
+            cx, cy = current
+            for dx, dy, step in neighbours:
+                nx, ny = cx + dx, cy + dy
+                if nx < 0 or ny < 0 or nx >= self.cnx or ny >= self.cny:
+                    continue
+                c = clearance[ny][nx]
+                if c < blocked and (nx, ny) not in start_cells:
+                    continue
+                penalty = 1.0 + ((safe - c) / self.safety_margin_m if c < safe else 0.0)
+                new_cost = cost + step * penalty
+                if new_cost < cost_so_far.get((nx, ny), float("inf")):
+                    cost_so_far[(nx, ny)] = new_cost
+                    came_from[(nx, ny)] = current
+                    heapq.heappush(open_heap, (new_cost + heuristic(nx, ny), new_cost, (nx, ny)))
+        if g not in came_from:
+            self.last_plan_time_s = time.perf_counter() - started
+            return None
+
+        cells = []
+        node = g
+        while node is not None:
+            cells.append(node)
+            node = came_from[node]
+        cells.reverse()
+
+        # Any-angle smoothing: skip intermediate cells while the straight line stays free
+        smoothed = [cells[0]]
+        for i in range(1, len(cells) - 1):
+            if not self.line_of_sight(smoothed[-1], cells[i + 1]):
+                smoothed.append(cells[i])
+        if len(cells) > 1:
+            smoothed.append(cells[-1])
+
+        waypoints = [list(start)] + [list(self.to_world(*cell)) for cell in smoothed[1:-1]] + [list(goal)]
+        self.last_plan_time_s = time.perf_counter() - started
+        return waypoints
@@ -0,0 +1,375 @@
+import argparse
+import json
+import struct
+import time
+from communication import split_refbox_stream
+
+# Offline import of tcpdump captures (pcap and pcapng, pure Python).
+#
+# Packets are read one block at a time, so captures of any size stream in
+# constant memory. UDP datagrams addressed to a robot's base_listen_port are
+# handed to that robot exactly like WiFiHandler does; the RefBox TCP stream
+# (traffic from the configured RefBox port) is reassembled and split into
+# messages for BaseStationLogic.handle_refbox_message. Replay runs at the
+# captured timing (optionally scaled) or as fast as possible.
+#
+#   python pcap_replay.py match.pcapng --speed 0     # headless, as fast as possible
+#   python base_station.py --replay match.pcapng     # through the UI
+
+PCAP_MAGIC = {b"\xd4\xc3\xb2\xa1": ("<", 1e-6), b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+              b"\x4d\x3c\xb2\xa1": ("<", 1e-9), b"\xa1\xb2\x3c\x4d": (">", 1e-9)}
+PCAPNG_SHB = 0x0A0D0D0A
+
+# Link types
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = (12, 14, 101)
+LINKTYPE_IEEE802_11 = 105
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_RADIOTAP = 127
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+
+class CaptureFormatError(Exception):
+    pass
+
+
+def read_packets(f):
+    """Yield (timestamp_s, linktype, frame) from an open pcap or pcapng file."""
+    head = f.read(4)
+    if head in PCAP_MAGIC:
+        yield from _read_pcap(f, head)
+    elif len(head) == 4 and struct.unpack("<I", head)[0] == PCAPNG_SHB:
+        yield from _read_pcapng(f, head)
+    else:
+        raise CaptureFormatError("not a pcap or pcapng file")
+
+
+def _read_pcap(f, magic):
+    endian, unit = PCAP_MAGIC[magic]
+    header = f.read(20)
+    if len(header) < 20:
+        raise CaptureFormatError("truncated pcap header")
+    linktype = struct.unpack(endian + "HHiIII", header)[5] & 0x0FFFFFFF
+    record = struct.Struct(endian + "IIII")
+    while True:
+        data = f.read(16)
+        if len(data) < 16:
+            return
+        seconds, fraction, captured, _ = record.unpack(data)
+        frame = f.read(captured)
+        if len(frame) < captured:
+            return # Capture cut off mid-packet
+        yield seconds + fraction * unit, linktype, frame
+
+
+def _read_pcapng(f, first):
+    endian = "<"
+    interfaces = [] # (linktype, seconds per timestamp unit), per section
+    last_time = 0.0
+    pending = first
+    while True:
+        head = pending + f.read(8 - len(pending))
+        pending = b""
+        if len(head) < 8:
+            return
+        block_type = struct.unpack(endian + "I", head[:4])[0]
+        if block_type == PCAPNG_SHB:
+            # Byte order is only known once the byte-order magic is read
+            magic = f.read(4)
+            endian = "<" if magic == b"\x4d\x3c\x2b\x1a" else ">"
+            length = struct.unpack(endian + "I", head[4:8])[0]
+            f.read(length - 12)
+            interfaces = []
+            continue
+        length = struct.unpack(endian + "I", head[4:8])[0]
+        if length < 12:
+            raise CaptureFormatError("corrupt pcapng block")
+        body = f.read(length - 8)
+        if len(body) < length - 8:
+            return
+        body = body[:-4] # Trailing copy of the block length
+        if block_type == 1: # Interface description
+            linktype = struct.unpack(endian + "H", body[:2])[0]
+            interfaces.append((linktype, _tsresol(body[8:], endian)))
+        elif block_type in (6, 2): # Enhanced packet / obsolete packet block
+            if block_type == 6:
+                interface, high, low, captured = struct.unpack(endian + "IIII", body[:16])
+                frame = body[20:20 + captured]
+            else:
+                interface, _, high, low, captured = struct.unpack(endian + "HHIII", body[:16])
+                frame = body[20:20 + captured]
+            if interface >= len(interfaces):
+                continue
+            linktype, unit = interfaces[interface]
+            last_time = ((high << 32) | low) * unit
+            yield last_time, linktype, frame
+        elif block_type == 3 and interfaces: # Simple packet block: no timestamp, first interface
+            original = struct.unpack(endian + "I", body[:4])[0]
+            yield last_time, interfaces[0][0], body[4:4 + original]
+
+
+def _tsresol(options, endian):
+    """Timestamp unit from an interface block's options (if_tsresol, default microseconds)."""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack(endian + "HH", options[offset:offset + 4])
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = options[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def decode_frame(linktype, frame):
+    """Return (protocol, src, sport, dst, dport, payload, seq, flags) for UDP/TCP over IP, else None."""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(frame) < 14:
+            return None
+        ethertype, offset = struct.unpack("!H", frame[12:14])[0], 14
+        while ethertype in (0x8100, 0x88A8) and len(frame) >= offset + 4: # VLAN tags
+            ethertype = struct.unpack("!H", frame[offset + 2:offset + 4])[0]
+            offset += 4
+        if ethertype not in (0x0800, 0x86DD):
+            return None
+        packet = frame[offset:]
+    elif linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        packet = frame[4:]
+    elif linktype in LINKTYPE_RAW or linktype in (LINKTYPE_IPV4, LINKTYPE_IPV6):
+        packet = frame
+    elif linktype == LINKTYPE_LINUX_SLL:
+        packet = frame[16:]
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        packet = frame[20:]
+    elif linktype in (LINKTYPE_IEEE802_11, LINKTYPE_RADIOTAP):
+        packet = _wifi_payload(frame, linktype)
+    else:
+        return None
+    return _decode_ip(packet) if packet else None
+
+
+def _wifi_payload(frame, linktype):
+    """IP packet from an unencrypted 802.11 data frame (monitor-mode captures), else None."""
+    if linktype == LINKTYPE_RADIOTAP:
+        if len(frame) < 4:
+            return None
+        frame = frame[struct.unpack("<H", frame[2:4])[0]:]
+    if len(frame) < 24:
+        return None
+    control, flags = frame[0], frame[1]
+    if (control >> 2) & 0x3 != 2 or flags & 0x40: # Not a data frame, or protected
+        return None
+    offset = 24
+    if flags & 0x03 == 0x03: # To and from DS: fourth address
+        offset += 6
+    if control & 0x80: # QoS data
+        offset += 2
+    llc = frame[offset:offset + 8]
+    if len(llc) < 8 or llc[:3] != b"\xaa\xaa\x03":
+        return None
+    if struct.unpack("!H", llc[6:8])[0] not in (0x0800, 0x86DD):
+        return None
+    return frame[offset + 8:]
+
+
+def _decode_ip(packet):
+    if len(packet) < 20:
+        return None
+    version = packet[0] >> 4
+    if version == 4:
+        header_length = (packet[0] & 0x0F) * 4
+        total_length, fragment = struct.unpack("!H2xH", packet[2:8])
+        if fragment & 0x3FFF: # More fragments or non-zero offset: not reassembled
+            return None
+        protocol = packet[9]
+        src, dst = _ipv4(packet[12:16]), _ipv4(packet[16:20])
+        segment = packet[header_length:total_length] # Drops link-layer padding
+    elif version == 6 and len(packet) >= 40:
+        payload_length = struct.unpack("!H", packet[4:6])[0]
+        protocol = packet[6] # Extension headers are not followed
+        src, dst = packet[8:24].hex(), packet[24:40].hex()
+        segment = packet[40:40 + payload_length]
+    else:
+        return None
+    if protocol == 17 and len(segment) >= 8:
+        sport, dport = struct.unpack("!HH", segment[:4])
+        return "udp", src, sport, dst, dport, segment[8:], 0, 0
+    if protocol == 6 and len(segment) >= 20:
+        sport, dport, seq = struct.unpack("!HHI", segment[:8])
+        data_offset = (segment[12] >> 4) * 4
+        return "tcp", src, sport, dst, dport, segment[data_offset:], seq, segment[13]
+    return None
+
+
+def _ipv4(raw):
+    return "%d.%d.%d.%d" % tuple(raw)
+
+
+class TcpReassembler:
+    """In-order byte streams per TCP flow, tolerating retransmissions, overlaps and reordering.
+
+    Out-of-order segments wait in a per-flow buffer of at most max_pending_bytes;
+    past that the missing bytes are given up on and the stream resumes at the
+    earliest buffered segment (counted in gaps).
+    """
+    def __init__(self, max_pending_bytes=1 << 20):
+        self.max_pending_bytes = max_pending_bytes
+        self.flows = {} # (src, sport, dst, dport) -> [next_seq, {seq: bytes}, pending_bytes]
+        self.gaps = 0
+
+    @staticmethod
+    def _offset(seq, next_seq):
+        """seq - next_seq in sequence space (signed, wraps at 2**32)."""
+        return ((seq - next_seq + (1 << 31)) & 0xFFFFFFFF) - (1 << 31)
+
+    def add(self, flow, seq, flags, payload):
+        """Feed one segment; returns the bytes that became available in order (possibly b"")."""
+        if flags & TCP_RST:
+            self.flows.pop(flow, None)
+            return b""
+        if flags & TCP_SYN:
+            self.flows[flow] = [(seq + 1) & 0xFFFFFFFF, {}, 0]
+            return b""
+        state = self.flows.get(flow)
+        if state is None:
+            state = self.flows[flow] = [seq, {}, 0] # Capture started mid-stream
+        if not payload:
+            return b""
+        state[1][seq] = max(payload, state[1].get(seq, b""), key=len)
+        state[2] = sum(len(data) for data in state[1].values())
+        out = []
+        while state[1]:
+            ready = [s for s in state[1] if self._offset(s, state[0]) <= 0]
+            if not ready:
+                if state[2] <= self.max_pending_bytes:
+                    break
+                # Give up on the hole: continue from the earliest buffered segment
+                state[0] = min(state[1], key=lambda s: self._offset(s, state[0]))
+                self.gaps += 1
+                continue
+            for s in ready:
+                data = state[1].pop(s)
+                state[2] -= len(data)
+                skip = -self._offset(s, state[0]) # Already delivered (retransmission or overlap)
+                if skip < len(data):
+                    out.append(data[skip:])
+                    state[0] = (state[0] + len(data) - skip) & 0xFFFFFFFF
+        return b"".join(out)
+
+
+class PcapReplay:
+    """Feed a capture through the base station's receive path.
+
+    robots get their UDP status datagrams via handle_received_data, and
+    on_refbox_message gets the reassembled RefBox messages. speed 1.0 replays at
+    the captured timing, 2.0 twice as fast, 0 as fast as possible.
+    """
+    def __init__(self, path, config, robots, on_refbox_message=None, speed=1.0):
+        self.path = path
+        self.speed = speed
+        self.on_refbox_message = on_refbox_message
+        robots_by_id = {robot.robot_id: robot for robot in robots}
+        self.robots_by_port = {r['base_listen_port']: robots_by_id[r['id']]
+                               for r in config.get('robots', []) if r.get('base_listen_port') and r['id'] in robots_by_id}
+        for robot in self.robots_by_port.values():
+            robot.read_only = True # Replies would go to robots that are not there
+        self.refbox_port = config.get('refbox', {}).get('port', 28097)
+        self.reassembler = TcpReassembler()
+        self.refbox_buffers = {} # flow -> undecoded text
+        self.stats = {"packets": 0, "robot_datagrams": 0, "refbox_messages": 0, "ignored": 0}
+        self.capture_time = None # Timestamp of the packet being replayed
+        self.running = False
+
+    def run(self, on_tick=None, tick_s=0.03):
+        """Replay the whole file (or until stop()). on_tick(capture_time) is called every tick_s of capture time."""
+        self.running = True
+        started = first = next_tick = None
+        with open(self.path, "rb") as f:
+            for timestamp, linktype, frame in read_packets(f):
+                if not self.running:
+                    break
+                if first is None:
+                    started, first, next_tick = time.monotonic(), timestamp, timestamp
+                if self.speed > 0:
+                    delay = started + (timestamp - first) / self.speed - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self.capture_time = timestamp
+                self.stats["packets"] += 1
+                self.dispatch(decode_frame(linktype, frame))
+                if on_tick and timestamp >= next_tick:
+                    on_tick(timestamp)
+                    next_tick = max(next_tick + tick_s, timestamp)
+        self.running = False
+        return self.stats
+
+    def stop(self):
+        self.running = False
+
+    def dispatch(self, decoded):
+        if decoded is None:
+            self.stats["ignored"] += 1
+            return
+        protocol, src, sport, dst, dport, payload, seq, flags = decoded
+        if protocol == "udp":
+            robot = self.robots_by_port.get(dport)
+            if robot is None or not payload:
+                self.stats["ignored"] += 1
+                return
+            robot.connected = True # It was talking to the base station when the capture was taken
+            robot.handle_received_data(payload.decode(errors="replace"))
+            self.stats["robot_datagrams"] += 1
+        elif sport == self.refbox_port:
+            flow = (src, sport, dst, dport)
+            data = self.reassembler.add(flow, seq, flags, payload)
+            if not data:
+                return
+            buffer = self.refbox_buffers.get(flow, "") + data.decode("utf-8", errors="replace")
+            messages, self.refbox_buffers[flow] = split_refbox_stream(buffer)
+            for message in messages:
+                self.stats["refbox_messages"] += 1
+                if self.on_refbox_message:
+                    self.on_refbox_message(message)
+        else:
+            self.stats["ignored"] += 1
+
+
+def main():
+    from base_station import BaseStationLogic # Imported here: keeps this module usable without Tk
+    from world_process import ConsoleUI
+
+    parser = argparse.ArgumentParser(description="Replay a pcap/pcapng capture through the base station pipeline, headless")
+    parser.add_argument("capture")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = captured timing, 0 = as fast as possible")
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    ui = ConsoleUI(config)
+    logic = BaseStationLogic(ui)
+    replay = PcapReplay(args.capture, config, ui.robots, logic.handle_refbox_message, speed=args.speed)
+    started = time.perf_counter()
+    try:
+        # Fusion runs on capture time, so filters see the original timing however fast the replay goes
+        stats = replay.run(on_tick=lambda now: logic.update_world_state(now))
+    finally:
+        logic.scheduler.stop()
+        logic.stop_world_publisher()
+    print(f"Replayed {stats['packets']} packets in {time.perf_counter() - started:.2f} s: "
+          f"{stats['robot_datagrams']} robot datagrams, {stats['refbox_messages']} RefBox messages, "
+          f"{stats['ignored']} ignored, {replay.reassembler.gaps} TCP gaps")
+    print(f"Final game state: {logic.game_state.state}, ball at {ui.global_world.ball_position}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import math
+from collections import deque
+import numpy as np
+
+# Robot-relative detections to the field frame.
+#
+# Robots may report what they see relative to themselves instead of in field
+# coordinates, as range/bearing ("polar": metres, radians counter-clockwise
+# from the robot's heading) or local x/y ("cartesian": metres forward, metres
+# to the left), with the time the camera frame was taken:
+#
+#   "pose_std": [0.03, 0.03, 0.02],           # optional: std of x, y (m) and heading (rad)
+#   "detections": {"frame": "polar", "time": 1718000000.12, "noise": [0.05, 0.02],
+#                  "ball": [2.1, 0.3], "obstacles": [[3.0, -0.4], [1.2, 1.1]]}
+#
+# The base station looks up the robot's pose at that time (PoseHistory,
+# robot clock) and transforms all of the packet's detections in one NumPy
+# pass. Each point gets a 2x2 covariance: the detection noise rotated into
+# the field frame plus the pose uncertainty (position, and heading times the
+# lever arm), which the ball filter and the opponent tracker use to weight it.
+
+
+class PoseHistory:
+    """Recent (robot time, x, y, theta) of one robot, to find its pose when a detection was made."""
+    def __init__(self, capacity=32):
+        self.poses = deque(maxlen=capacity)
+
+    def add(self, t, x, y, theta):
+        if self.poses and t <= self.poses[-1][0]:
+            return # Late or duplicate packet: the newer pose stays the reference
+        self.poses.append((t, x, y, theta))
+
+    def at(self, t):
+        """(x, y, theta) at robot time t, interpolated; clamped to the oldest/newest pose. None if empty."""
+        poses = self.poses
+        if not poses:
+            return None
+        if t >= poses[-1][0]:
+            return poses[-1][1:]
+        if t <= poses[0][0]:
+            return poses[0][1:]
+        for i in range(len(poses) - 1, 0, -1):
+            t0, x0, y0, theta0 = poses[i - 1]
+            t1, x1, y1, theta1 = poses[i]
+            if t0 <= t <= t1:
+                f = (t - t0) / (t1 - t0)
+                turn = math.atan2(math.sin(theta1 - theta0), math.cos(theta1 - theta0))
+                return x0 + f * (x1 - x0), y0 + f * (y1 - y0), theta0 + f * turn
+        return poses[-1][1:]
+
+
+def to_global(pose, points, frame="polar", noise=(0.05, 0.02), pose_std=None):
+    """Field-frame positions (N, 2) and covariances (N, 2, 2) of robot-relative detections.
+
+    pose: (x, y, theta) of the robot; points: (N, 2) in the given frame;
+    noise: std of the two point coordinates (m, rad for polar; m, m for
+    cartesian); pose_std: std of the pose's x, y and theta, or None.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    x, y, theta = pose
+    noise_var = np.square(np.asarray(noise, dtype=float))
+    if frame == "polar":
+        r, bearing = points[:, 0], points[:, 1]
+        cos_b, sin_b = np.cos(bearing), np.sin(bearing)
+        local = np.stack([r * cos_b, r * sin_b], axis=1)
+        # Covariance of (range, bearing) pushed through (r cos b, r sin b)
+        jac = np.empty((len(points), 2, 2))
+        jac[:, 0, 0], jac[:, 0, 1] = cos_b, -r * sin_b
+        jac[:, 1, 0], jac[:, 1, 1] = sin_b, r * cos_b
+        local_cov = np.einsum("nij,j,nkj->nik", jac, noise_var, jac)
+    elif frame == "cartesian":
+        local = points
+        local_cov = np.broadcast_to(np.diag(noise_var), (len(points), 2, 2))
+    else:
+        raise ValueError(f"Unknown detection frame '{frame}'")
+
+    c, s = math.cos(theta), math.sin(theta)
+    rotation = np.array([[c, -s], [s, c]])
+    offset = local @ rotation.T
+    xy = offset + (x, y)
+    cov = np.einsum("ij,njk,lk->nil", rotation, local_cov, rotation)
+    if pose_std is not None:
+        sx, sy, st = pose_std
+        cov[:, 0, 0] += sx * sx
+        cov[:, 1, 1] += sy * sy
+        # A heading error swings the point around the robot: d(offset)/d(theta) = (-offset_y, offset_x)
+        lever = np.stack([-offset[:, 1], offset[:, 0]], axis=1)
+        cov += st * st * lever[:, :, None] * lever[:, None, :]
+    return xy, cov
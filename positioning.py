@@ -0,0 +1,190 @@
+import math
+
+# Field frame used by the base station: metres, origin at the field centre,
+# x towards the opponent goal (our goal is at -x), y to the left.
+# Slot lists are ordered by importance (goalkeeper, kicker/receiver, ...), so
+# when fewer robots are available the most important slots are filled first.
+
+SET_PIECES = ("KICKOFF", "FREEKICK", "GOALKICK", "THROWIN", "CORNER", "PENALTY", "DROP_BALL")
+
+
+def hungarian(cost):
+    """Minimum-cost assignment for a square cost matrix (list of lists).
+
+    Returns assignment[row] = column. O(n^3), fine for a handful of robots.
+    """
+    n = len(cost)
+    INF = float("inf")
+    u = [0.0] * (n + 1)
+    v = [0.0] * (n + 1)
+    p = [0] * (n + 1)   # p[column] = row assigned to column (1-based)
+    way = [0] * (n + 1)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = [INF] * (n + 1)
+        used = [False] * (n + 1)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            delta = INF
+            j1 = 0
+            for j in range(1, n + 1):
+                if not used[j]:
+                    cur = cost[i0 - 1][j - 1] - u[i0] - v[j]
+                    if cur < minv[j]:
+                        minv[j] = cur
+                        way[j] = j0
+                    if minv[j] < delta:
+                        delta = minv[j]
+                        j1 = j
+            for j in range(n + 1):
+                if used[j]:
+                    u[p[j]] += delta
+                    v[j] -= delta
+                else:
+                    minv[j] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while True:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+            if j0 == 0:
+                break
+    assignment = [0] * n
+    for j in range(1, n + 1):
+        if p[j]:
+            assignment[p[j] - 1] = j - 1
+    return assignment
+
+
+class PositioningEngine:
+    """Set-piece target poses from precomputed lookup tables.
+
+    The ball position is discretised into cell_size_m cells. For every set
+    piece (ours and theirs) and every cell the slot poses are computed once at
+    construction, and robot-to-slot assignments are memoised per
+    (set piece, ours, ball cell, available robots). A lookup during a game is
+    therefore a dict access, so placement commands can go out right after the
+    RefBox command.
+
+    Assignment cost is the squared distance from each robot's home position
+    (config "initial_pos") to the slot, which keeps roles stable between set
+    pieces and makes the result independent of where robots happen to be.
+    Homes must lie on the field (centre-origin frame); ValueError otherwise.
+    """
+    def __init__(self, field_dims, home_positions, cell_size_m=0.5, keep_away_m=3.0, robot_radius_m=0.25):
+        self.field_w, self.field_h = field_dims
+        self.home_positions = dict(home_positions) # robot_id -> (x, y)
+        off_field = {robot_id: home for robot_id, home in self.home_positions.items()
+                     if abs(home[0]) > self.field_w / 2 or abs(home[1]) > self.field_h / 2}
+        if off_field:
+            raise ValueError(f"Robot home positions (initial_pos) off the {self.field_w} x {self.field_h} m field: "
+                             f"{off_field}; positions are metres from the centre spot")
+        self.cell_size_m = cell_size_m
+        # Keep-away distance from the ball for the defending team, limited on small practice fields
+        self.keep_away_m = min(keep_away_m, min(self.field_w, self.field_h) / 3)
+        self.robot_radius_m = robot_radius_m
+        self.cells_x = max(1, int(math.ceil(self.field_w / cell_size_m)))
+        self.cells_y = max(1, int(math.ceil(self.field_h / cell_size_m)))
+        self.slot_table = {} # (set_piece, ours) -> [cell index] -> [(x, y, theta), ...]
+        self.assignment_cache = {}
+        for set_piece in SET_PIECES:
+            for ours in (True, False):
+                self.slot_table[(set_piece, ours)] = [
+                    self.compute_slots(set_piece, ours, self.cell_center(cx, cy))
+                    for cy in range(self.cells_y) for cx in range(self.cells_x)
+                ]
+
+    def cell_of(self, ball_pos):
+        cx = int((ball_pos[0] + self.field_w / 2) / self.cell_size_m)
+        cy = int((ball_pos[1] + self.field_h / 2) / self.cell_size_m)
+        return min(max(cx, 0), self.cells_x - 1), min(max(cy, 0), self.cells_y - 1)
+
+    def cell_center(self, cx, cy):
+        return (-self.field_w / 2 + (cx + 0.5) * self.cell_size_m,
+                -self.field_h / 2 + (cy + 0.5) * self.cell_size_m)
+
+    def clamp(self, x, y):
+        margin = self.robot_radius_m
+        half_w, half_h = self.field_w / 2 - margin, self.field_h / 2 - margin
+        return min(max(x, -half_w), half_w), min(max(y, -half_h), half_h)
+
+    def pose(self, x, y, look_at):
+        x, y = self.clamp(x, y)
+        return (x, y, math.atan2(look_at[1] - y, look_at[0] - x))
+
+    def compute_slots(self, set_piece, ours, ball):
+        """Slot poses (x, y, theta) for one set piece and ball position, most important first."""
+        bx, by = ball
+        own_goal = (-self.field_w / 2, 0.0)
+        opp_goal = (self.field_w / 2, 0.0)
+        keeper = self.pose(own_goal[0] + 0.5, 0.0, ball)
+
+        if set_piece == "KICKOFF":
+            ball = (0.0, 0.0)
+            bx, by = ball
+        if set_piece == "PENALTY" and not ours:
+            # Only the keeper defends; everyone else waits in the other half
+            rest = [self.pose(self.field_w / 4, y, ball) for y in (-1.0, 0.0, 1.0, 2.0)]
+            return [self.pose(own_goal[0] + 0.2, 0.0, ball)] + rest
+
+        if ours:
+            # Kicker behind the ball facing the opponent goal, receiver ahead, two covering
+            angle = math.atan2(opp_goal[1] - by, opp_goal[0] - bx)
+            kicker = self.pose(bx - 0.5 * math.cos(angle), by - 0.5 * math.sin(angle), ball)
+            receiver = self.pose(bx + 1.5 * math.cos(angle) - 1.0 * math.sin(angle),
+                                 by + 1.5 * math.sin(angle) + 1.0 * math.cos(angle), ball)
+            if set_piece == "KICKOFF":
+                receiver = self.pose(-0.3, 1.5, ball)
+            support = self.pose(bx - 1.5, by - 1.5 if by > 0 else by + 1.5, ball)
+            defender = self.pose((own_goal[0] + bx) / 2, by / 2, ball)
+            return [keeper, kicker, receiver, support, defender]
+
+        # Defending: form a wall between the ball and our goal at the keep-away distance
+        dx, dy = own_goal[0] - bx, own_goal[1] - by
+        dist = math.hypot(dx, dy) or 1.0
+        ux, uy = dx / dist, dy / dist
+        wall_distance = self.keep_away_m + self.robot_radius_m
+        wall_x, wall_y = bx + ux * wall_distance, by + uy * wall_distance
+        spacing = 2.2 * self.robot_radius_m
+        wall = [self.pose(wall_x - uy * offset, wall_y + ux * offset, ball) for offset in (0.0, spacing, -spacing)]
+        if set_piece == "KICKOFF":
+            wall = [self.pose(-wall_distance, y, ball) for y in (0.0, 1.0, -1.0)]
+        defender = self.pose((own_goal[0] + wall_x) / 2, wall_y / 2, ball)
+        return [keeper] + wall + [defender]
+
+    def targets(self, set_piece, ours, ball_pos, robot_ids):
+        """Return {robot_id: (x, y, theta)} for the available robots."""
+        cell = self.cell_of(ball_pos)
+        robot_ids = tuple(sorted(robot_ids))
+        key = (set_piece, bool(ours), cell, robot_ids)
+        targets = self.assignment_cache.get(key)
+        if targets is None:
+            targets = self.assignment_cache[key] = self.assign(set_piece, ours, cell, robot_ids)
+        return targets
+
+    def assign(self, set_piece, ours, cell, robot_ids):
+        cx, cy = cell
+        slots = self.slot_table[(set_piece, bool(ours))][cy * self.cells_x + cx]
+        robot_ids = robot_ids[:len(slots)]
+        slots = slots[:len(robot_ids)]
+        if not robot_ids:
+            return {}
+        cost = []
+        for robot_id in robot_ids:
+            hx, hy = self.home_positions.get(robot_id, (0.0, 0.0))
+            cost.append([(hx - sx) ** 2 + (hy - sy) ** 2 for sx, sy, _ in slots])
+        assignment = hungarian(cost)
+        return {robot_id: slots[assignment[i]] for i, robot_id in enumerate(robot_ids)}
+
+    def warm_up(self, robot_ids):
+        """Fill the assignment cache for one set of available robots."""
+        for set_piece, ours in self.slot_table:
+            for cy in range(self.cells_y):
+                for cx in range(self.cells_x):
+                    key = (set_piece, ours, (cx, cy), tuple(sorted(robot_ids)))
+                    if key not in self.assignment_cache:
+                        self.assignment_cache[key] = self.assign(set_piece, ours, (cx, cy), key[3])
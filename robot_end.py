@@ -1,89 +1,360 @@
 import socket
 import json
+import math
+import selectors
 import threading
 import time
+from communication import NetworkLoop
+from param_sync import ParameterStore
+
+# Dead-band thresholds: a status packet is only sent when something moved by
+# more than these amounts, or when the keepalive interval has elapsed.
+POSITION_EPSILON_M = 0.02
+ORIENTATION_EPSILON_RAD = 0.02
+BALL_EPSILON_M = 0.02
+KEEPALIVE_INTERVAL_S = 1.0
+
+# Status rate limits; the base station picks a rate inside this range.
+DEFAULT_STATUS_RATE_HZ = 10.0
+MIN_STATUS_RATE_HZ = 0.5
+MAX_STATUS_RATE_HZ = 100.0
+
+CONTROL_INTERVAL_S = 0.02 # Motion control step
+SENSOR_INTERVAL_S = 1.0 # Simulated perception update
+MANUAL_MOVE_S = 0.5 # How long one "move" (jog) command drives the robot
+ARRIVED_M = 0.05 # Distance at which a target or waypoint counts as reached
+
+# Tunable parameters and their values at boot; the base station patches them (see param_sync.py)
+DEFAULT_PARAMETERS = {
+    "max_speed": 2.0, "rotation_speed": 1.0, "kick_power": 0.8,
+    "acceleration": 1.5, "deceleration": 1.5,
+    "vision_range": 5.0, "ball_detection_threshold": 0.7,
+    "obstacle_detection_threshold": 0.6, "communication_range": 20.0
+}
+
+# Jog directions of the "move" message: (forward, left, turn) in units of half max_speed / rotation_speed
+JOG_DIRECTIONS = {
+    "forward": (1, 0, 0), "backward": (-1, 0, 0), "left": (0, 1, 0), "right": (0, -1, 0),
+    "rotate_left": (0, 0, 1), "rotate_right": (0, 0, -1), "stop": (0, 0, 0),
+}
+
+NUMBER = (int, float)
+
+
+class RobotState:
+    """Pose, motion goal and perception of the robot.
+
+    Written by the command loop, read by the status sender, and safe to use
+    from other threads (e.g. a motor or camera driver) through the lock.
+    """
+    def __init__(self, x, y, theta):
+        self.lock = threading.Lock()
+        self.x = x
+        self.y = y
+        self.theta = theta # radians, field frame
+        self.home = (x, y)
+        self.target = None # (x, y) being driven to
+        self.target_theta = None
+        self.waypoints = [] # Remaining points of a planned path after target
+        self.jog = (0.0, 0.0, 0.0) # Robot-frame (forward, left, turn) of a manual move
+        self.jog_until = 0.0
+        self.playing = False
+        self.role = None # Last role_hint ("interceptor", "support")
+        self.ball_position = None # (x, y) or None when not seen
+        self.obstacles = [] # List of (x, y) positions
+
+    def pose(self):
+        with self.lock:
+            return self.x, self.y, self.theta
+
+    def set_target(self, x, y, theta=None, waypoints=()):
+        with self.lock:
+            self.target = (x, y)
+            self.target_theta = theta
+            self.waypoints = list(waypoints)
+            self.jog_until = 0.0
+
+    def stop(self):
+        with self.lock:
+            self.target = None
+            self.waypoints = []
+            self.jog_until = 0.0
+
+    def status(self):
+        """Status message fields: position [x, y] and orientation (radians) as the base station reads them."""
+        with self.lock:
+            return {
+                "position": [round(self.x, 3), round(self.y, 3)],
+                "orientation": round(self.theta, 3),
+                "ball_position": list(self.ball_position) if self.ball_position else None,
+                "obstacles": [list(obstacle) for obstacle in self.obstacles]
+            }
+
 
 class ActualRobot:
-    def __init__(self, robot_ip, robot_port, controller_ip, controller_port):
+    def __init__(self, robot_ip, robot_port, controller_ip, controller_port, verbose=False):
         # Store IP and port details
         self.robot_ip = robot_ip
         self.robot_port = robot_port
         self.controller_addr = (controller_ip, controller_port)
-        
-        # Create and bind UDP socket
+        self.verbose = verbose # Print every command (too slow for high-rate motion commands)
+
+        # Create and bind UDP socket; all its traffic is handled on the event loop
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.socket.bind((self.robot_ip, self.robot_port))
+        self.socket.setblocking(False)
         print(f"Robot listening on {self.robot_ip}:{self.robot_port}")
-        
+
         # Initialize robot state
-        self.position = (5, 2, 1)  # (x, y, theta) in meters and radians
-        self.ball_position = (0,0)  # Fixed for simulation
-
-        self.obstacles = []     # List of (x, y) positions
-        
-        # Start sensor simulation thread
-        self.sensor_thread = threading.Thread(target=self.update_sensors)
-        self.sensor_thread.daemon = True
-        self.sensor_thread.start()
-        
-        # Start status sending thread
-        self.send_status_thread = threading.Thread(target=self.send_status_periodically)
-        self.send_status_thread.daemon = True
-        self.send_status_thread.start()
+        self.state = RobotState(5.0, 2.0, 1.0)
+        self.parameters = ParameterStore(DEFAULT_PARAMETERS)
+        self.last_control = time.monotonic()
 
-    def update_sensors(self):
-        """Simulate sensor updates every second."""
-        while True:
-            # Simulate detecting a ball and obstacles
-            # self.ball_position = (6, 4.5)  # Fixed for simulation
-            self.ball_position = (self.ball_position[0] + 0.1,0)  # Simulate movement
-            self.obstacles = [(2, 3), (4, 5)]  # Example obstacles
-            time.sleep(1)
+        # Telemetry rate, adjusted by the base station ("telemetry_rate" message)
+        self.status_rate_hz = DEFAULT_STATUS_RATE_HZ
+        self.last_sent_status = None
+        self.last_sent_time = 0.0
 
-    def send_status_periodically(self):
-        """Send status updates to controller every 0.1 seconds."""
-        while True:
-            status = {
-                "position": self.position,
-                "ball_position": self.ball_position,
-                "obstacles": self.obstacles
-            }
-            self.socket.sendto(json.dumps(status).encode(), self.controller_addr)
-            time.sleep(0.1)
+        # JSON message type -> (handler, required fields and their types)
+        self.handlers = {
+            "command": (self.on_command, {"command": str}),
+            "move": (self.on_move, {"direction": str}),
+            "test": (self.on_test, {"action": str}),
+            "telemetry_rate": (self.on_telemetry_rate, {"rate_hz": NUMBER}),
+            "path": (self.on_path, {"waypoints": list}),
+            "role_hint": (self.on_role_hint, {"role": str}),
+            "param_query": (self.on_parameters, {}),
+            "param_patch": (self.on_parameters, {"set": dict}),
+            "set_parameters": (self.on_parameters, {"parameters": dict}),
+        }
+        # Plain-text commands: first word -> (handler, number of float arguments)
+        self.text_handlers = {
+            "move": (self.on_text_move, 2), # "move x y"
+            "turn": (self.on_text_turn, 1), # "turn degrees"
+        }
+
+        self.loop = NetworkLoop(name="robot-loop")
+        self.stopped = threading.Event()
 
     def run(self):
-        """Listen for and process commands from the controller."""
+        """Serve commands, motion control and status on the event loop until stop() or Ctrl+C."""
+        self.loop.start()
+        self.loop.watch(self.socket, selectors.EVENT_READ, self.on_readable)
+        self.loop.call_soon(self.control_step)
+        self.loop.call_soon(self.update_sensors)
+        self.loop.call_soon(self.send_status)
+        try:
+            while not self.stopped.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.loop.stop()
+            self.socket.close()
+
+    def stop(self):
+        self.stopped.set()
+
+    # Receiving and dispatch
+    def on_readable(self, sock, mask):
+        # Drain everything queued, so a burst of motion commands costs one wakeup
         while True:
-            data, addr = self.socket.recvfrom(1024)
-            command = data.decode()
+            try:
+                data, addr = sock.recvfrom(65536)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"Receive failed: {e}")
+                return
+            self.dispatch(data.decode(errors="replace"), addr)
+
+    def dispatch(self, command, addr=None):
+        if self.verbose:
             print(f"Received command: {command} from {addr}")
-            
-            # Process movement command: "move x y"
-            if command.startswith("move"):
-                parts = command.split()
-                if len(parts) == 3:
-                    try:
-                        x = float(parts[1])
-                        y = float(parts[2])
-                        self.position = (x, y)
-                        print(f"Moved to {self.position}")
-                    except ValueError:
-                        print("Invalid move command")
-            
-            # Process turn command: "turn angle"
-            elif command.startswith("turn"):
-                parts = command.split()
-                if len(parts) == 2:
-                    try:
-                        angle = float(parts[1])
-                        self.orientation = angle
-                        print(f"Turned to {self.orientation} degrees")
-                    except ValueError:
-                        print("Invalid turn command")
+        try:
+            message = json.loads(command)
+        except ValueError:
+            message = None
+        if isinstance(message, dict):
+            entry = self.handlers.get(message.get("type"))
+            if entry is None:
+                print(f"Unknown message type: {message.get('type')}")
+                return
+            handler, fields = entry
+            for name, kind in fields.items():
+                if not isinstance(message.get(name), kind):
+                    print(f"Invalid {message.get('type')} message: bad or missing '{name}'")
+                    return
+            handler(message)
+            return
+
+        parts = command.split()
+        entry = self.text_handlers.get(parts[0]) if parts else None
+        if entry is None or len(parts) != entry[1] + 1:
+            print(f"Unknown command: {command}")
+            return
+        try:
+            arguments = [float(part) for part in parts[1:]]
+        except ValueError:
+            print(f"Invalid {parts[0]} command")
+            return
+        entry[0](*arguments)
+
+    # JSON handlers
+    def on_command(self, message):
+        command = message["command"]
+        state = self.state
+        if command == "PLAY":
+            with state.lock:
+                state.playing = True
+        elif command in ("PAUSE", "SET_PIECE"):
+            with state.lock:
+                state.playing = False
+            state.stop()
+        elif command == "RESET_POSITION":
+            with state.lock:
+                state.playing = False
+            state.set_target(*state.home)
+        elif command == "MOVE_TO":
+            target = message.get("target")
+            if isinstance(target, list) and len(target) >= 2:
+                state.set_target(target[0], target[1], target[2] if len(target) > 2 else None)
             else:
-                print("Unknown command")
+                print("Invalid MOVE_TO command: no target")
+        elif command == "CHECK_CAMERA":
+            print("Camera check requested")
+        else:
+            print(f"Unknown command: {command}")
+
+    def on_move(self, message):
+        forward, left, turn = JOG_DIRECTIONS.get(message["direction"], (0, 0, 0))
+        speed = self.parameters.parameters.get("max_speed", 2.0) / 2
+        rotation = self.parameters.parameters.get("rotation_speed", 1.0)
+        with self.state.lock:
+            self.state.target = None
+            self.state.waypoints = []
+            self.state.jog = (forward * speed, left * speed, turn * rotation)
+            self.state.jog_until = time.monotonic() + MANUAL_MOVE_S
+
+    def on_test(self, message):
+        print(f"Test '{message['action']}' (kick power {self.parameters.parameters.get('kick_power')})")
+
+    def on_telemetry_rate(self, message):
+        self.set_status_rate(message["rate_hz"])
+
+    def on_path(self, message):
+        points = [point[:2] for point in message["waypoints"] if isinstance(point, list) and len(point) >= 2]
+        if points:
+            self.state.set_target(points[0][0], points[0][1], waypoints=points[1:])
+        elif message.get("error"):
+            print(f"No path: {message['error']}")
+
+    def on_role_hint(self, message):
+        with self.state.lock:
+            self.state.role = message["role"]
+
+    def on_parameters(self, message):
+        reply = self.parameters.handle(message)
+        if reply:
+            self.send(reply)
+
+    # Plain-text handlers (older base stations and manual testing)
+    def on_text_move(self, x, y):
+        self.state.set_target(x, y)
+
+    def on_text_turn(self, degrees):
+        x, y, _ = self.state.pose()
+        self.state.set_target(x, y, math.radians(degrees))
+
+    # Periodic work on the loop
+    def control_step(self):
+        """Drive toward the target (or jog); stands in for the motion controller."""
+        self.loop.call_later(CONTROL_INTERVAL_S, self.control_step) # First, so an error doesn't stop control
+        now = time.monotonic()
+        dt = min(now - self.last_control, 0.1)
+        self.last_control = now
+        max_speed = self.parameters.parameters.get("max_speed", 2.0)
+        rotation_speed = self.parameters.parameters.get("rotation_speed", 1.0)
+        state = self.state
+        with state.lock:
+            if now < state.jog_until:
+                forward, left, turn = state.jog
+                cos_t, sin_t = math.cos(state.theta), math.sin(state.theta)
+                state.x += (forward * cos_t - left * sin_t) * dt
+                state.y += (forward * sin_t + left * cos_t) * dt
+                state.theta += turn * dt
+            elif state.target:
+                dx, dy = state.target[0] - state.x, state.target[1] - state.y
+                distance = math.hypot(dx, dy)
+                step = min(distance, max_speed * dt)
+                if distance > 1e-9:
+                    state.x += dx / distance * step
+                    state.y += dy / distance * step
+                turned = True
+                if state.target_theta is not None:
+                    error = math.atan2(math.sin(state.target_theta - state.theta), math.cos(state.target_theta - state.theta))
+                    turn = rotation_speed * dt
+                    state.theta += max(-turn, min(turn, error))
+                    turned = abs(error) <= turn
+                if distance - step < ARRIVED_M and turned:
+                    state.target = tuple(state.waypoints.pop(0)) if state.waypoints else None
+                    state.target_theta = None
+
+    def update_sensors(self):
+        """Simulate sensor updates every second."""
+        self.loop.call_later(SENSOR_INTERVAL_S, self.update_sensors)
+        with self.state.lock:
+            # Simulate detecting a ball and obstacles
+            ball = self.state.ball_position or (0.0, 0.0)
+            self.state.ball_position = (ball[0] + 0.1, 0.0)  # Simulate movement
+            self.state.obstacles = [(2, 3), (4, 5)]  # Example obstacles
+
+    def set_status_rate(self, rate_hz):
+        """Set the status send rate, clamped to the supported range."""
+        self.status_rate_hz = min(max(float(rate_hz), MIN_STATUS_RATE_HZ), MAX_STATUS_RATE_HZ)
+        print(f"Status rate set to {self.status_rate_hz} Hz")
+
+    def status_changed(self, status):
+        """Return True if the status moved beyond the dead-band since the last send."""
+        last = self.last_sent_status
+        if last is None:
+            return True
+        pos, last_pos = status["position"], last["position"]
+        if math.hypot(pos[0] - last_pos[0], pos[1] - last_pos[1]) > POSITION_EPSILON_M:
+            return True
+        if abs(status["orientation"] - last["orientation"]) > ORIENTATION_EPSILON_RAD:
+            return True
+        ball, last_ball = status["ball_position"], last["ball_position"]
+        if (ball is None) != (last_ball is None):
+            return True
+        if ball is not None and math.hypot(ball[0] - last_ball[0], ball[1] - last_ball[1]) > BALL_EPSILON_M:
+            return True
+        return status["obstacles"] != last["obstacles"] or status["param_version"] != last["param_version"]
+
+    def send_status(self):
+        """Send status updates to controller when something changed, at the requested rate.
+
+        Unchanged status is still sent every KEEPALIVE_INTERVAL_S so the base
+        station can tell a quiet robot from a lost one.
+        """
+        self.loop.call_later(1.0 / self.status_rate_hz, self.send_status)
+        status = self.state.status()
+        status["param_version"] = self.parameters.version
+        status["status_rate_hz"] = self.status_rate_hz # Lets the base station resend a lost or forgotten rate
+        now = time.time()
+        if self.status_changed(status) or now - self.last_sent_time >= KEEPALIVE_INTERVAL_S:
+            status["timestamp"] = now # For the base station's latency plot
+            self.send(status)
+            self.last_sent_status = status
+            self.last_sent_time = now
+
+    def send(self, message):
+        try:
+            self.socket.sendto(json.dumps(message).encode(), self.controller_addr)
+        except OSError as e:
+            print(f"Send to {self.controller_addr} failed: {e}")
 
 if __name__ == "__main__":
     # Example usage: robot listens on 127.0.0.1:5000, sends to controller at 127.0.0.1:6000
     robot = ActualRobot("127.0.0.1", 5000, "127.0.0.1", 54836)
-    robot.run()
\ No newline at end of file
+    robot.run()
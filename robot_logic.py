@@ -1,5 +1,18 @@
 import json
-from communication import WiFiHandler # Assuming communication.py is in the same directory or package
+import time
+from communication import WiFiHandler, PRIORITY_MOTION, PRIORITY_DIAGNOSTICS # Assuming communication.py is in the same directory or package
+from tracking import OpponentTracker, OpponentTrack, BallFilter
+from event_bus import TELEMETRY, COMMANDS, PARAM_REPLIES, PLAN_REQUESTS
+try:
+    from perception import PoseHistory, to_global
+    PERCEPTION_AVAILABLE = True
+except ImportError:
+    PERCEPTION_AVAILABLE = False
+    print("NumPy not found. Robot-relative detections are ignored.")
+
+TELEMETRY_RATE_RETRY_S = 1.0 # Least time between resends of a rate the robot doesn't report back
+BALL_IN_SIGHT_S = 0.5 # The ball counts as in sight this long after the filter's last measurement
+SILENT_AFTER_S = 2.0 # A connected robot without a status packet this long is left out of fusion (keepalive is 1 s)
 
 class Robot:
     def __init__(self, robot_id, name="Robot", color="blue", ip_address=None, send_to_port=None, base_station_listen_port=None, initial_pos=(0,0), initial_orient=0):
@@ -9,9 +22,14 @@ class Robot:
         
         # Data from the robot's sensors/localization (global coordinates)
         self.position = list(initial_pos)  # [x, y]
+        self.home_position = tuple(initial_pos) # Configured start position, used for role assignment
         self.orientation = initial_orient  # degrees
         self.local_ball_position = None  # [x, y] as seen by robot, in global frame
         self.local_obstacles = []        # List of [x, y] obstacles in global frame
+        # Field-frame (var_x, var_y) of the above when the robot reported them relative to itself, else None
+        self.local_ball_variance = None
+        self.local_obstacle_variances = None
+        self.pose_history = PoseHistory() if PERCEPTION_AVAILABLE else None # By robot time ("timestamp")
 
         self.parameters = {
             "max_speed": 2.0, "rotation_speed": 1.0, "kick_power": 0.8,
@@ -20,6 +38,16 @@ class Robot:
             "obstacle_detection_threshold": 0.6, "communication_range": 20.0
         }
         self.connected = False
+        self.telemetry_rate_hz = None # Last status rate requested from the robot
+        self.telemetry_rate_sent_at = 0.0 # time.monotonic() of the last telemetry_rate message
+        self.first_status_time = None # time.monotonic() of the first status packet (startup report)
+        self.status_seq = 0 # Bumped by every status packet; the world map fuses each packet's detections once
+        self.silent = False # Connected but no status packet for SILENT_AFTER_S (set by the world map)
+        self.read_only = False # Fed from a capture (pcap_replay.py): received from, never sent to
+        self.scheduler = None # Shared OutboundScheduler; when None, sends go straight to the socket
+        # EventBus (event_bus.py) getting this robot's status packets, replies and commands, if attached.
+        # Parameter sync, path planning and the telemetry store subscribe there.
+        self.bus = None
         self.status_label = None # For UI updates
         self.battery_label = None # For UI updates
 
@@ -31,28 +59,52 @@ class Robot:
 
     def handle_received_data(self, data_str):
         """Callback to process received data from this robot."""
-        print(f"Received data for {self.name}: {data_str}")
         try:
             data_dict = json.loads(data_str)
+
+            # Path request for the base station planner, answered on the next world update
+            if data_dict.get('type') == 'plan_request':
+                self.publish(PLAN_REQUESTS, robot_id=self.robot_id, request=data_dict)
+                return
+
+            # Parameter acknowledgements and state (param_sync.py)
+            if data_dict.get('type') in ('param_ack', 'param_state'):
+                self.publish(PARAM_REPLIES, robot_id=self.robot_id, message=data_dict)
+                return
             
             # Update robot's own pose (position and orientation)
             if 'position' in data_dict and len(data_dict['position']) == 2 and 'orientation' in data_dict:
                 self.position = [data_dict['position'][0], data_dict['position'][1]]
                 self.orientation = data_dict['orientation'] # theta
+                if self.pose_history is not None and isinstance(data_dict.get('timestamp'), (int, float)):
+                    self.pose_history.add(data_dict['timestamp'], self.position[0], self.position[1], self.orientation)
             
-            # Update ball position as seen by this robot (assumed global)
-            if 'ball_position' in data_dict and data_dict['ball_position'] is not None:
-                self.local_ball_position = list(data_dict['ball_position'])
+            if isinstance(data_dict.get('detections'), dict):
+                # Ball and obstacles relative to the robot (see perception.py)
+                self.update_local_detections(data_dict['detections'], data_dict.get('timestamp'), data_dict.get('pose_std'))
             else:
-                self.local_ball_position = None # Ball not seen or not reported
+                self.local_ball_variance = None
+                self.local_obstacle_variances = None
+                # Update ball position as seen by this robot (assumed global)
+                if 'ball_position' in data_dict and data_dict['ball_position'] is not None:
+                    self.local_ball_position = list(data_dict['ball_position'])
+                else:
+                    self.local_ball_position = None # Ball not seen or not reported
 
-            # Update obstacles as seen by this robot (assumed global)
-            if 'obstacles' in data_dict:
-                self.local_obstacles = [list(obs) for obs in data_dict['obstacles']] # Ensure it's a list of lists
-            else:
-                self.local_obstacles = []
+                # Update obstacles as seen by this robot (assumed global)
+                if 'obstacles' in data_dict:
+                    self.local_obstacles = [list(obs) for obs in data_dict['obstacles']] # Ensure it's a list of lists
+                else:
+                    self.local_obstacles = []
 
-            print(f"{self.name} updated: Pos={self.position}, Orient={self.orientation}, Ball={self.local_ball_position}, Obstacles={len(self.local_obstacles)}")
+            self.status_seq += 1
+            if isinstance(data_dict.get('status_rate_hz'), (int, float)):
+                self.check_telemetry_rate(data_dict['status_rate_hz'])
+            if self.first_status_time is None:
+                self.first_status_time = time.monotonic()
+            if isinstance(data_dict.get('battery_level'), (int, float)):
+                self.parameters['battery_level'] = data_dict['battery_level']
+            self.publish(TELEMETRY, robot_id=self.robot_id, status=data_dict, received_at=time.monotonic())
 
         except json.JSONDecodeError:
             print(f"Error decoding JSON from {self.name}: {data_str}")
@@ -60,11 +112,43 @@ class Robot:
             print(f"Error processing data for {self.name}: {e}")
 
 
+    def publish(self, topic, **fields):
+        """Put an event on the bus, if there is one and anybody listens."""
+        if self.bus and self.bus.has_subscribers(topic):
+            self.bus.publish(topic, **fields)
+
+    def update_local_detections(self, detections, timestamp=None, pose_std=None):
+        """Ball and obstacles reported relative to the robot, transformed to the field frame in one pass."""
+        if not PERCEPTION_AVAILABLE:
+            return
+        pose = None
+        if self.pose_history is not None and isinstance(detections.get('time', timestamp), (int, float)):
+            pose = self.pose_history.at(detections.get('time', timestamp)) # Pose when the frame was taken
+        if pose is None:
+            pose = (self.position[0], self.position[1], self.orientation)
+        ball = detections.get('ball')
+        points = ([ball] if ball else []) + list(detections.get('obstacles') or [])
+        if not points:
+            self.local_ball_position, self.local_ball_variance = None, None
+            self.local_obstacles, self.local_obstacle_variances = [], []
+            return
+        xy, cov = to_global(pose, points, frame=detections.get('frame', "polar"),
+                            noise=detections.get('noise', (0.05, 0.02)), pose_std=pose_std)
+        positions = xy.round(3).tolist()
+        variances = [[float(c[0, 0]), float(c[1, 1])] for c in cov]
+        if ball:
+            self.local_ball_position, self.local_ball_variance = positions[0], variances[0]
+            positions, variances = positions[1:], variances[1:]
+        else:
+            self.local_ball_position, self.local_ball_variance = None, None
+        self.local_obstacles, self.local_obstacle_variances = positions, variances
+
     def connect(self):
         """Connect to the robot using WiFiHandler."""
         if self.wifi_handler and not self.wifi_handler.connected: # Check wifi_handler's connected status
             if self.wifi_handler.connect(): # This now also starts listening
                 self.connected = True # Robot considered connected if WiFi link is up
+                self.telemetry_rate_hz = None # The robot may have rebooted: send the rate again
                 return True
             else:
                 self.connected = False
@@ -79,48 +163,197 @@ class Robot:
         if self.wifi_handler: # and self.connected: # self.connected might be true even if wifi_handler is None
             self.wifi_handler.disconnect()
         self.connected = False # Always set to false on disconnect intent
+        self.telemetry_rate_hz = None
 
-    def send_to_robot(self, msg):
-        """Send a message to the robot."""
-        if self.wifi_handler and self.connected:
+    def can_send(self):
+        return bool(self.wifi_handler and self.connected and not self.read_only)
+
+    def send_to_robot(self, msg, priority=PRIORITY_MOTION, enqueued_at=None):
+        """Send a message to the robot (queued by priority when a scheduler is attached)."""
+        if self.read_only:
+            return
+        if self.can_send():
             # print(f"Attempting to send to {self.name}: {msg}") # Debug
-            self.wifi_handler.send(msg)
+            if self.scheduler:
+                self.scheduler.submit(self.wifi_handler, msg, priority, enqueued_at)
+            else:
+                self.wifi_handler.send(msg)
+            self.publish(COMMANDS, robot_id=self.robot_id, message=msg, priority=priority)
         else:
             print(f"Cannot send to {self.name}: Not connected or no WiFi handler.")
 
+    def set_telemetry_rate(self, rate_hz):
+        """Ask the robot to send its status at rate_hz (it still only sends on change)."""
+        if rate_hz == self.telemetry_rate_hz:
+            return
+        self.telemetry_rate_hz = rate_hz
+        self.telemetry_rate_sent_at = time.monotonic()
+        self.send_to_robot(json.dumps({"type": "telemetry_rate", "rate_hz": rate_hz}), PRIORITY_DIAGNOSTICS)
+
+    def check_telemetry_rate(self, reported_hz, now=None):
+        """Status packets echo the robot's rate; resend ours if it differs (lost message, robot reboot)."""
+        if not self.can_send() or self.telemetry_rate_hz is None or abs(reported_hz - self.telemetry_rate_hz) < 1e-6:
+            return
+        now = time.monotonic() if now is None else now
+        if now - self.telemetry_rate_sent_at < TELEMETRY_RATE_RETRY_S:
+            return
+        self.telemetry_rate_sent_at = now
+        self.send_to_robot(json.dumps({"type": "telemetry_rate", "rate_hz": self.telemetry_rate_hz}), PRIORITY_DIAGNOSTICS)
+
     def set_parameters(self, parameters):
         self.parameters.update(parameters)
         print(f"Updated parameters for {self.name}")
 
+def create_robots_from_config(config):
+    """Build the team's Robot objects from the "robots" section of the config."""
+    robots = []
+    field_w, field_h = config.get('field_dimensions', (12, 9))
+    robot_configs = config.get('robots', [])
+
+    def default_home(r_idx, count):
+        # Spread over a line across our half (centre-origin frame, our goal at -x)
+        return [-field_w / 4, field_h * ((r_idx + 1) / (count + 1) - 0.5)]
+
+    for r_idx, r_conf in enumerate(robot_configs):
+        robots.append(Robot(
+            robot_id=r_conf['id'], name=r_conf.get('name', "Player"), color=r_conf.get('color', "blue"),
+            ip_address=r_conf.get('ip'), send_to_port=r_conf.get('send_to_port'),
+            base_station_listen_port=r_conf.get('base_listen_port'),
+            initial_pos=r_conf.get('initial_pos', default_home(r_idx, len(robot_configs))),
+            initial_orient=r_conf.get('initial_orient', 0)
+        ))
+
+    if not robots:
+        robots = [Robot(i + 1, "Player", "blue", initial_pos=default_home(i, 5), initial_orient=0) for i in range(5)]
+    return robots
+
 class GlobalWorldMap:
-    def __init__(self, field_dims=(12,9)):
+    def __init__(self, field_dims=(12,9), tracker_config=None, ball_filter_config=None):
         self.field_dimensions = tuple(field_dims)
-        self.ball_position = [self.field_dimensions[0] / 2, self.field_dimensions[1] / 2] # Default to center
+        # Field frame: metres, origin at the centre spot, x towards the opponent goal, y up (left)
+        self.ball_position = [0.0, 0.0] # Centre spot until some robot has seen the ball
+        self.ball_known = False # True once the ball filter has a measurement; consumers skip the default
+        self.ball_in_sight = False # Some robot saw the ball within BALL_IN_SIGHT_S (else the position is held)
+        self.ball_velocity = [0.0, 0.0]
+        self.ball_filter = BallFilter(**(ball_filter_config or {}))
+        self.interception = None # {"robot_id", "time_s", "point"} from the interception predictor, if any
         self.obstacles = [] # Global list of unique obstacles
+        self.opponent_obstacles = [] # Positions of all opponent tracks, tentative ones too (what paths avoid)
+        self.opponent_tracker = OpponentTracker(**(tracker_config or {}))
+        self.opponents = [] # Confirmed OpponentTrack objects, refreshed every update
+        self.fused_seq = {} # robot_id -> Robot.status_seq of the last packet fused
+        self.last_heard = {} # robot_id -> update time at which its last new packet was fused
 
-    def update_from_robots(self, robots):
+    def update_from_robots(self, robots, now=None):
         # Aggregate ball position (e.g., average of robots that see it)
         # Aggregate obstacles (e.g., union of all seen obstacles)
         
-        # Ball position aggregation
-        visible_balls = []
+        if now is None:
+            now = time.monotonic()
+
+        # Only packets that arrived since the last update are measurements; robots report at 1-50 Hz
+        # and this runs every ~30 ms, so re-using a reading would count it several times.
+        # Robots that went quiet are left out altogether (their pose is no longer known).
+        fresh = []
+        reporting = []
         for robot in robots:
-            if robot.connected and robot.local_ball_position: # Use local_ball_position
+            if not robot.connected:
+                robot.silent = False
+                continue
+            if robot.status_seq != self.fused_seq.get(robot.robot_id):
+                self.fused_seq[robot.robot_id] = robot.status_seq
+                self.last_heard[robot.robot_id] = now
+                fresh.append(robot)
+            robot.silent = now - self.last_heard[robot.robot_id] > SILENT_AFTER_S
+            if not robot.silent:
+                reporting.append(robot)
+
+        # Ball: every robot that sees it is one measurement for the Kalman filter (position and velocity);
+        # without any the filter only predicts
+        visible_balls = []
+        ball_variances = [] # (var_x, var_y) per measurement, None for the filter's default noise
+        for robot in fresh:
+            if robot.local_ball_position: # Use local_ball_position
                 visible_balls.append(robot.local_ball_position)
-        
-        if visible_balls:
-            avg_ball_x = sum(pos[0] for pos in visible_balls) / len(visible_balls)
-            avg_ball_y = sum(pos[1] for pos in visible_balls) / len(visible_balls)
-            self.ball_position = [avg_ball_x, avg_ball_y]
-        # else: keep last known or default if no robot sees the ball
+                ball_variances.append(robot.local_ball_variance)
+
+        if self.ball_filter.update(visible_balls, now, ball_variances):
+            self.ball_position = self.ball_filter.position()
+            self.ball_velocity = self.ball_filter.velocity()
+        # else: keep the default until some robot has seen the ball
+        self.ball_known = self.ball_filter.initialized
+        last_seen = self.ball_filter.last_seen
+        self.ball_in_sight = last_seen is not None and now - last_seen <= BALL_IN_SIGHT_S
 
         # Obstacle aggregation (simple union, could be improved with filtering/merging)
         all_obstacles = []
-        for robot in robots:
-            if robot.connected and robot.local_obstacles:
+        for robot in reporting:
+            if robot.local_obstacles:
                 all_obstacles.extend(robot.local_obstacles)
         
         # To avoid duplicates if obstacles are represented precisely
         # This is a simple way; more robust methods might be needed for real-world noise
         unique_obstacles_tuples = {tuple(obs) for obs in all_obstacles}
-        self.obstacles = [list(obs) for obs in unique_obstacles_tuples]
\ No newline at end of file
+        self.obstacles = [list(obs) for obs in unique_obstacles_tuples]
+
+        # Opponents: new obstacle detections that are not teammates, tracked over time
+        self.opponents = self.opponent_tracker.update(fresh, now, teammates=reporting)
+        self.opponent_obstacles = [list(track.position) for track in self.opponent_tracker.tracks]
+
+    def snapshot(self, robots):
+        """Plain-data (JSON-serialisable) copy of the fused world and the team's state."""
+        return {
+            "time": time.time(),
+            "robots": [{
+                "id": robot.robot_id,
+                "connected": robot.connected,
+                "silent": robot.silent,
+                "position": list(robot.position),
+                "orientation": robot.orientation,
+                "battery": robot.parameters.get("battery_level"),
+                "ball": robot.local_ball_position,
+                "obstacles": robot.local_obstacles,
+            } for robot in robots],
+            "ball": list(self.ball_position),
+            "ball_known": self.ball_known,
+            "ball_in_sight": self.ball_in_sight,
+            "ball_velocity": list(self.ball_velocity),
+            "interception": self.interception,
+            "obstacles": self.obstacles,
+            "opponents": [{
+                "id": track.robot_id,
+                "position": list(track.position),
+                "velocity": list(track.velocity),
+                "orientation": track.orientation,
+            } for track in self.opponents],
+        }
+
+    def apply_snapshot(self, snapshot, robots):
+        """Update this map and the given robots from a snapshot() taken elsewhere (e.g. another process)."""
+        robots_by_id = {robot.robot_id: robot for robot in robots}
+        for data in snapshot["robots"]:
+            robot = robots_by_id.get(data["id"])
+            if robot is None:
+                continue
+            robot.connected = data["connected"]
+            robot.silent = data.get("silent", False)
+            robot.position = data["position"]
+            robot.orientation = data["orientation"]
+            if data["battery"] is not None:
+                robot.parameters["battery_level"] = data["battery"]
+            robot.local_ball_position = data["ball"]
+            robot.local_obstacles = data["obstacles"]
+        self.ball_position = snapshot["ball"]
+        self.ball_known = snapshot.get("ball_known", True)
+        self.ball_in_sight = snapshot.get("ball_in_sight", True)
+        self.ball_velocity = snapshot.get("ball_velocity", [0.0, 0.0])
+        self.interception = snapshot.get("interception")
+        self.obstacles = snapshot["obstacles"]
+        opponents = []
+        for data in snapshot["opponents"]:
+            track = OpponentTrack(data["id"], data["position"][0], data["position"][1], 0.0)
+            track.velocity = data["velocity"]
+            track.orientation = data["orientation"]
+            track.confirmed = True
+            opponents.append(track)
+        self.opponents = opponents
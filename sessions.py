@@ -0,0 +1,156 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from base_station import BaseStationLogic
+from base_station_UI import BaseStationUI, load_config
+from communication import NetworkLoop, OutboundScheduler
+from stall_watchdog import start_watchdog
+from world_process import ConsoleUI
+
+# Several independent base stations in one process, e.g. both teams of a
+# simulated scrimmage or a few test fields at once. Every session has its own
+# config, robots, world map, game state and RefBox link; they share one
+# NetworkLoop (all robot and RefBox sockets on a single selector thread), one
+# worker pool for background jobs and headless fusion, and one outbound
+# scheduler (its token buckets are per robot, so sessions don't throttle each
+# other). Each session needs its own base_listen_ports.
+#
+#   python base_station.py --sessions blue.json red.json   # one window each
+#   python sessions.py blue.json red.json                  # headless
+
+
+class Session:
+    def __init__(self, name, ui, logic):
+        self.name = name
+        self.ui = ui
+        self.logic = logic
+        self.window = None # Tk window of a UI session
+        self.tick_running = False # Headless: a fusion tick is queued or running on the pool
+
+
+class SessionManager:
+    def __init__(self, max_workers=4, scheduler_config=None):
+        self.network = NetworkLoop()
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session-worker")
+        scheduler_config = scheduler_config or {}
+        self.scheduler = OutboundScheduler(
+            rate_bytes_per_s=scheduler_config.get('rate_bytes_per_s', 20000),
+            burst_bytes=scheduler_config.get('burst_bytes', 4096),
+            max_queue_per_robot=scheduler_config.get('max_queue_per_robot', 64)
+        )
+        self.sessions = []
+
+    def start(self):
+        self.network.start()
+        self.scheduler.start()
+
+    def open(self, ui, name):
+        """Create the logic for a session's UI (BaseStationUI or a headless stand-in) and connect its robots."""
+        logic = BaseStationLogic(ui, network=self.network, pool=self.pool, scheduler=self.scheduler)
+        ui.logic = logic
+        session = Session(name, ui, logic)
+        self.sessions.append(session)
+        logic.connect_to_robots()
+        return session
+
+    def open_window(self, window, config, name):
+        """A session with its own BaseStationUI in window (the Tk root or a Toplevel)."""
+        ui = BaseStationUI(window, config=config, title=f"Team Era Base Station - {name}")
+        session = self.open(ui, name)
+        session.window = window
+        session.logic.update_world_state_and_ui() # Tk after() loop, as in single-session mode
+        return session
+
+    def open_headless(self, config, name, tick_s=0.03):
+        """A session without UI; the world is fused every tick_s on the worker pool."""
+        session = self.open(ConsoleUI(config, prefix=f"[{name}] "), name)
+        self.network.call_later(tick_s, self._tick, session, tick_s)
+        return session
+
+    def _tick(self, session, tick_s):
+        # Runs on the network loop: hand fusion to the pool, skipping a tick if the last one is still busy
+        if session.logic.closed:
+            return
+        if not session.tick_running:
+            session.tick_running = True
+            self.pool.submit(self._fuse, session)
+        self.network.call_later(tick_s, self._tick, session, tick_s)
+
+    def _fuse(self, session):
+        try:
+            session.logic.update_world_state()
+        except Exception as e:
+            print(f"[{session.name}] World update failed: {e}")
+        finally:
+            session.tick_running = False
+
+    def close(self, session):
+        if session in self.sessions:
+            self.sessions.remove(session)
+            session.logic.close()
+
+    def stop(self):
+        for session in list(self.sessions):
+            self.close(session)
+        self.scheduler.stop()
+        self.network.stop()
+        self.pool.shutdown(wait=False)
+
+
+def run_session_windows(root, config_paths):
+    """One window per config: the first in root, the others in Toplevels. Closing root ends them all."""
+    import tkinter as tk
+    configs = [load_config(path) for path in config_paths]
+    if not all(configs):
+        print("Exiting due to configuration error.")
+        root.destroy()
+        return
+    manager = SessionManager(scheduler_config=configs[0].get('scheduler'))
+    manager.start()
+    watchdog = start_watchdog(root, configs[0]) # One Tk loop for all windows
+    for index, (path, config) in enumerate(zip(config_paths, configs)):
+        window = root if index == 0 else tk.Toplevel(root)
+        session = manager.open_window(window, config, path)
+        if window is not root:
+            def close_window(session=session, window=window):
+                manager.close(session)
+                window.destroy()
+            window.protocol("WM_DELETE_WINDOW", close_window)
+
+    root.mainloop()
+
+    print("Closing application. Stopping sessions...")
+    manager.stop()
+    if watchdog:
+        watchdog.stop()
+        watchdog.print_report()
+    print("Application closed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several headless base-station sessions in one process")
+    parser.add_argument("configs", nargs="+", metavar="CONFIG")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--refbox", action="store_true", help="Connect every session to its RefBox")
+    args = parser.parse_args()
+
+    configs = [load_config(path) for path in args.configs]
+    if not all(configs):
+        return
+    manager = SessionManager(max_workers=args.workers, scheduler_config=configs[0].get('scheduler'))
+    manager.start()
+    for path, config in zip(args.configs, configs):
+        session = manager.open_headless(config, path, tick_s=config['pipeline'].get('tick_ms', 30) / 1000.0)
+        if args.refbox:
+            session.logic.connect_to_refbox()
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        manager.stop()
+
+
+if __name__ == "__main__":
+    main()
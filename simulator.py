@@ -0,0 +1,480 @@
+import argparse
+import json
+import math
+import select
+import socket
+import time
+import numpy as np
+from param_sync import ParameterStore
+
+# Deterministic 2-D soccer simulator for strategy testing.
+#
+# All state lives in NumPy arrays with a leading scenario axis, so the same
+# code steps one match (UDP mode) or thousands of independent scenarios at
+# once (batch mode). Robots are discs with acceleration, speed and turn-rate
+# limits; the ball rolls with exponential friction, bounces off the side
+# lines and robots, and can be kicked. With the same seed and commands, a run
+# is bit-for-bit repeatable: nothing depends on wall-clock time.
+#
+# UDP mode stands in for the real robots: every robot of our team listens on
+# the ip/send_to_port from config.json and reports to the base station on its
+# base_listen_port, in the same JSON the robots send. For a local test give
+# each robot its own loopback address (127.0.0.2, 127.0.0.3, ...) or its own
+# send_to_port. Opponents are simulated too and show up as obstacles.
+#
+#   python simulator.py                      # UDP mode, config.json
+#   python simulator.py --batch 2000 --seconds 20
+#
+# Field frame as in the base station: metres, origin at the centre, our team
+# attacks +x.
+
+ROBOT_RADIUS_M = 0.25
+BALL_RADIUS_M = 0.11
+GOAL_WIDTH_M = 2.0
+KICK_REACH_M = 0.1 # Ball gap in front of the robot within which a kick connects
+KICK_CONE_RAD = math.radians(35)
+BALL_RESTITUTION = 0.3 # Off robots
+WALL_RESTITUTION = 0.5 # Off the side and goal lines
+BALL_STOP_SPEED = 0.02
+
+
+def wrap_angle(angle):
+    return (angle + np.pi) % (2 * np.pi) - np.pi
+
+
+class Simulation:
+    """Physics for S scenarios x N robots (team 0 first, then team 1)."""
+    def __init__(self, field_dims, team_sizes=(5, 5), scenarios=1, dt=0.01, seed=0,
+                 max_speed=2.0, acceleration=1.5, rotation_speed=3.0, kick_speed=6.0,
+                 ball_friction=0.6, observation_noise_m=0.0, vision_range_m=5.0):
+        self.field_w, self.field_h = field_dims
+        self.team_sizes = tuple(team_sizes)
+        self.scenarios = scenarios
+        self.n = sum(team_sizes)
+        self.team = np.repeat(np.arange(len(team_sizes)), team_sizes) # (N,)
+        self.dt = dt
+        self.ball_friction = ball_friction
+        self.observation_noise_m = observation_noise_m
+        self.vision_range_m = vision_range_m
+        self.rng = np.random.default_rng(seed)
+
+        # Per-robot limits (N,), changeable per robot (e.g. from set_parameters)
+        self.max_speed = np.full(self.n, float(max_speed))
+        self.acceleration = np.full(self.n, float(acceleration))
+        self.rotation_speed = np.full(self.n, float(rotation_speed))
+        self.kick_speed = np.full(self.n, float(kick_speed))
+
+        shape = (scenarios, self.n)
+        self.time = 0.0
+        self.pos = np.zeros(shape + (2,))
+        self.theta = np.zeros(shape)
+        self.vel = np.zeros(shape + (2,))
+        self.target = np.zeros(shape + (2,))
+        self.has_target = np.zeros(shape, dtype=bool)
+        self.target_theta = np.full(shape, np.nan) # Heading to hold at the target (nan: face the direction of travel)
+        self.manual = np.zeros(shape + (3,)) # (vx, vy, omega) in the robot frame
+        self.manual_until = np.full(shape, -1.0)
+        self.ball = np.zeros((scenarios, 2))
+        self.ball_vel = np.zeros((scenarios, 2))
+        self.score = np.zeros((scenarios, 2), dtype=int) # Goals for team 0, team 1
+        self.home = np.zeros((self.n, 2))
+        self.kickoff_positions()
+
+    def kickoff_positions(self):
+        """Default homes: each team in a line on its own half, facing the opponent goal."""
+        offset = 0
+        for team, size in enumerate(self.team_sizes):
+            side = -1 if team == 0 else 1
+            ys = np.linspace(-self.field_h / 3, self.field_h / 3, size) if size > 1 else np.zeros(1)
+            self.home[offset:offset + size, 0] = side * self.field_w / 4
+            self.home[offset:offset + size, 1] = ys
+            offset += size
+        self.reset()
+
+    def reset(self, ball=(0.0, 0.0), ball_velocity=(0.0, 0.0)):
+        self.pos[:] = self.home
+        self.theta[:] = np.where(self.team == 0, 0.0, np.pi)
+        self.vel[:] = 0
+        self.has_target[:] = False
+        self.target_theta[:] = np.nan
+        self.manual_until[:] = -1.0
+        self.ball[:] = ball
+        self.ball_vel[:] = ball_velocity
+
+    # Commands (masks are (S, N) or broadcastable)
+
+    def go_to(self, mask, target, heading=np.nan):
+        self.target[mask] = np.broadcast_to(target, self.target.shape)[mask] if np.ndim(target) > 1 else target
+        self.target_theta[mask] = heading
+        self.has_target[mask] = True
+        self.manual_until[mask] = -1.0
+
+    def stop(self, mask):
+        self.has_target[mask] = False
+        self.manual_until[mask] = -1.0
+
+    def drive(self, mask, vx, vy, omega, duration_s):
+        """Robot-frame velocity command for duration_s (manual control)."""
+        self.manual[mask] = (vx, vy, omega)
+        self.manual_until[mask] = self.time + duration_s
+        self.has_target[mask] = False
+
+    def kick(self, mask, power=1.0):
+        """Kick where the ball is just in front of a robot in mask. Returns (S,) bool: a kick connected."""
+        offset = self.ball[:, None, :] - self.pos
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        bearing = wrap_angle(np.arctan2(offset[..., 1], offset[..., 0]) - self.theta)
+        can = mask & (distance <= ROBOT_RADIUS_M + BALL_RADIUS_M + KICK_REACH_M) & (np.abs(bearing) <= KICK_CONE_RAD)
+        kicked = can.any(axis=1)
+        kicker = can.argmax(axis=1)
+        s = np.nonzero(kicked)[0]
+        k = kicker[s]
+        heading = self.theta[s, k]
+        speed = self.kick_speed[k] * power
+        self.ball_vel[s] = np.stack([np.cos(heading), np.sin(heading)], axis=1) * speed[:, None]
+        return kicked
+
+    # Physics
+
+    def step(self, steps=1):
+        for _ in range(steps):
+            self._step_robots()
+            self._step_ball()
+            self.time += self.dt
+
+    def _step_robots(self):
+        dt = self.dt
+        accel = self.acceleration[None, :, None]
+        # Desired velocity: arrive at the target without overshooting, or the manual command
+        to_target = self.target - self.pos
+        distance = np.hypot(to_target[..., 0], to_target[..., 1])
+        speed = np.minimum(self.max_speed[None, :], np.sqrt(2 * self.acceleration[None, :] * distance))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            direction = np.where(distance[..., None] > 1e-6, to_target / distance[..., None], 0.0)
+        desired = np.where(self.has_target[..., None], direction * speed[..., None], 0.0)
+        manual = self.manual_until > self.time
+        cos_t, sin_t = np.cos(self.theta), np.sin(self.theta)
+        manual_world = np.stack([self.manual[..., 0] * cos_t - self.manual[..., 1] * sin_t,
+                                 self.manual[..., 0] * sin_t + self.manual[..., 1] * cos_t], axis=-1)
+        desired = np.where(manual[..., None], manual_world, desired)
+
+        change = desired - self.vel
+        change_norm = np.hypot(change[..., 0], change[..., 1])[..., None]
+        limit = accel * dt
+        self.vel += np.where(change_norm > limit, change * (limit / np.maximum(change_norm, 1e-9)), change)
+        self.pos += self.vel * dt
+        np.clip(self.pos[..., 0], -self.field_w / 2 - 0.5, self.field_w / 2 + 0.5, out=self.pos[..., 0])
+        np.clip(self.pos[..., 1], -self.field_h / 2 - 0.5, self.field_h / 2 + 0.5, out=self.pos[..., 1])
+
+        # Heading: manual turn rate, else the target heading near the target, else the direction of travel
+        travel_heading = np.arctan2(to_target[..., 1], to_target[..., 0])
+        near = distance < 0.3
+        wanted = np.where(near & ~np.isnan(self.target_theta), self.target_theta, np.where(near, self.theta, travel_heading))
+        turn = np.clip(wrap_angle(wanted - self.theta), -self.rotation_speed * dt, self.rotation_speed * dt)
+        turn = np.where(self.has_target, turn, 0.0)
+        turn = np.where(manual, self.manual[..., 2] * dt, turn)
+        self.theta = wrap_angle(self.theta + turn)
+
+        # Robot-robot overlap: push both apart along the line between them
+        diff = self.pos[:, :, None, :] - self.pos[:, None, :, :] # (S, N, N, 2)
+        gap = np.hypot(diff[..., 0], diff[..., 1])
+        overlap = np.clip(2 * ROBOT_RADIUS_M - gap, 0, None)
+        np.einsum("snn->sn", overlap)[:] = 0 # No self-interaction
+        with np.errstate(invalid="ignore", divide="ignore"):
+            push = np.where(gap[..., None] > 1e-9, diff / gap[..., None], 0.0) * (overlap / 2)[..., None]
+        self.pos += push.sum(axis=2)
+
+    def _step_ball(self):
+        dt = self.dt
+        self.ball += self.ball_vel * dt
+        self.ball_vel *= math.exp(-self.ball_friction * dt)
+        slow = np.hypot(self.ball_vel[:, 0], self.ball_vel[:, 1]) < BALL_STOP_SPEED
+        self.ball_vel[slow] = 0.0
+
+        # Contact with the nearest robot: put the ball back on its surface and bounce off it
+        offset = self.ball[:, None, :] - self.pos
+        distance = np.hypot(offset[..., 0], offset[..., 1])
+        nearest = distance.argmin(axis=1)
+        s = np.arange(self.scenarios)
+        d = distance[s, nearest]
+        touching = d < ROBOT_RADIUS_M + BALL_RADIUS_M
+        if touching.any():
+            t = s[touching]
+            r = nearest[touching]
+            normal = offset[t, r] / np.maximum(d[touching], 1e-9)[:, None]
+            self.ball[t] = self.pos[t, r] + normal * (ROBOT_RADIUS_M + BALL_RADIUS_M)
+            relative = self.ball_vel[t] - self.vel[t, r]
+            approach = np.minimum((relative * normal).sum(axis=1), 0.0)
+            self.ball_vel[t] -= (1 + BALL_RESTITUTION) * approach[:, None] * normal
+
+        # Goals and lines
+        half_w, half_h = self.field_w / 2, self.field_h / 2
+        in_mouth = np.abs(self.ball[:, 1]) < GOAL_WIDTH_M / 2
+        for side, team in ((1, 0), (-1, 1)): # Ball over +x line: goal for team 0
+            goal = in_mouth & (side * self.ball[:, 0] > half_w)
+            if goal.any():
+                self.score[goal, team] += 1
+                self.ball[goal] = 0.0
+                self.ball_vel[goal] = 0.0
+        for axis, limit in ((0, half_w), (1, half_h)):
+            out = np.abs(self.ball[:, axis]) > limit
+            if out.any():
+                self.ball[out, axis] = np.sign(self.ball[out, axis]) * limit
+                self.ball_vel[out, axis] *= -WALL_RESTITUTION
+
+    # Sensing
+
+    def observe(self, scenario, robot):
+        """Status message fields for one robot: own pose, ball and other robots within vision range."""
+        noise = self.observation_noise_m
+        position = self.pos[scenario, robot]
+
+        def seen(point):
+            if noise:
+                point = point + self.rng.normal(0.0, noise, 2)
+            return [round(float(point[0]), 3), round(float(point[1]), 3)]
+
+        ball = self.ball[scenario]
+        ball_seen = np.hypot(*(ball - position)) <= self.vision_range_m
+        others = np.delete(np.arange(self.n), robot)
+        distance = np.hypot(*(self.pos[scenario, others] - position).T)
+        obstacles = [seen(self.pos[scenario, i]) for i in others[distance <= self.vision_range_m]]
+        return {
+            "position": [round(float(position[0]), 3), round(float(position[1]), 3)],
+            "orientation": round(float(self.theta[scenario, robot]), 3),
+            "ball_position": seen(ball) if ball_seen else None,
+            "obstacles": obstacles,
+        }
+
+
+def chase_policy(sim, team, kick=True):
+    """Simple vectorised behaviour: each scenario's closest robot of `team` plays the ball toward the
+    opponent goal, the others return home. Used for opponents and for batch evaluation."""
+    members = np.nonzero(sim.team == team)[0]
+    if len(members) == 0:
+        return
+    attack = 1.0 if team == 0 else -1.0
+    goal = np.array([attack * sim.field_w / 2, 0.0])
+    distance = np.hypot(*(sim.ball[:, None, :] - sim.pos[:, members]).transpose(2, 0, 1))
+    chaser = members[distance.argmin(axis=1)] # (S,)
+    s = np.arange(sim.scenarios)
+
+    # Approach from behind the ball on the ball-goal line, facing the goal
+    to_goal = goal - sim.ball
+    to_goal /= np.maximum(np.hypot(to_goal[:, 0], to_goal[:, 1]), 1e-9)[:, None]
+    behind = sim.ball - to_goal * (ROBOT_RADIUS_M + BALL_RADIUS_M)
+    chasing = np.zeros((sim.scenarios, sim.n), dtype=bool)
+    chasing[s, chaser] = True
+    others = np.zeros_like(chasing)
+    others[:, members] = True
+    others &= ~chasing
+    sim.target[s, chaser] = behind
+    sim.target_theta[s, chaser] = np.arctan2(to_goal[:, 1], to_goal[:, 0])
+    sim.has_target[s, chaser] = True
+    sim.target[others] = np.broadcast_to(sim.home, sim.target.shape)[others]
+    sim.target_theta[others] = np.nan
+    sim.has_target[others] = True
+    if kick:
+        sim.kick(chasing)
+
+
+def run_batch(scenarios, seconds, field_dims=(12, 9), team_sizes=(5, 5), seed=0, dt=0.01):
+    """Play `scenarios` random kick-offs in parallel with chase_policy for both teams; returns the Simulation."""
+    sim = Simulation(field_dims, team_sizes, scenarios=scenarios, dt=dt, seed=seed)
+    rng = np.random.default_rng(seed)
+    sim.ball[:] = rng.uniform([-1, -1], [1, 1], (scenarios, 2))
+    sim.ball_vel[:] = rng.normal(0, 1.0, (scenarios, 2))
+    policy_every = max(1, int(round(0.05 / dt))) # Decide at 20 Hz, step physics at 1/dt
+    for step in range(int(round(seconds / dt))):
+        if step % policy_every == 0:
+            chase_policy(sim, 0)
+            chase_policy(sim, 1)
+        sim.step()
+    return sim
+
+
+class UdpRobots:
+    """Our team's simulated robots on UDP, speaking the real robots' protocol; opponents run chase_policy."""
+    def __init__(self, config, sim_config=None):
+        sim_config = sim_config or config.get('simulator', {})
+        robots = config['robots']
+        self.base_ip = sim_config.get('base_station_ip', "127.0.0.1")
+        self.speed = sim_config.get('speed', 1.0) # Simulated seconds per wall-clock second
+        self.sim = Simulation(config['field_dimensions'], (len(robots), sim_config.get('opponents', 5)),
+                              dt=sim_config.get('dt', 0.01), seed=sim_config.get('seed', 0),
+                              observation_noise_m=sim_config.get('observation_noise_m', 0.02))
+        for i, r in enumerate(robots):
+            if 'initial_pos' in r:
+                self.sim.home[i] = r['initial_pos'][:2]
+        self.sim.reset()
+        self.robots = robots
+        self.sockets = []
+        for r in robots:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((sim_config.get('bind_ip') or r['ip'], r['send_to_port']))
+            sock.setblocking(False)
+            self.sockets.append(sock)
+            print(f"Simulated {r.get('name', 'Player')} {r['id']} on {sock.getsockname()}, reporting to {self.base_ip}:{r['base_listen_port']}")
+        self.status_rate_hz = [10.0] * len(robots)
+        # "global": ball and obstacles in field coordinates; "polar": range/bearing from the robot (perception.py)
+        self.report_frame = sim_config.get('report_frame', "global")
+        self.observation_noise_m = sim_config.get('observation_noise_m', 0.02)
+        self.parameters = [ParameterStore({"max_speed": float(self.sim.max_speed[i]),
+                                           "acceleration": float(self.sim.acceleration[i])}) for i in range(len(robots))]
+        self.next_status = [0.0] * len(robots)
+        self.playing = False
+        self.interceptor = None # Index of the robot told it is the interceptor (role_hint)
+        self.running = False
+
+    def handle(self, i, data):
+        text = data.decode(errors="replace")
+        try:
+            message = json.loads(text)
+        except ValueError:
+            message = None
+        sim = self.sim
+        mask = np.zeros((1, sim.n), dtype=bool)
+        mask[0, i] = True
+        if not isinstance(message, dict):
+            parts = text.split() # Plain-text commands of robot_end: "move x y", "turn angle"
+            if len(parts) == 3 and parts[0] == "move":
+                sim.go_to(mask, (float(parts[1]), float(parts[2])))
+            return
+        kind = message.get("type")
+        if kind == "command":
+            command = message.get("command")
+            if command == "PLAY":
+                self.playing = True
+            elif command in ("PAUSE", "SET_PIECE"):
+                self.playing = False
+                sim.stop(mask)
+            elif command == "RESET_POSITION":
+                self.playing = False
+                sim.go_to(mask, sim.home[i])
+            elif command == "MOVE_TO" and message.get("target"):
+                sim.go_to(mask, message["target"][:2])
+        elif kind == "move":
+            speed = float(sim.max_speed[i]) / 2
+            vx, vy, omega = {"forward": (speed, 0, 0), "backward": (-speed, 0, 0), "left": (0, speed, 0),
+                             "right": (0, -speed, 0), "rotate_left": (0, 0, 1.5), "rotate_right": (0, 0, -1.5),
+                             "stop": (0, 0, 0)}.get(message.get("direction"), (0, 0, 0))
+            sim.drive(mask, vx, vy, omega, 0.5)
+        elif kind == "test" and message.get("action") == "kick":
+            sim.kick(mask)
+        elif kind in ("set_parameters", "param_query", "param_patch"):
+            store = self.parameters[i]
+            reply = store.handle(message)
+            if reply:
+                self.sockets[i].sendto(json.dumps(reply).encode(), (self.base_ip, self.robots[i]['base_listen_port']))
+            for name, array in (("max_speed", sim.max_speed), ("acceleration", sim.acceleration)):
+                if isinstance(store.parameters.get(name), (int, float)):
+                    array[i] = store.parameters[name]
+        elif kind == "telemetry_rate":
+            self.status_rate_hz[i] = min(max(float(message.get("rate_hz", 10.0)), 0.5), 100.0)
+        elif kind == "path" and message.get("waypoints"):
+            sim.go_to(mask, message["waypoints"][-1][:2])
+        elif kind == "role_hint":
+            if message.get("role") == "interceptor":
+                self.interceptor = i
+            elif self.interceptor == i:
+                self.interceptor = None
+
+    def relative_status(self, status):
+        """status with the ball and obstacles as range/bearing from the robot instead of field positions."""
+        x, y = status["position"]
+        theta = status["orientation"]
+
+        def polar(point):
+            dx, dy = point[0] - x, point[1] - y
+            bearing = math.atan2(dy, dx) - theta
+            return [round(math.hypot(dx, dy), 3), round(math.atan2(math.sin(bearing), math.cos(bearing)), 4)]
+
+        now = time.time()
+        noise = max(self.observation_noise_m, 0.01)
+        return {
+            "position": status["position"], "orientation": theta, "timestamp": now,
+            "pose_std": [0.02, 0.02, 0.01],
+            "detections": {"frame": "polar", "time": now, "noise": [noise, 0.01],
+                           "ball": polar(status["ball_position"]) if status["ball_position"] else None,
+                           "obstacles": [polar(point) for point in status["obstacles"]]},
+        }
+
+    def run(self, duration_s=None):
+        sim = self.sim
+        tick_s = 0.02 # Wall-clock period of the network/physics loop
+        steps_per_tick = max(1, int(round(tick_s * self.speed / sim.dt)))
+        started = time.monotonic()
+        next_tick = started
+        self.running = True
+        try:
+            while self.running and (duration_s is None or time.monotonic() - started < duration_s):
+                readable, _, _ = select.select(self.sockets, [], [], max(0.0, next_tick - time.monotonic()))
+                for sock in readable:
+                    i = self.sockets.index(sock)
+                    while True:
+                        try:
+                            data, _ = sock.recvfrom(65536)
+                        except BlockingIOError:
+                            break
+                        self.handle(i, data)
+                if time.monotonic() < next_tick:
+                    continue
+                next_tick += tick_s
+
+                if self.playing:
+                    chase_policy(sim, 1)
+                    if self.interceptor is not None:
+                        # Our interceptor plays the ball; the rest keep their current commands
+                        ours = sim.team == 0
+                        saved = sim.target.copy(), sim.target_theta.copy(), sim.has_target.copy()
+                        chase_policy(sim, 0)
+                        keep = ours.copy()
+                        keep[self.interceptor] = False
+                        sim.target[:, keep], sim.target_theta[:, keep], sim.has_target[:, keep] = \
+                            saved[0][:, keep], saved[1][:, keep], saved[2][:, keep]
+                sim.step(steps_per_tick)
+
+                for i, r in enumerate(self.robots):
+                    if sim.time >= self.next_status[i]:
+                        self.next_status[i] = sim.time + 1.0 / self.status_rate_hz[i]
+                        status = sim.observe(0, i)
+                        if self.report_frame == "polar":
+                            status = self.relative_status(status)
+                        status["param_version"] = self.parameters[i].version
+                        status["status_rate_hz"] = self.status_rate_hz[i]
+                        status = json.dumps(status).encode()
+                        self.sockets[i].sendto(status, (self.base_ip, r['base_listen_port']))
+        finally:
+            self.running = False
+            for sock in self.sockets:
+                sock.close()
+
+    def stop(self):
+        self.running = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless soccer simulator")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--batch", type=int, default=0, help="Run this many scenarios in-process instead of UDP mode")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Simulated seconds per batch scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with open(args.config) as f:
+        config = json.load(f)
+    if args.batch:
+        started = time.perf_counter()
+        sim = run_batch(args.batch, args.seconds, config.get('field_dimensions', (12, 9)), seed=args.seed)
+        elapsed = time.perf_counter() - started
+        simulated = args.batch * args.seconds
+        print(f"{args.batch} scenarios x {args.seconds:.0f} s in {elapsed:.2f} s "
+              f"({simulated / elapsed:.0f}x real time overall)")
+        goals = sim.score.sum(axis=0)
+        print(f"Goals: team 0 {goals[0]}, team 1 {goals[1]}; scenarios with a goal: {(sim.score.sum(axis=1) > 0).sum()}")
+    else:
+        UdpRobots(config).run()
+
+
+if __name__ == "__main__":
+    main()
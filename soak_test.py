@@ -0,0 +1,263 @@
+import argparse
+import copy
+import json
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+from base_station import BaseStationLogic
+from base_station_UI import load_config
+from simulator import UdpRobots
+
+# Long-run soak test: the base station runs for --duration against simulated
+# robots (simulator.py over UDP on loopback) and a scripted RefBox that
+# cycles through a match and drops the connection now and then. Meanwhile the
+# driver keeps opening robot detail and telemetry windows and reconnecting
+# the RefBox, like an operator would.
+#
+# Every --interval it samples traced Python memory (tracemalloc), thread
+# count and, with the UI, the number of Tk widgets, canvas items and log
+# lines. Samples taken after --warmup are compared with the first one; if any
+# grows past its limit the run fails (exit code 1) and prints the top
+# allocation differences.
+#
+#   python soak_test.py --duration 7200             # with the UI
+#   python soak_test.py --duration 600 --headless
+
+REFBOX_SCRIPT = [ # (command, seconds until the next one)
+    ("FIRST_HALF", 1), ("KICKOFF", 2), ("START", 20), ("STOP", 2), ("FREEKICK", 3), ("START", 20),
+    ("GOAL", 1), ("STOP", 2), ("KICKOFF", 2), ("START", 20), ("HALF_TIME", 3),
+    ("SECOND_HALF", 1), ("KICKOFF", 2), ("START", 20), ("STOP", 2), ("CORNER", 3), ("START", 20),
+    ("END_GAME", 5),
+]
+
+
+class ScriptedRefBox:
+    """TCP RefBox that loops REFBOX_SCRIPT and closes the connection every reconnect_every_s."""
+    def __init__(self, port=0, reconnect_every_s=120.0):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", port))
+        self.server.listen(1)
+        self.server.settimeout(0.5)
+        self.port = self.server.getsockname()[1]
+        self.reconnect_every_s = reconnect_every_s
+        self.running = False
+        self.connections = 0
+        self.step = 0
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._serve, name="scripted-refbox", daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.server.close()
+
+    def _serve(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                continue
+            self.connections += 1
+            connected_at = time.monotonic()
+            with conn:
+                conn.sendall(json.dumps({"command": "WELCOME"}).encode() + b"\0")
+                while self.running and time.monotonic() - connected_at < self.reconnect_every_s:
+                    command, wait_s = REFBOX_SCRIPT[self.step % len(REFBOX_SCRIPT)]
+                    self.step += 1
+                    try:
+                        conn.sendall(json.dumps({"command": command, "targetTeam": "224.16.32.44"}).encode() + b"\0")
+                    except OSError:
+                        break
+                    time.sleep(max(0.0, min(wait_s, connected_at + self.reconnect_every_s - time.monotonic())))
+
+
+def soak_config(config, refbox_port):
+    """Copy of config with robots on loopback addresses, the scripted RefBox and no optional servers."""
+    config = copy.deepcopy(config)
+    for index, robot in enumerate(config['robots']):
+        robot['ip'] = f"127.0.0.{index + 2}"
+    config['refbox'] = dict(config.get('refbox', {}), ip="127.0.0.1", port=refbox_port)
+    config['dashboard'] = dict(config.get('dashboard', {}), enabled=False)
+    config['shared_memory'] = dict(config.get('shared_memory', {}), enabled=False)
+    config['watchdog'] = dict(config.get('watchdog', {}), log_file="soak_stalls.log")
+    return config
+
+
+def count_widgets(widget):
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+class SoakMonitor:
+    def __init__(self, ui=None, top=15):
+        self.ui = ui
+        self.top = top
+        self.samples = [] # (elapsed_s, metrics dict)
+        self.baseline_snapshot = None
+        self.baseline = None
+        self.started = time.monotonic()
+        tracemalloc.start(10)
+
+    def metrics(self):
+        current, peak = tracemalloc.get_traced_memory()
+        result = {"memory_mb": current / 1e6, "threads": threading.active_count()}
+        if self.ui is not None:
+            ui = self.ui
+            result["widgets"] = count_widgets(ui.root)
+            canvases = [ui.field_canvas] + [w.local_map_canvas for w in ui.detail_windows.values() if w.exists()]
+            result["canvas_items"] = sum(len(canvas.find_all()) for canvas in canvases)
+            if ui.logging_text:
+                result["log_lines"] = int(ui.logging_text.index("end-1c").split(".")[0])
+        return result
+
+    def sample(self, baseline=False):
+        elapsed = time.monotonic() - self.started
+        metrics = self.metrics()
+        self.samples.append((elapsed, metrics))
+        if baseline:
+            self.baseline = metrics
+            self.baseline_snapshot = tracemalloc.take_snapshot()
+        growth = {key: value - self.baseline[key] for key, value in metrics.items()} if self.baseline else {}
+        print(f"[soak {elapsed:7.0f} s] " + "  ".join(
+            f"{key}={value:.1f}" + (f" ({growth[key]:+.1f})" if key in growth else "") for key, value in metrics.items()))
+
+    def verdict(self, limits):
+        """Compare the last sample with the baseline; returns the list of exceeded limits."""
+        if not self.baseline:
+            return ["no baseline sample (duration shorter than warmup?)"]
+        final = self.samples[-1][1]
+        failures = []
+        for key, limit in limits.items():
+            if key in final and final[key] - self.baseline[key] > limit:
+                failures.append(f"{key} grew by {final[key] - self.baseline[key]:.1f} (limit {limit})")
+        return failures
+
+    def allocation_report(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        print(f"Top {self.top} allocation changes since the baseline:")
+        for stat in snapshot.compare_to(self.baseline_snapshot, "lineno")[:self.top]:
+            print(f"  {stat}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Base station soak test with memory, thread and Tk growth checks")
+    parser.add_argument("--config", default="config.json")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Seconds to run")
+    parser.add_argument("--interval", type=float, default=60.0, help="Seconds between samples")
+    parser.add_argument("--warmup", type=float, default=60.0, help="Seconds before the baseline sample")
+    parser.add_argument("--headless", action="store_true", help="No Tk UI (no widget/item checks)")
+    parser.add_argument("--reconnect-every", type=float, default=120.0, help="RefBox drops the link this often (s)")
+    parser.add_argument("--max-memory-growth-mb", type=float, default=20.0)
+    parser.add_argument("--max-thread-growth", type=int, default=2)
+    parser.add_argument("--max-widget-growth", type=int, default=50)
+    parser.add_argument("--max-item-growth", type=int, default=200)
+    parser.add_argument("--max-log-growth", type=int, default=2000)
+    args = parser.parse_args()
+
+    limits = {"memory_mb": args.max_memory_growth_mb, "threads": args.max_thread_growth,
+              "widgets": args.max_widget_growth, "canvas_items": args.max_item_growth, "log_lines": args.max_log_growth}
+    base_config = load_config(args.config)
+    if not base_config:
+        return 2
+    refbox = ScriptedRefBox(reconnect_every_s=args.reconnect_every)
+    refbox.start()
+    config = soak_config(base_config, refbox.port)
+    robots = UdpRobots(config)
+    threading.Thread(target=robots.run, name="simulated-robots", daemon=True).start()
+
+    if args.headless:
+        from world_process import ConsoleUI
+
+        class QuietUI(ConsoleUI):
+            def post(self, event):
+                pass # Hours of log lines on the console would dominate the run
+
+        ui = QuietUI(config)
+        root = None
+    else:
+        import tkinter as tk
+        from base_station_UI import BaseStationUI
+        from stall_watchdog import start_watchdog
+        root = tk.Tk()
+        ui = BaseStationUI(root, config=config, title="Base Station - soak test")
+        watchdog = start_watchdog(root, config)
+
+    logic = BaseStationLogic(ui)
+    ui.logic = logic
+    logic.connect_to_robots()
+    logic.connect_to_refbox()
+    monitor = SoakMonitor(None if args.headless else ui)
+    started = time.monotonic()
+    state = {"next_sample": started + args.warmup, "baseline": False, "action": 0}
+
+    def operator_step():
+        # What a person at the base station does now and then
+        if not logic.refbox_handler.connected:
+            logic.connect_to_refbox()
+        if not args.headless and ui.robots:
+            robot = ui.robots[state["action"] % len(ui.robots)]
+            if state["action"] % 3 == 0:
+                ui.show_robot_detail(robot)
+            elif state["action"] % 3 == 1 and ui.telemetry:
+                ui.show_telemetry_plot(robot)
+            else:
+                for window in list(ui.detail_windows.values()) + list(ui.telemetry_windows.values()):
+                    window.hide()
+        state["action"] += 1
+
+    def check():
+        now = time.monotonic()
+        if now >= state["next_sample"]:
+            monitor.sample(baseline=not state["baseline"])
+            state["baseline"] = True
+            state["next_sample"] = now + args.interval
+        return now - started < args.duration
+
+    if args.headless:
+        next_operator = started
+        while check():
+            logic.update_world_state()
+            if time.monotonic() >= next_operator:
+                operator_step()
+                next_operator += 2.0
+            time.sleep(0.03)
+    else:
+        def tick():
+            operator_step()
+            if check():
+                root.after(2000, tick)
+            else:
+                root.quit()
+        logic.update_world_state_and_ui()
+        root.after(2000, tick)
+        root.mainloop()
+
+    monitor.sample()
+    logic.close()
+    robots.stop()
+    refbox.stop()
+    failures = monitor.verdict(limits)
+    print(f"Ran {time.monotonic() - started:.0f} s, {refbox.connections} RefBox connections, "
+          f"{refbox.step} RefBox commands.")
+    if monitor.baseline_snapshot:
+        monitor.allocation_report()
+    if not args.headless:
+        if watchdog:
+            watchdog.stop()
+            watchdog.print_report()
+        root.destroy()
+    if failures:
+        print("SOAK TEST FAILED: " + "; ".join(failures))
+        return 1
+    print("Soak test passed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+import os
+import sys
+import threading
+import time
+import traceback
+
+# Tk main-loop stall watchdog.
+#
+# The Tk thread bumps a heartbeat from an after() callback every interval.
+# A watchdog thread checks it; when the heartbeat is older than the
+# threshold, the main loop is stuck in some callback. The watchdog then
+# captures the stacks of all threads (sys._current_frames), names the Tk
+# callback that is running (the frame right below tkinter's CallWrapper),
+# and writes the report to a log file. When the loop comes back, the stall's
+# duration is logged and added to per-callback statistics.
+#
+# The log is a two-file ring: past max_bytes, stalls.log becomes stalls.log.1
+# (replacing the older one), so it never grows without bound.
+
+TK_CALLWRAPPER = os.path.join("tkinter", "__init__.py")
+
+
+def running_callback(frame):
+    """'function (file:line)' of the Tk callback executing in frame's stack, or of its innermost frame."""
+    stack = traceback.extract_stack(frame)
+    callback = stack[-1] if stack else None
+    for index in range(len(stack) - 2, -1, -1):
+        entry = stack[index]
+        if entry.filename.endswith(TK_CALLWRAPPER) and entry.name == "__call__":
+            callback = stack[index + 1] # Innermost Tk callback (a dialog runs a nested event loop)
+            break
+    if callback is None:
+        return "unknown"
+    return f"{callback.name} ({os.path.basename(callback.filename)}:{callback.lineno})"
+
+
+class StallLog:
+    """Append-only text log that rolls over to path + '.1' at max_bytes."""
+    def __init__(self, path, max_bytes=1000000):
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def write(self, text):
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(text) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "a") as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Could not write stall log {self.path}: {e}")
+
+
+class TkWatchdog:
+    def __init__(self, root, threshold_s=0.25, interval_s=0.05, log_path="stalls.log", max_log_bytes=1000000):
+        self.root = root
+        self.threshold_s = threshold_s
+        self.interval_s = interval_s
+        self.log = StallLog(log_path, max_log_bytes) if log_path else None
+        self.main_thread_id = threading.main_thread().ident # Tk runs on the thread that created root
+        self.last_beat = time.monotonic()
+        self.running = False
+        self.thread = None
+        self.stall = None # {"started", "callback"} while the loop is stuck
+        self.stats = {} # callback -> {"count", "total_s", "max_s"}
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        self.last_beat = time.monotonic()
+        self.beat()
+        self.thread = threading.Thread(target=self._watch, name="tk-watchdog", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1.0)
+
+    def beat(self):
+        # Tk thread
+        if not self.running:
+            return
+        self.last_beat = time.monotonic()
+        try:
+            self.root.after(int(self.interval_s * 1000), self.beat)
+        except Exception:
+            self.running = False # Root destroyed
+
+    def _watch(self):
+        while self.running:
+            time.sleep(self.interval_s)
+            now = time.monotonic()
+            since_beat = now - self.last_beat
+            if self.stall is None:
+                if since_beat > self.threshold_s:
+                    self._stall_started(now, since_beat)
+            elif since_beat < self.interval_s * 2:
+                self._stall_ended(now)
+
+    def _stall_started(self, now, since_beat):
+        frames = sys._current_frames()
+        main_frame = frames.get(self.main_thread_id)
+        callback = running_callback(main_frame) if main_frame else "unknown"
+        self.stall = {"started": self.last_beat, "callback": callback}
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        lines = [f"=== {time.strftime('%Y-%m-%d %H:%M:%S')} Tk main loop stalled for {since_beat * 1000:.0f} ms "
+                 f"(threshold {self.threshold_s * 1000:.0f} ms) in {callback}\n"]
+        for thread_id, frame in frames.items():
+            if thread_id == threading.get_ident():
+                continue # The watchdog itself
+            lines.append(f"--- Thread {names.get(thread_id, thread_id)}{' (Tk)' if thread_id == self.main_thread_id else ''}\n")
+            lines.extend(traceback.format_stack(frame))
+        print(f"UI stall: main loop blocked for over {self.threshold_s * 1000:.0f} ms in {callback}")
+        if self.log:
+            self.log.write("".join(lines))
+
+    def _stall_ended(self, now):
+        stall, self.stall = self.stall, None
+        duration = self.last_beat - stall["started"] # The beat after the stall marks its end
+        with self.lock:
+            entry = self.stats.setdefault(stall["callback"], {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            entry["count"] += 1
+            entry["total_s"] += duration
+            entry["max_s"] = max(entry["max_s"], duration)
+        print(f"UI stall over after {duration * 1000:.0f} ms ({stall['callback']})")
+        if self.log:
+            self.log.write(f"=== Stall in {stall['callback']} ended after {duration * 1000:.0f} ms\n\n")
+
+    def report(self):
+        """Per-callback stall statistics, worst total first."""
+        with self.lock:
+            return sorted(self.stats.items(), key=lambda item: item[1]["total_s"], reverse=True)
+
+    def print_report(self):
+        report = self.report()
+        if not report:
+            print("No UI stalls recorded.")
+            return
+        print("UI stalls per callback:")
+        for callback, entry in report:
+            print(f"  {callback}: {entry['count']} stalls, {entry['total_s'] * 1000:.0f} ms total, "
+                  f"worst {entry['max_s'] * 1000:.0f} ms")
+
+
+def start_watchdog(root, config):
+    """TkWatchdog from the config's "watchdog" section, started; None when disabled."""
+    watchdog_config = config.get('watchdog', {})
+    if not watchdog_config.get('enabled', True):
+        return None
+    watchdog = TkWatchdog(
+        root,
+        threshold_s=watchdog_config.get('threshold_ms', 250) / 1000.0,
+        interval_s=watchdog_config.get('interval_ms', 50) / 1000.0,
+        log_path=watchdog_config.get('log_file', "stalls.log"),
+        max_log_bytes=watchdog_config.get('max_log_bytes', 1000000)
+    )
+    watchdog.start()
+    return watchdog
@@ -0,0 +1,195 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from event_bus import TELEMETRY
+
+# Per-robot telemetry history for diagnosis and live plots.
+#
+# Each robot's samples go into fixed-size columnar chunks (one row per
+# column, time first). Full chunks stay in memory up to a limit; older ones
+# are written to disk as .npy (or dropped without a spill directory). Every
+# full chunk also gets a min/max summary per SUMMARY_BUCKET samples that
+# always stays in memory, so a whole-match plot is built from summaries
+# without touching the disk or the raw samples.
+#
+# Latency needs robots to send "timestamp" (their time.time()) in the status
+# and clocks synchronised (NTP); without it the column stays NaN.
+
+COLUMNS = ("x", "y", "theta", "speed", "battery", "packet_rate", "latency_ms")
+SUMMARY_BUCKET = 64 # Samples per min/max summary bucket
+RATE_SMOOTHING = 0.1 # EMA weight of the newest packet interval
+
+
+def minmax_downsample(t, lo, hi, buckets, start=None, end=None):
+    """Min/max envelope of (t, lo, hi) in at most `buckets` equal time bins; returns (t, lo, hi).
+
+    Spikes survive decimation (unlike averaging or striding), which is what
+    matters for brown-outs. NaN samples are ignored.
+    """
+    if len(t) <= buckets:
+        return t, lo, hi
+    start = t[0] if start is None else start
+    end = t[-1] if end is None else end
+    span = max(end - start, 1e-9)
+    bins = np.minimum(((t - start) / span * buckets).astype(np.int64), buckets - 1)
+    _, first = np.unique(bins, return_index=True) # t is sorted, so bins are too
+    return t[first], np.fmin.reduceat(lo, first), np.fmax.reduceat(hi, first)
+
+
+class RobotSeries:
+    def __init__(self, robot_id, chunk_size=4096, chunks_in_memory=16, spill_dir=None):
+        chunk_size -= chunk_size % SUMMARY_BUCKET
+        self.robot_id = robot_id
+        self.chunk_size = chunk_size
+        self.chunks_in_memory = chunks_in_memory
+        self.spill_dir = spill_dir
+        self.lock = threading.Lock() # Appended on the network thread, queried on the UI thread
+        self.current = np.full((1 + len(COLUMNS), chunk_size), np.nan)
+        self.fill = 0
+        self.chunks = [] # Every full chunk, oldest first: {"t0", "t1", "data" (in memory) or "path", "summary"}
+        self.in_memory = deque() # Indices into chunks still holding data
+        self.samples = 0
+        # State for derived columns
+        self.last_time = None
+        self.last_position = None
+        self.interval_ema = None
+
+    def record(self, robot, now=None, packet=True, sent_at=None):
+        """Append one sample from the robot's current state. packet=False for samples that are not
+        one status packet each (e.g. snapshots in multiprocess mode): no packet rate then."""
+        if now is None:
+            now = time.monotonic()
+        position = robot.position if robot.position and len(robot.position) >= 2 else (math.nan, math.nan)
+        speed = math.nan
+        if self.last_time is not None and now > self.last_time:
+            dt = now - self.last_time
+            speed = math.hypot(position[0] - self.last_position[0], position[1] - self.last_position[1]) / dt
+            if packet:
+                self.interval_ema = dt if self.interval_ema is None else \
+                    (1 - RATE_SMOOTHING) * self.interval_ema + RATE_SMOOTHING * dt
+        self.last_time = now
+        self.last_position = position
+        packet_rate = 1.0 / self.interval_ema if packet and self.interval_ema else math.nan
+        latency_ms = (time.time() - sent_at) * 1000.0 if sent_at is not None else math.nan
+        battery = robot.parameters.get("battery_level")
+        self.append(now, (position[0], position[1], robot.orientation, speed,
+                          battery if isinstance(battery, (int, float)) else math.nan, packet_rate, latency_ms))
+
+    def append(self, t, values):
+        with self.lock:
+            self.current[0, self.fill] = t
+            self.current[1:, self.fill] = values
+            self.fill += 1
+            self.samples += 1
+            if self.fill == self.chunk_size:
+                self._close_chunk()
+
+    def _close_chunk(self):
+        data = self.current
+        blocks = data.reshape(data.shape[0], -1, SUMMARY_BUCKET)
+        summary = np.concatenate([blocks[:1, :, 0], np.fmin.reduce(blocks[1:], axis=2), np.fmax.reduce(blocks[1:], axis=2)])
+        self.chunks.append({"t0": data[0, 0], "t1": data[0, -1], "data": data, "summary": summary})
+        self.in_memory.append(len(self.chunks) - 1)
+        self.current = np.full_like(data, np.nan)
+        self.fill = 0
+        if len(self.in_memory) > self.chunks_in_memory:
+            index = self.in_memory.popleft()
+            chunk = self.chunks[index]
+            if self.spill_dir:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                path = os.path.join(self.spill_dir, f"robot_{self.robot_id}_{index:05d}.npy")
+                try:
+                    np.save(path, chunk["data"])
+                    chunk["path"] = path
+                except OSError as e:
+                    print(f"Telemetry spill to {path} failed: {e}")
+            chunk["data"] = None
+
+    def _chunk_data(self, chunk):
+        if chunk["data"] is not None:
+            return chunk["data"]
+        if chunk.get("path"):
+            return np.load(chunk["path"], mmap_mode="r")
+        return None
+
+    def time_range(self):
+        with self.lock:
+            first = self.chunks[0]["t0"] if self.chunks else (self.current[0, 0] if self.fill else None)
+            last = self.current[0, self.fill - 1] if self.fill else (self.chunks[-1]["t1"] if self.chunks else None)
+            return first, last
+
+    def query(self, column, start=None, end=None, max_points=1000):
+        """(t, lo, hi) of a column over [start, end], at most max_points bins.
+
+        Raw samples (lo == hi) are used when the range spans at most two chunks
+        or few samples; otherwise full chunks contribute their min/max summaries.
+        """
+        row = 1 + COLUMNS.index(column)
+        with self.lock:
+            chunks = [c for c in self.chunks
+                      if (start is None or c["t1"] >= start) and (end is None or c["t0"] <= end)]
+            current = self.current[:, :self.fill].copy()
+        # Zoomed in (a couple of chunks) or few samples: raw data is cheap enough, even from disk
+        raw = len(chunks) <= 2 or len(chunks) * self.chunk_size <= 2 * max_points
+        parts = []
+        for chunk in chunks:
+            data = self._chunk_data(chunk) if raw else None
+            if data is not None:
+                parts.append((data[0], data[row], data[row]))
+            else:
+                summary = chunk["summary"]
+                parts.append((summary[0], summary[row], summary[row + len(COLUMNS)]))
+        parts.append((current[0], current[row], current[row]))
+        t = np.concatenate([p[0] for p in parts])
+        lo = np.concatenate([p[1] for p in parts])
+        hi = np.concatenate([p[2] for p in parts])
+        keep = np.ones(len(t), dtype=bool)
+        if start is not None:
+            keep &= t >= start
+        if end is not None:
+            keep &= t <= end
+        t, lo, hi = t[keep], lo[keep], hi[keep]
+        return minmax_downsample(t, lo, hi, max_points, start, end)
+
+
+class TelemetryStore:
+    """RobotSeries for every robot of the team; subscribe() records each status packet from the event bus."""
+    def __init__(self, chunk_size=4096, chunks_in_memory=16, spill_dir=None):
+        self.chunk_size = chunk_size
+        self.chunks_in_memory = chunks_in_memory
+        # One directory per run, so a restart never overwrites the previous match
+        self.spill_dir = os.path.join(spill_dir, time.strftime("%Y%m%d_%H%M%S")) if spill_dir else None
+        self.series = {} # robot_id -> RobotSeries
+        self.robots = {} # robot_id -> Robot, from attach()
+
+    def series_for(self, robot_id):
+        series = self.series.get(robot_id)
+        if series is None:
+            series = self.series[robot_id] = RobotSeries(robot_id, self.chunk_size, self.chunks_in_memory, self.spill_dir)
+        return series
+
+    def attach(self, robots):
+        for robot in robots:
+            self.robots[robot.robot_id] = robot
+            self.series_for(robot.robot_id) # Created here, so the network thread only looks them up
+
+    def subscribe(self, bus):
+        """Record every status packet published on bus. Runs on the network thread right after the
+        robot applied the packet, so the robot's state is the packet's."""
+        return bus.subscribe(TELEMETRY, "telemetry-store", callback=self.record_event)
+
+    def record_event(self, event):
+        robot = self.robots.get(event.robot_id)
+        if robot:
+            sent_at = event.status.get('timestamp')
+            self.series_for(event.robot_id).record(robot, now=event.received_at,
+                                                   sent_at=sent_at if isinstance(sent_at, (int, float)) else None)
+
+    def record_robots(self, robots, now=None):
+        """One non-packet sample per connected robot (multiprocess mode, where packets arrive elsewhere)."""
+        for robot in robots:
+            if robot.connected:
+                self.series_for(robot.robot_id).record(robot, now, packet=False)
@@ -0,0 +1,302 @@
+import math
+import time
+from positioning import hungarian
+
+
+class SpatialHash:
+    """Uniform grid of points for fixed-radius neighbour queries."""
+    def __init__(self, cell_size_m):
+        self.cell_size_m = cell_size_m
+        self.cells = {}
+
+    def key(self, x, y):
+        return int(math.floor(x / self.cell_size_m)), int(math.floor(y / self.cell_size_m))
+
+    def insert(self, index, x, y):
+        self.cells.setdefault(self.key(x, y), []).append((index, x, y))
+
+    def query(self, x, y, radius):
+        """Yield (index, distance) for stored points within radius of (x, y)."""
+        kx, ky = self.key(x, y)
+        reach = int(math.ceil(radius / self.cell_size_m))
+        for cx in range(kx - reach, kx + reach + 1):
+            for cy in range(ky - reach, ky + reach + 1):
+                for index, px, py in self.cells.get((cx, cy), ()):
+                    d = math.hypot(px - x, py - y)
+                    if d <= radius:
+                        yield index, d
+
+
+class OpponentTrack:
+    """One tracked opponent. Has the attributes FieldRenderer.robots expects of a Robot."""
+    def __init__(self, track_id, x, y, now):
+        self.robot_id = track_id
+        self.name = f"Opponent {track_id}"
+        self.color = "red"
+        self.position = [x, y]
+        self.velocity = [0.0, 0.0]
+        self.orientation = 0.0 # Heading of travel, radians
+        self.hits = 1
+        self.confirmed = False
+        self.last_update = now
+
+    def predict(self, now):
+        dt = now - self.last_update
+        return self.position[0] + self.velocity[0] * dt, self.position[1] + self.velocity[1] * dt
+
+    def correct(self, x, y, now, alpha, beta):
+        """Alpha-beta filter update with a measurement at (x, y)."""
+        dt = now - self.last_update
+        px, py = self.predict(now)
+        rx, ry = x - px, y - py
+        self.position = [px + alpha * rx, py + alpha * ry]
+        if dt > 1e-3:
+            self.velocity = [self.velocity[0] + beta * rx / dt, self.velocity[1] + beta * ry / dt]
+        if math.hypot(*self.velocity) > 0.2:
+            self.orientation = math.atan2(self.velocity[1], self.velocity[0])
+        self.last_update = now
+        self.hits += 1
+
+
+class OpponentTracker:
+    """Tracks opponents from the robots' obstacle detections.
+
+    Each update:
+      1. drops detections within teammate_gate_m of a connected teammate,
+      2. merges detections of the same object seen by several robots
+         (within merge_radius_m),
+      3. associates the merged detections to predicted tracks by global
+         nearest neighbour: candidate pairs come from a spatial hash, are
+         split into independent groups, and each group is solved optimally
+         (Hungarian),
+      4. updates matched tracks with an alpha-beta filter, starts tracks for
+         unmatched detections and deletes tracks not seen for max_age_s.
+    Tracks become confirmed after confirm_hits updates; only confirmed tracks
+    are returned. Tentative tracks are dropped after tentative_max_age_s
+    without an update, so clutter does not pile up.
+    """
+    def __init__(self, teammate_gate_m=0.4, merge_radius_m=0.5, association_gate_m=1.0,
+                 confirm_hits=3, max_age_s=1.0, tentative_max_age_s=0.2, alpha=0.6, beta=0.2,
+                 default_variance_m2=0.005):
+        self.teammate_gate_m = teammate_gate_m
+        self.merge_radius_m = merge_radius_m
+        self.association_gate_m = association_gate_m
+        self.confirm_hits = confirm_hits
+        self.max_age_s = max_age_s
+        self.tentative_max_age_s = tentative_max_age_s
+        self.alpha = alpha
+        self.beta = beta
+        self.default_variance_m2 = default_variance_m2 # var_x + var_y of detections reported without one
+        self.tracks = []
+        self.next_track_id = 1
+        self.last_update_time_s = 0.0 # Duration of the last update(), for profiling
+
+    def update(self, robots, now=None, teammates=None):
+        """Track the obstacle detections of robots: pass only robots with a packet not seen before, or a
+        detection counts as a hit on every call. teammates: robots to gate against (default robots)."""
+        started = time.perf_counter()
+        if now is None:
+            now = time.monotonic()
+        detections = self.opponent_detections(robots, teammates)
+        self.associate(detections, now)
+        self.tracks = [track for track in self.tracks
+                       if now - track.last_update <= (self.max_age_s if track.confirmed else self.tentative_max_age_s)]
+        self.last_update_time_s = time.perf_counter() - started
+        return self.confirmed_tracks()
+
+    def confirmed_tracks(self):
+        return [track for track in self.tracks if track.confirmed]
+
+    def opponent_detections(self, robots, teammates=None):
+        """Detections of robots that are not near one of teammates, merged across robots: list of (x, y)."""
+        teammate_robots = robots if teammates is None else teammates
+        teammates = SpatialHash(self.teammate_gate_m)
+        for robot in teammate_robots:
+            if robot.connected and robot.position and len(robot.position) >= 2:
+                teammates.insert(robot.robot_id, robot.position[0], robot.position[1])
+
+        merged = SpatialHash(self.merge_radius_m)
+        clusters = [] # [sum of w*x, sum of w*y, sum of w], weighted by inverse variance
+        for robot in robots:
+            if not robot.connected or not robot.local_obstacles:
+                continue
+            obstacles = robot.local_obstacles
+            variances = getattr(robot, 'local_obstacle_variances', None)
+            if not variances or len(variances) != len(obstacles):
+                variances = [None] * len(obstacles)
+            for obs, variance in zip(obstacles, variances):
+                if not obs or len(obs) < 2:
+                    continue
+                x, y = obs[0], obs[1]
+                if next(teammates.query(x, y, self.teammate_gate_m), None) is not None:
+                    continue
+                # Robots far away or unsure of their own pose count less than close, well-localised ones
+                w = 1.0 / max(variance[0] + variance[1], 1e-6) if variance else 1.0 / self.default_variance_m2
+                nearest = min(merged.query(x, y, self.merge_radius_m), key=lambda hit: hit[1], default=None)
+                if nearest is None:
+                    merged.insert(len(clusters), x, y)
+                    clusters.append([w * x, w * y, w])
+                else:
+                    cluster = clusters[nearest[0]]
+                    cluster[0] += w * x
+                    cluster[1] += w * y
+                    cluster[2] += w
+        return [(sx / w, sy / w) for sx, sy, w in clusters]
+
+    def associate(self, detections, now):
+        predicted = [track.predict(now) for track in self.tracks]
+        index = SpatialHash(self.association_gate_m)
+        for d, (x, y) in enumerate(detections):
+            index.insert(d, x, y)
+
+        # Candidate (track, detection) pairs inside the gate, grouped into independent components
+        candidates = {}
+        parent = {}
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for t, (px, py) in enumerate(predicted):
+            for d, dist in index.query(px, py, self.association_gate_m):
+                candidates[(t, d)] = dist
+                for node in (("t", t), ("d", d)):
+                    parent.setdefault(node, node)
+                root_t, root_d = find(("t", t)), find(("d", d))
+                if root_t != root_d:
+                    parent[root_t] = root_d
+
+        groups = {}
+        for node in parent:
+            groups.setdefault(find(node), ([], []))[0 if node[0] == "t" else 1].append(node[1])
+
+        matched_detections = set()
+        for track_ids, detection_ids in groups.values():
+            for t, d in self.solve_group(track_ids, detection_ids, candidates):
+                self.tracks[t].correct(detections[d][0], detections[d][1], now, self.alpha, self.beta)
+                if self.tracks[t].hits >= self.confirm_hits:
+                    self.tracks[t].confirmed = True
+                matched_detections.add(d)
+
+        for d, (x, y) in enumerate(detections):
+            if d not in matched_detections:
+                self.tracks.append(OpponentTrack(self.next_track_id, x, y, now))
+                self.next_track_id += 1
+
+    def solve_group(self, track_ids, detection_ids, candidates):
+        """Optimal (track, detection) pairs within one group of mutually gated candidates."""
+        if len(track_ids) == 1 and len(detection_ids) == 1:
+            return [(track_ids[0], detection_ids[0])]
+        size = max(len(track_ids), len(detection_ids))
+        no_match = self.association_gate_m * 2 # Cost of leaving a track or detection unmatched
+        cost = [[no_match] * size for _ in range(size)]
+        for i, t in enumerate(track_ids):
+            for j, d in enumerate(detection_ids):
+                if (t, d) in candidates:
+                    cost[i][j] = candidates[(t, d)]
+        pairs = []
+        for i, j in enumerate(hungarian(cost)):
+            if i < len(track_ids) and j < len(detection_ids) and (track_ids[i], detection_ids[j]) in candidates:
+                pairs.append((track_ids[i], detection_ids[j]))
+        return pairs
+
+
+class BallFilter:
+    """Constant-velocity Kalman filter for the fused ball.
+
+    x and y are filtered independently (isotropic noise makes the 4-state
+    filter separate into two 2-state ones): state [p, v] per axis with
+    covariance [[pp, pv], [pv, vv]]. Every robot that sees the ball
+    contributes one sequential measurement update. Measurements further than
+    gate_m from the prediction are ignored unless the filter has had no
+    accepted measurement for reset_after_s, in which case it restarts there.
+    """
+    def __init__(self, measurement_noise_m=0.05, acceleration_noise=2.0, gate_m=1.5, reset_after_s=1.0,
+                 stop_after_s=0.5):
+        self.r = measurement_noise_m ** 2
+        self.q = acceleration_noise ** 2
+        self.gate_m = gate_m
+        self.reset_after_s = reset_after_s
+        self.stop_after_s = stop_after_s # Unseen this long: assume the ball has stopped
+        self.axes = None # [[p, v, pp, pv, vv], [...]] for x and y
+        self.last_time = None
+        self.last_seen = None
+
+    @property
+    def initialized(self):
+        return self.axes is not None
+
+    def position(self):
+        return [self.axes[0][0], self.axes[1][0]]
+
+    def velocity(self):
+        return [self.axes[0][1], self.axes[1][1]]
+
+    def reset(self, x, y, now):
+        big = 1.0 # Initial velocity variance (m/s)^2
+        self.axes = [[x, 0.0, self.r, 0.0, big], [y, 0.0, self.r, 0.0, big]]
+        self.last_time = now
+        self.last_seen = now
+
+    def predict(self, now):
+        dt = now - self.last_time
+        if dt <= 0:
+            return
+        q = self.q
+        for axis in self.axes:
+            p, v, pp, pv, vv = axis
+            axis[0] = p + v * dt
+            axis[2] = pp + 2 * dt * pv + dt * dt * vv + q * dt ** 4 / 4
+            axis[3] = pv + dt * vv + q * dt ** 3 / 2
+            axis[4] = vv + q * dt * dt
+        if now - self.last_seen > self.stop_after_s:
+            for axis in self.axes:
+                axis[1] = 0.0
+        self.last_time = now
+
+    def correct(self, x, y, r_x=None, r_y=None):
+        # r_x, r_y: measurement variances (m^2) when the report came with its own, e.g. from pose uncertainty
+        for axis, z, r in ((self.axes[0], x, r_x), (self.axes[1], y, r_y)):
+            p, v, pp, pv, vv = axis
+            s = pp + (self.r if r is None else max(r, self.r))
+            k_p, k_v = pp / s, pv / s
+            innovation = z - p
+            axis[0] = p + k_p * innovation
+            axis[1] = v + k_v * innovation
+            axis[2] = (1 - k_p) * pp
+            axis[3] = (1 - k_p) * pv
+            axis[4] = vv - k_v * pv
+
+    def update(self, measurements, now, variances=None):
+        """Predict to now and fold in measurements (list of [x, y]). Returns True once the filter has a state.
+
+        variances: per measurement (var_x, var_y) in m^2, or None for measurement_noise_m. Only the
+        diagonal is used (the filter runs per axis); the gate widens to 3 sigma of uncertain reports.
+        """
+        if variances is None:
+            variances = [None] * len(measurements)
+        if not self.initialized:
+            if not measurements:
+                return False
+            x = sum(m[0] for m in measurements) / len(measurements)
+            y = sum(m[1] for m in measurements) / len(measurements)
+            self.reset(x, y, now)
+            return True
+        self.predict(now)
+        accepted = False
+        for m, variance in zip(measurements, variances):
+            px, py = self.position()
+            gate = self.gate_m if variance is None else max(self.gate_m, 3 * math.sqrt(max(variance)))
+            if math.hypot(m[0] - px, m[1] - py) <= gate:
+                if variance is None:
+                    self.correct(m[0], m[1])
+                else:
+                    self.correct(m[0], m[1], variance[0], variance[1])
+                accepted = True
+        if accepted:
+            self.last_seen = now
+        elif measurements and now - self.last_seen > self.reset_after_s:
+            self.reset(measurements[0][0], measurements[0][1], now)
+        return True
@@ -0,0 +1,275 @@
+import json
+import multiprocessing
+import queue
+import struct
+import time
+from multiprocessing import shared_memory
+from types import SimpleNamespace
+from robot_logic import GlobalWorldMap, create_robots_from_config
+from world_shm import attach_segment
+from event_bus import LOG, REFEREE
+
+# Shared-memory ring layout:
+#   header: latest published sequence number (uint64)
+#   slots:  [slot sequence (uint64), payload length (uint32), payload (slot_size bytes)] * slots
+# Snapshot n goes to slot n % slots. Its slot sequence is 2n-1 while it is being
+# written and 2n once complete, so a reader can tell a torn or overwritten slot
+# from a good one without any lock.
+RING_HEADER = struct.Struct("<Q")
+SLOT_HEADER = struct.Struct("<QI")
+
+
+class SnapshotRing:
+    """Ring buffer of encoded world snapshots in shared memory (one writer, any number of readers)."""
+    def __init__(self, name=None, slots=8, slot_size=65536, create=False):
+        self.slots = slots
+        self.slot_size = slot_size
+        size = RING_HEADER.size + slots * (SLOT_HEADER.size + slot_size)
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = attach_segment(name)
+        if create:
+            RING_HEADER.pack_into(self.shm.buf, 0, 0)
+        self.name = self.shm.name
+        self.sequence = 0 # Last sequence published by this (writer) instance
+
+    def slot_offset(self, sequence):
+        return RING_HEADER.size + (sequence % self.slots) * (SLOT_HEADER.size + self.slot_size)
+
+    def publish(self, payload):
+        if len(payload) > self.slot_size:
+            print(f"World snapshot of {len(payload)} bytes does not fit a {self.slot_size} byte ring slot; dropped.")
+            return False
+        buf = self.shm.buf
+        self.sequence += 1
+        offset = self.slot_offset(self.sequence)
+        SLOT_HEADER.pack_into(buf, offset, 2 * self.sequence - 1, len(payload))
+        start = offset + SLOT_HEADER.size
+        buf[start:start + len(payload)] = payload
+        SLOT_HEADER.pack_into(buf, offset, 2 * self.sequence, len(payload))
+        RING_HEADER.pack_into(buf, 0, self.sequence)
+        return True
+
+    def read_latest(self, last_sequence=0):
+        """Return (sequence, payload) of the newest snapshot, or (last_sequence, None) if there is nothing new."""
+        buf = self.shm.buf
+        for _ in range(3): # Retry if the writer lapped us mid-copy
+            sequence = RING_HEADER.unpack_from(buf, 0)[0]
+            if sequence == 0 or sequence == last_sequence:
+                return last_sequence, None
+            offset = self.slot_offset(sequence)
+            slot_sequence, length = SLOT_HEADER.unpack_from(buf, offset)
+            if slot_sequence != 2 * sequence:
+                continue
+            start = offset + SLOT_HEADER.size
+            payload = bytes(buf[start:start + length])
+            if SLOT_HEADER.unpack_from(buf, offset)[0] == slot_sequence:
+                return sequence, payload
+        return last_sequence, None
+
+    def close(self):
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class HeadlessUI:
+    """Stand-in for BaseStationUI inside the worker process.
+
+    Provides what BaseStationLogic expects of its UI and forwards log and
+    RefBox status events to the UI process. Events are dropped when the UI
+    falls behind, so the worker never waits on it.
+    """
+    def __init__(self, config, events):
+        self.config = config
+        self.events = events
+        self.robots = create_robots_from_config(config)
+        self.global_world = GlobalWorldMap(field_dims=config['field_dimensions'],
+                                           tracker_config=config.get('tracking'),
+                                           ball_filter_config=config.get('ball_filter'))
+        self.is_playing = False
+        self.refbox_connected = False
+
+    def post(self, event):
+        try:
+            self.events.put_nowait(event)
+        except queue.Full:
+            pass
+
+    def log_message(self, msg):
+        self.post(("log", msg))
+
+    def log_refbox_message(self, message):
+        self.log_message(f"RefBox: {message}\n")
+
+    def update_refbox_status(self, connected):
+        self.refbox_connected = connected
+        self.post(("refbox_status", connected))
+
+    def connect_bus(self, bus):
+        """Take log and RefBox events straight on the publishing thread: post() never waits."""
+        return [bus.subscribe(LOG, "headless-log", callback=lambda event: self.log_message(event.text)),
+                bus.subscribe(REFEREE, "headless-referee", callback=self.on_referee_event)]
+
+    def on_referee_event(self, event):
+        if event.connected is not None:
+            self.update_refbox_status(event.connected)
+        if event.message is not None:
+            self.log_refbox_message(event.message)
+
+    def update_robot_ui_elements(self):
+        pass
+
+    def redraw_field(self):
+        pass
+
+
+class ConsoleUI(HeadlessUI):
+    """HeadlessUI that prints log events instead of queueing them (replays, headless sessions)."""
+    def __init__(self, config, prefix=""):
+        super().__init__(config, None)
+        self.prefix = prefix
+
+    def post(self, event):
+        if event[0] == "log":
+            print(self.prefix + event[1], end="")
+
+
+def run_world_worker(config, ring_name, slots, slot_size, commands, events, stop_event, tick_s):
+    """Worker process: robot/RefBox sockets, decoding, fusion and the control path."""
+    from base_station import BaseStationLogic # Imported here: base_station imports this module
+    ui = HeadlessUI(config, events)
+    logic = BaseStationLogic(ui)
+    ring = SnapshotRing(ring_name, slots, slot_size)
+    robots_by_id = {robot.robot_id: robot for robot in ui.robots}
+    logic.connect_to_robots()
+
+    next_tick = time.monotonic()
+    try:
+        while not stop_event.is_set():
+            logic.update_world_state()
+            snapshot = ui.global_world.snapshot(ui.robots)
+            snapshot["refbox_connected"] = logic.refbox_handler.connected
+            snapshot["is_playing"] = ui.is_playing
+            snapshot["game_state"] = logic.game_state.state
+            ring.publish(json.dumps(snapshot).encode())
+
+            # Serve UI commands until the next tick is due
+            next_tick += tick_s
+            now = time.monotonic()
+            if next_tick < now:
+                next_tick = now # Running behind; do not try to catch up
+            while True:
+                try:
+                    command = commands.get(timeout=max(0.0, next_tick - time.monotonic()))
+                except queue.Empty:
+                    break
+                handle_worker_command(logic, robots_by_id, command)
+    finally:
+        logic.disconnect_from_robots()
+        logic.stop_refbox()
+        logic.scheduler.stop()
+        logic.stop_world_publisher()
+        ring.close()
+
+
+def handle_worker_command(logic, robots_by_id, command):
+    kind = command[0]
+    if kind == "send":
+        _, robot_id, message, priority = command
+        robot = robots_by_id.get(robot_id)
+        if robot:
+            robot.send_to_robot(message, priority)
+    elif kind == "connect_refbox":
+        logic.connect_to_refbox()
+    else:
+        print(f"Unknown worker command: {kind}")
+
+
+class WorldProcessClient:
+    """UI-process side of the multiprocess pipeline.
+
+    Starts the worker, turns its snapshots into updates of the UI's robots and
+    world map, and forwards commands back. It takes the place of
+    BaseStationLogic for the UI (ui.logic) and of the OutboundScheduler for
+    the UI's Robot objects, so the existing buttons work unchanged. Nothing
+    here blocks: snapshots are read from the ring and commands are queued
+    without waiting.
+    """
+    def __init__(self, ui, slots=8, slot_size=65536, tick_s=0.03, redraw_ms=30):
+        self.ui = ui
+        self.tick_s = tick_s
+        self.redraw_ms = redraw_ms
+        self.ring = SnapshotRing(slots=slots, slot_size=slot_size, create=True)
+        context = multiprocessing.get_context("spawn") # Never fork a process that has Tk loaded
+        self.commands = context.Queue(maxsize=1000)
+        self.events = context.Queue(maxsize=1000)
+        self.stop_event = context.Event()
+        self.process = context.Process(
+            target=run_world_worker,
+            args=(ui.config, self.ring.name, slots, slot_size, self.commands, self.events, self.stop_event, tick_s),
+            daemon=True
+        )
+        self.last_sequence = 0
+        self.refbox_handler = SimpleNamespace(connected=False) # Read by BaseStationUI.handle_refbox_connect
+        self.handler_ids = {robot.wifi_handler: robot.robot_id for robot in ui.robots if robot.wifi_handler}
+        for robot in ui.robots:
+            robot.scheduler = self
+
+    def start(self):
+        self.process.start()
+        self.ui.log_message("World worker process started.\n")
+        self.poll()
+
+    def stop(self):
+        self.stop_event.set()
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring.close()
+        self.ring.unlink()
+
+    def submit(self, handler, message, priority, enqueued_at=None):
+        """OutboundScheduler interface for the UI's robots: forward the send to the worker."""
+        return self.put_command(("send", self.handler_ids.get(handler), message, priority))
+
+    def connect_to_refbox(self):
+        self.put_command(("connect_refbox",))
+
+    def put_command(self, command):
+        try:
+            self.commands.put_nowait(command)
+            return True
+        except queue.Full:
+            print(f"World worker command queue full; dropped {command[0]}.")
+            return False
+
+    def poll(self):
+        self.last_sequence, payload = self.ring.read_latest(self.last_sequence)
+        if payload is not None:
+            snapshot = json.loads(payload)
+            self.ui.global_world.apply_snapshot(snapshot, self.ui.robots)
+            if self.ui.history:
+                self.ui.history.record(self.ui.global_world, self.ui.robots)
+            if self.ui.heatmaps:
+                self.ui.heatmaps.accumulate(self.ui.global_world, self.ui.robots, active=self.ui.is_playing)
+            if self.ui.telemetry:
+                self.ui.telemetry.record_robots(self.ui.robots) # Status packets arrive in the worker
+            self.ui.is_playing = snapshot["is_playing"]
+            self.refbox_handler.connected = snapshot["refbox_connected"]
+            self.ui.redraw_field()
+            self.ui.update_robot_ui_elements()
+
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                self.ui.log_message(value)
+            elif kind == "refbox_status":
+                self.ui.update_refbox_status(connected=value)
+
+        self.ui.root.after(self.redraw_ms, self.poll)
@@ -0,0 +1,193 @@
+import os
+import struct
+import time
+from multiprocessing import shared_memory
+
+# Live world state in a named shared-memory segment, for local consumers
+# (analysis scripts, strategy prototypes) that want to poll at high rate
+# without sockets or serialisation.
+#
+# Reading from another process:
+#     from world_shm import WorldStateReader
+#     reader = WorldStateReader()          # default name "basestation_world"
+#     state = reader.read()                # dict, or None if nothing new
+#
+# Layout (little endian, fixed offsets):
+#   header   magic "BSWS", layout version, sequence, timestamp,
+#            robot/obstacle/opponent counts, ball x/y and vx/vy (Kalman
+#            filter), ball flags, writer pid
+#   robots   MAX_ROBOTS    x (id, connected, x, y, theta, battery)
+#   obstacles MAX_OBSTACLES x (x, y)
+#   opponents MAX_OPPONENTS x (id, x, y, vx, vy, theta)
+# The sequence number is a seqlock: odd while the publisher writes, even when
+# the data is consistent. Readers copy the data and retry if the sequence was
+# odd or changed in the meantime.
+#
+# The timestamp doubles as the writer's heartbeat. A publisher that finds the
+# segment already there only replaces it if the recorded writer process is
+# gone or has not written for STALE_AFTER_S; a segment in use by another base
+# station (or session) is left alone and the publisher refuses to start.
+
+DEFAULT_NAME = "basestation_world"
+MAGIC = b"BSWS"
+LAYOUT_VERSION = 3
+MAX_ROBOTS = 16
+MAX_OBSTACLES = 128
+MAX_OPPONENTS = 32
+STALE_AFTER_S = 5.0 # A writer silent this long is taken to be gone
+
+HEADER = struct.Struct("<4sHxxQdIIIddddIi")
+SEQUENCE_OFFSET = 8 # Offset of the sequence field inside HEADER
+BALL_KNOWN = 1 # Flag: some robot has seen the ball (else x/y are the centre-spot placeholder)
+BALL_IN_SIGHT = 2 # Flag: seen within the last moment (else the filter holds its last position)
+SEQUENCE = struct.Struct("<Q")
+ROBOT = struct.Struct("<i?xxxdddd")
+OBSTACLE = struct.Struct("<dd")
+OPPONENT = struct.Struct("<ixxxxddddd")
+
+ROBOTS_OFFSET = HEADER.size
+OBSTACLES_OFFSET = ROBOTS_OFFSET + MAX_ROBOTS * ROBOT.size
+OPPONENTS_OFFSET = OBSTACLES_OFFSET + MAX_OBSTACLES * OBSTACLE.size
+SEGMENT_SIZE = OPPONENTS_OFFSET + MAX_OPPONENTS * OPPONENT.size
+
+
+def attach_segment(name):
+    """Open an existing segment without letting this process's resource tracker delete it on exit."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False) # Python 3.13+
+    except TypeError:
+        # Older Pythons always register the segment; skip that for this one attach
+        from multiprocessing import resource_tracker
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass # Exists, owned by another user
+    return True
+
+
+def live_writer(shm):
+    """Pid of the process still writing the segment (or "unknown" for an older layout), else None."""
+    magic, version, _, timestamp = HEADER.unpack_from(shm.buf, 0)[:4]
+    if magic != MAGIC or time.time() - timestamp > STALE_AFTER_S:
+        return None
+    if version != LAYOUT_VERSION:
+        return "unknown" # Fresh heartbeat from an older base station
+    pid = HEADER.unpack_from(shm.buf, 0)[-1]
+    return pid if process_exists(pid) else None
+
+
+class WorldStatePublisher:
+    """Writes the fused world into the named segment (single writer)."""
+    def __init__(self, name=DEFAULT_NAME):
+        self.name = name
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        except FileExistsError:
+            existing = attach_segment(name)
+            try:
+                writer = live_writer(existing) if existing.size >= HEADER.size else None
+            finally:
+                existing.close()
+            if writer is not None:
+                raise FileExistsError(f"Shared memory segment '{name}' is in use by another base station "
+                                      f"(pid {writer}); give this one a different shared_memory name")
+            # Left over from a previous run that did not shut down cleanly
+            existing.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=SEGMENT_SIZE)
+        self.sequence = 0
+        self.pid = os.getpid()
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, LAYOUT_VERSION, 0, time.time(), 0, 0, 0, 0.0, 0.0, 0.0, 0.0, 0, self.pid)
+
+    def publish(self, world, robots):
+        buf = self.shm.buf
+        robots = robots[:MAX_ROBOTS]
+        obstacles = world.obstacles[:MAX_OBSTACLES]
+        opponents = world.opponents[:MAX_OPPONENTS]
+
+        self.sequence += 1 # Odd: write in progress
+        SEQUENCE.pack_into(buf, SEQUENCE_OFFSET, self.sequence)
+        for i, robot in enumerate(robots):
+            ROBOT.pack_into(buf, ROBOTS_OFFSET + i * ROBOT.size, robot.robot_id, robot.connected,
+                            robot.position[0], robot.position[1], robot.orientation,
+                            float(robot.parameters.get("battery_level", 0) or 0))
+        for i, obs in enumerate(obstacles):
+            OBSTACLE.pack_into(buf, OBSTACLES_OFFSET + i * OBSTACLE.size, obs[0], obs[1])
+        for i, track in enumerate(opponents):
+            OPPONENT.pack_into(buf, OPPONENTS_OFFSET + i * OPPONENT.size, track.robot_id,
+                               track.position[0], track.position[1],
+                               track.velocity[0], track.velocity[1], track.orientation)
+        ball = world.ball_position
+        velocity = world.ball_velocity
+        flags = (BALL_KNOWN if world.ball_known else 0) | (BALL_IN_SIGHT if world.ball_in_sight else 0)
+        self.sequence += 1 # Even: consistent
+        HEADER.pack_into(buf, 0, MAGIC, LAYOUT_VERSION, self.sequence, time.time(),
+                         len(robots), len(obstacles), len(opponents), ball[0], ball[1],
+                         velocity[0], velocity[1], flags, self.pid)
+
+    def close(self, unlink=True):
+        self.shm.close()
+        if unlink:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class WorldStateReader:
+    """Polls the named segment written by WorldStatePublisher."""
+    def __init__(self, name=DEFAULT_NAME):
+        self.shm = attach_segment(name)
+        magic, version = HEADER.unpack_from(self.shm.buf, 0)[:2]
+        if magic != MAGIC or version != LAYOUT_VERSION:
+            self.shm.close()
+            raise ValueError(f"Shared memory segment '{name}' is not a version {LAYOUT_VERSION} world state")
+        self.last_sequence = 0
+
+    def sequence(self):
+        return SEQUENCE.unpack_from(self.shm.buf, SEQUENCE_OFFSET)[0]
+
+    def read(self, only_new=True, retries=100):
+        """Return the current state as a dict, or None if unchanged (only_new) or the writer kept us out."""
+        buf = self.shm.buf
+        for _ in range(retries):
+            before = self.sequence()
+            if before % 2:
+                continue
+            if only_new and before == self.last_sequence:
+                return None
+            (_, _, _, timestamp, n_robots, n_obstacles, n_opponents,
+             ball_x, ball_y, ball_vx, ball_vy, flags, _) = HEADER.unpack_from(buf, 0)
+            robots = [ROBOT.unpack_from(buf, ROBOTS_OFFSET + i * ROBOT.size) for i in range(n_robots)]
+            obstacles = [OBSTACLE.unpack_from(buf, OBSTACLES_OFFSET + i * OBSTACLE.size) for i in range(n_obstacles)]
+            opponents = [OPPONENT.unpack_from(buf, OPPONENTS_OFFSET + i * OPPONENT.size) for i in range(n_opponents)]
+            if self.sequence() != before:
+                continue
+            self.last_sequence = before
+            return {
+                "sequence": before,
+                "time": timestamp,
+                "ball": (ball_x, ball_y),
+                "ball_velocity": (ball_vx, ball_vy),
+                "ball_known": bool(flags & BALL_KNOWN),
+                "ball_in_sight": bool(flags & BALL_IN_SIGHT),
+                "robots": [{"id": r[0], "connected": r[1], "position": (r[2], r[3]), "orientation": r[4], "battery": r[5]}
+                           for r in robots],
+                "obstacles": obstacles,
+                "opponents": [{"id": o[0], "position": (o[1], o[2]), "velocity": (o[3], o[4]), "orientation": o[5]}
+                              for o in opponents],
+            }
+        return None
+
+    def close(self):
+        self.shm.close()